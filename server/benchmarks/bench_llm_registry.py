@@ -0,0 +1,48 @@
+"""
+Benchmark: per-request overhead of get_llm_service().
+
+"before" rebuilds every provider on each call (the old factory behaviour);
+"after" uses the process-wide registry. No network calls are made.
+
+Run from server/:
+    python -m benchmarks.bench_llm_registry [iterations]
+"""
+
+from __future__ import annotations
+
+import statistics
+import sys
+import time
+
+from services.llm_service import get_llm_service, reset_llm_services
+
+
+def _time_calls(fn, iterations: int) -> list[float]:
+    samples: list[float] = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _uncached(mode: str) -> None:
+    reset_llm_services()
+    get_llm_service(mode)
+
+
+def main(iterations: int = 200) -> None:
+    for mode in ("cloud", "groq", "local"):
+        before = _time_calls(lambda: _uncached(mode), iterations)
+        reset_llm_services()
+        get_llm_service(mode)  # warm the registry
+        after = _time_calls(lambda: get_llm_service(mode), iterations)
+        print(
+            f"mode={mode:<6} "
+            f"before: mean={statistics.mean(before):.3f}ms p95={sorted(before)[int(iterations * 0.95)]:.3f}ms  "
+            f"after: mean={statistics.mean(after) * 1000:.1f}µs p95={sorted(after)[int(iterations * 0.95)] * 1000:.1f}µs"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,105 @@
+"""
+Benchmark: estimated vs actual token counts, and estimator speed.
+
+The corpus is this repository's own prose (Markdown docs, prompts) and
+code (Python services). Estimates from services.token_budget are compared
+with whichever real tokenizers are available:
+
+  tiktoken     cl100k_base, a close proxy for the Llama 3 tokenizer used by
+               Groq / OpenRouter (pip install tiktoken)
+  gemini       the count_tokens API (needs GEMINI_API_KEY and --gemini;
+               makes one network call per sample)
+
+The old char/word heuristics are shown alongside for reference.
+
+Run from server/:
+    python -m benchmarks.bench_token_estimates [--gemini]
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+from services.token_budget import count_units, profile_for
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def _corpus() -> dict[str, str]:
+    samples: dict[str, str] = {}
+    for name in ("README.md", "ML_PROJECT_GUIDE.md", "DEMO_SCRIPT_READING.md"):
+        path = ROOT / name
+        if path.exists():
+            samples[f"prose:{name}"] = path.read_text(encoding="utf-8")
+    prompts = ROOT / "server" / "services" / "prompts"
+    samples["prose:prompts"] = "\n\n".join(p.read_text(encoding="utf-8") for p in sorted(prompts.glob("*.py")))
+    for name in ("llm_service.py", "rag_service.py", "context_engine.py"):
+        samples[f"code:{name}"] = (ROOT / "server" / "services" / name).read_text(encoding="utf-8")
+    return samples
+
+
+def _tiktoken_counter() -> Optional[Callable[[str], int]]:
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception as exc:  # not installed, or encoding file unavailable offline
+        print(f"tiktoken unavailable ({type(exc).__name__}) — skipping")
+        return None
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+def _gemini_counter() -> Optional[Callable[[str], int]]:
+    try:
+        from google import genai
+        from config import settings
+        client = genai.Client(api_key=settings.gemini_api_key)
+    except Exception as exc:
+        print(f"Gemini count_tokens unavailable ({exc}) — skipping")
+        return None
+    return lambda text: client.models.count_tokens(model="gemini-2.0-flash", contents=text).total_tokens
+
+
+def _report(label: str, model: str, provider: str, counter: Callable[[str], int], samples: dict[str, str]) -> None:
+    profile = profile_for(provider, model)
+    print(f"\n{label} (model={model})")
+    print(f"  {'sample':<32} {'chars':>8} {'actual':>8} {'estimate':>9} {'err':>7} {'chars/4':>8} {'err':>7}")
+    errors = []
+    for name, text in samples.items():
+        actual = counter(text)
+        estimate = profile.tokens(count_units(text))
+        naive = len(text) // 4
+        err = (estimate - actual) / actual * 100
+        errors.append(err)
+        print(
+            f"  {name:<32} {len(text):>8} {actual:>8} {estimate:>9} {err:>+6.1f}%"
+            f" {naive:>8} {(naive - actual) / actual * 100:>+6.1f}%"
+        )
+    print(f"  mean error {sum(errors) / len(errors):+.1f}%  (positive = overestimate, the safe side)")
+
+
+def _speed(samples: dict[str, str]) -> None:
+    text = "\n".join(samples.values()) * 20
+    start = time.perf_counter()
+    count_units(text)
+    elapsed = time.perf_counter() - start
+    print(f"\nEstimator speed: {len(text) / 1e6:.1f} M chars in {elapsed * 1000:.1f} ms "
+          f"({len(text) / 1e6 / elapsed:.0f} M chars/s)")
+
+
+def main(argv: list[str]) -> None:
+    samples = _corpus()
+    counter = _tiktoken_counter()
+    if counter is not None:
+        _report("tiktoken cl100k_base", "llama-3.3-70b-versatile", "groq", counter, samples)
+    if "--gemini" in argv:
+        counter = _gemini_counter()
+        if counter is not None:
+            _report("Gemini count_tokens", "gemini-2.0-flash", "gemini", counter, samples)
+    _speed(samples)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
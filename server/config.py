@@ -40,6 +40,134 @@ class Settings(BaseSettings):
     # Ollama (optional)
     ollama_base_url: str = "http://localhost:11434"
     ollama_model: str = "phi3:mini"
+    ollama_num_ctx: int = 4096  # context window Ollama allocates per request
+    ollama_keep_alive: str = "30m"  # how long Ollama keeps the model loaded after a call; "-1" = forever
+    ollama_warmup: bool = True  # load the model in the background at startup
+    ollama_session_contexts: int = 64  # chat conversations whose Ollama context is kept; 0 = off
+
+    # Shared HTTP connection pools for the httpx-based LLM providers
+    # (OpenRouter, Ollama). HTTP/2 is used when the `h2` package is installed.
+    llm_http_max_connections: int = 20
+    llm_http_max_keepalive_connections: int = 10
+    llm_http_keepalive_expiry: float = 30.0  # seconds
+    llm_http_connect_timeout: float = 10.0  # seconds
+    llm_http_timeout: float = 120.0  # read/write/pool timeout, seconds
+    llm_http2: bool = True
+
+    # Per-provider circuit breakers (429 / 5xx / timeouts)
+    llm_breaker_failure_threshold: int = 3  # consecutive failures before opening
+    llm_breaker_recovery_seconds: float = 30.0  # cool-down before a probe call
+
+    # Per-provider outbound limits; 0 = unlimited. Calls queue for up to
+    # llm_limit_max_wait_seconds, then fall back to the next provider.
+    llm_limit_max_wait_seconds: float = 5.0
+    llm_gemini_max_concurrency: int = 10
+    llm_gemini_rpm: int = 0
+    llm_gemini_tpm: int = 0
+    llm_groq_max_concurrency: int = 10
+    llm_groq_rpm: int = 0
+    llm_groq_tpm: int = 0
+    llm_openrouter_max_concurrency: int = 10
+    llm_openrouter_rpm: int = 0
+    llm_openrouter_tpm: int = 0
+    llm_ollama_max_concurrency: int = 2  # local model; extra calls only contend for the GPU
+    llm_ollama_rpm: int = 0
+    llm_ollama_tpm: int = 0
+
+    # Priority scheduling of LLM calls (services/llm_scheduler.py); 0 = off.
+    # While every slot is busy, calls are admitted by weighted fair queuing
+    # per (user, class). Env example: LLM_SCHEDULER_WEIGHTS='{"background": 2}'
+    llm_scheduler_max_concurrency: int = 8  # below the primary provider's limit, so calls queue here
+    llm_scheduler_weights: dict[str, float] = {"interactive": 8.0, "analysis": 4.0, "background": 1.0}
+    llm_scheduler_aging_seconds: float = 30.0  # waited this long → admitted ahead of younger calls
+
+    # Rate-limit cool-downs (services/retry_policy.py): a provider that answers
+    # 429 is rested until the reset its headers announce, else for a
+    # decorrelated-jitter delay between base and cap.
+    llm_retry_base_seconds: float = 1.0
+    llm_retry_cap_seconds: float = 60.0
+    llm_retry_max_wait_seconds: float = 5.0  # longer resets: fall back instead of waiting
+
+    # Prompt sizing (services/token_budget.py)
+    llm_prompt_token_cap: int = 100_000  # max input tokens per call, whatever the window
+    llm_token_safety_margin: float = 0.1  # share of the context window kept free for estimate error
+
+    # Map-reduce summarisation for documents too long for one call
+    summary_map_reduce_threshold_tokens: int = 24_000  # longer documents are summarised section by section
+    summary_section_tokens: int = 8_000  # target size of one map section
+    summary_map_concurrency: int = 4  # section summaries in flight per document
+
+    # Chat prompt: tokens for project context + retrieved knowledge
+    chat_context_max_tokens: int = 8_000
+
+    # Provider-side caching of the stable chat prompt prefix (system prompt +
+    # project context), services/prompt_cache.py. Gemini rejects cached
+    # content below its model minimum (4096 tokens for 2.0 Flash).
+    gemini_prefix_cache_min_tokens: int = 4096
+    gemini_prefix_cache_ttl_seconds: int = 600  # 0 = never create cached content
+
+    # Per-request deadlines (services/deadline.py). Routers start one from the
+    # X-Request-Timeout header (seconds) or their default; LLM hops and
+    # embeddings are bounded by the time left, and optional stages (query
+    # retrieval, the LLM drift check) are skipped when it runs low.
+    request_deadline_chat_seconds: float = 60.0
+    request_deadline_learning_seconds: float = 300.0  # map-reduce summaries of long documents
+    request_deadline_developer_seconds: float = 120.0
+    request_deadline_max_seconds: float = 600.0  # cap for X-Request-Timeout
+    request_deadline_optional_min_seconds: float = 5.0
+
+    # Model tiers per call type (chat, drift, summarise, extract, analyze,
+    # code, readme, analyze_document). A tier names a model per provider;
+    # call types without a tier, and providers a tier doesn't name, use the
+    # provider's default model. Env example:
+    # LLM_CALL_TYPE_TIERS='{"drift": "fast", "extract": "fast"}'
+    llm_model_tiers: dict[str, dict[str, str]] = {
+        "fast": {"gemini": "gemini-2.0-flash-lite", "groq": "llama-3.1-8b-instant"},
+    }
+    llm_call_type_tiers: dict[str, str] = {"drift": "fast"}
+
+    # Live provider stats and the "adaptive" routing mode
+    llm_ewma_alpha: float = 0.2  # weight of the newest sample
+    llm_adaptive_min_samples: int = 3  # before a provider is ranked by its stats
+    llm_adaptive_explore_ratio: float = 0.05  # share of calls that lead with a random provider
+    llm_adaptive_error_penalty: float = 5.0  # score = latency × (1 + penalty × error_rate)
+
+    # "auto" mode: a request leads with Ollama only if it is small enough and
+    # Ollama keeps up; otherwise the cloud providers are tried first.
+    llm_auto_local_max_prompt_tokens: int = 1500  # prompt size, in Ollama tokens
+    llm_auto_local_max_output_tokens: int = 1024  # requested max_tokens
+    llm_auto_local_max_queue: int = 2  # Ollama calls in flight + queued
+    llm_auto_local_latency_factor: float = 2.0  # vs the best cloud provider's EWMA latency
+
+    # Hedged requests: call type → latency percentile of the first provider
+    # after which the same request is also sent to the next one. Call types
+    # not listed are never hedged. Env example: LLM_HEDGE_PERCENTILES='{"chat": 95}'
+    llm_hedge_percentiles: dict[str, float] = {"chat": 95.0}
+    llm_hedge_min_samples: int = 20  # observed successes before hedging kicks in
+    llm_hedge_min_delay_ms: float = 1000.0  # never hedge sooner than this
+
+    # "replay" inference mode: answer LLM calls from a cassette of recorded
+    # traffic (offline benchmarks and end-to-end tests). With
+    # llm_replay_record on, replay mode calls the cloud chain instead and
+    # appends every response to the cassette.
+    llm_replay_cassette: str = "cassettes/llm.jsonl"
+    llm_replay_record: bool = False
+    llm_replay_latency_scale: float = 1.0  # × recorded latency; 0 → answer instantly
+    llm_replay_latency_ms: float = 0.0  # added to every replayed call
+    llm_replay_model: str = "gemini-2.0-flash"  # token budgets are sized for this model
+
+    # Content-addressed cache for deterministic LLM results (summaries,
+    # concepts, steps, code explain/debug, drift verdicts)
+    llm_cache_enabled: bool = True
+    llm_cache_max_entries: int = 1024
+    llm_cache_ttl_seconds: int = 7 * 24 * 3600
+    llm_cache_sqlite_path: str = ""  # e.g. "/tmp/workflow-llm-cache.db"; empty → memory only
+
+    # Semantic answer cache for project chat (near-identical questions)
+    chat_semantic_cache_enabled: bool = True
+    chat_semantic_cache_distance: float = 0.05  # max cosine distance for a hit
+    chat_semantic_cache_ttl_seconds: int = 3600
+    chat_semantic_cache_max_entries: int = 50  # per project
 
     # CORS — stored as comma-separated string to avoid pydantic-settings JSON parsing
     # e.g. "https://app.vercel.app" or "https://a.com,https://b.com"
@@ -4,10 +4,14 @@ from fastapi.responses import Response, JSONResponse
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 
 from config import settings
 from database import check_db_connection_async
+from middleware.disconnect import CancelOnDisconnectMiddleware
+from middleware.telemetry import LLMTelemetryMiddleware
+from services.llm_service import init_http_clients, close_http_clients, warm_up_local_model
 
 logging.basicConfig(
     level=logging.INFO,
@@ -21,7 +25,13 @@ async def lifespan(app: FastAPI):
     """Run startup/shutdown logic."""
     logger.info("Workflow API starting up…")
     await check_db_connection_async()
+    await init_http_clients()
+    # Load the local model in the background so startup isn't held up by it
+    warmup = asyncio.create_task(warm_up_local_model()) if settings.ollama_warmup else None
     yield
+    if warmup is not None:
+        warmup.cancel()
+    await close_http_clients()
     logger.info("Workflow API shutting down.")
 
 
@@ -41,6 +51,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ── LLM telemetry ─────────────────────────────────────────────────────────────
+# Labels every LLM call with the endpoint that made it (GET /api/llm/metrics)
+app.add_middleware(LLMTelemetryMiddleware)
+
+# ── Client disconnects ────────────────────────────────────────────────────────
+# Stop chat / learning / developer work nobody is waiting for any more.
+# Uploads aren't watched: a cancel between the storage upload and the DB
+# commit would orphan the stored file.
+app.add_middleware(
+    CancelOnDisconnectMiddleware,
+    path_pattern=r"^/api/projects/[^/]+/(chat|code|documents(?!/upload/?$))(/|$)",
+)
+
 
 # ── Health ────────────────────────────────────────────────────────────────────
 @app.get("/api/health")
@@ -119,9 +142,11 @@ from routers import developer as developer_router
 from routers import workflow as workflow_router
 from routers import chat as chat_router
 from routers import dashboard as dashboard_router
+from routers import llm as llm_router
 
 app.include_router(auth_router.router, prefix="/api/auth", tags=["auth"])
 app.include_router(dashboard_router.router, prefix="/api/dashboard", tags=["dashboard"])
+app.include_router(llm_router.router, prefix="/api/llm", tags=["llm"])
 app.include_router(projects_router.router, prefix="/api/projects", tags=["projects"])
 app.include_router(
     learning_router.router,
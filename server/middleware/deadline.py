@@ -0,0 +1,32 @@
+"""FastAPI dependency that starts a per-request deadline (services/deadline.py).
+
+Usage in a router:
+    router = APIRouter(dependencies=[Depends(request_deadline(settings.request_deadline_chat_seconds))])
+
+Clients may ask for a different budget with an X-Request-Timeout header
+(seconds), capped at settings.request_deadline_max_seconds. Routers turn a
+failed LLM call into an HTTP status with llm_error_status().
+"""
+
+from typing import Awaitable, Callable, Optional
+
+from fastapi import Header, status
+
+from config import settings
+from services import deadline
+
+
+def request_deadline(default_seconds: float) -> Callable[..., Awaitable[float]]:
+    async def start_deadline(x_request_timeout: Optional[float] = Header(default=None, gt=0)) -> float:
+        seconds = min(x_request_timeout or default_seconds, settings.request_deadline_max_seconds)
+        deadline.start(seconds)
+        return seconds
+
+    return start_deadline
+
+
+def llm_error_status(exc: Exception) -> int:
+    """504 if the request ran out of time for the LLM call, 503 if the providers failed."""
+    if isinstance(exc, deadline.DeadlineExceeded):
+        return status.HTTP_504_GATEWAY_TIMEOUT
+    return status.HTTP_503_SERVICE_UNAVAILABLE
@@ -0,0 +1,90 @@
+"""ASGI middleware that cancels a request's handler when its client goes away.
+
+Without it, a chat / analysis request keeps running its LLM, drift-check
+and embedding calls after the user has closed the tab, spending provider
+quota and worker capacity on an answer nobody will read. Cancellation
+reaches every await in the handler, so provider calls, limiter queues and
+single-flight waits are all abandoned; uncommitted DB work is rolled back
+when the request's session closes.
+
+Once the response has been sent completely, a disconnect no longer
+cancels anything (background tasks still run). A handler that has
+committed work whose follow-up steps must not be cut off half-way (the
+context entry and embeddings of a new row) calls
+finish_even_if_disconnected(request) right after the commit.
+
+Usage in main.py:
+    app.add_middleware(CancelOnDisconnectMiddleware, path_pattern=r"^/api/projects/[^/]+/chat")
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+
+from starlette.requests import Request
+
+logger = logging.getLogger(__name__)
+
+_CANCELLABLE = "cancel_on_disconnect"  # scope key; False once the handler opted out
+
+
+def finish_even_if_disconnected(request: Request) -> None:
+    """Let the rest of *request*'s handler run even if its client goes away."""
+    request.scope[_CANCELLABLE] = False
+
+
+class CancelOnDisconnectMiddleware:
+    def __init__(self, app, path_pattern: str = r"^/"):
+        self.app = app
+        self.path_re = re.compile(path_pattern)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.path_re.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        # The watcher is the only reader of receive(): it keeps reading so a
+        # disconnect is seen even while the handler is busy, and hands every
+        # message on to the handler in order.
+        messages: asyncio.Queue = asyncio.Queue()
+        response_sent = False
+        scope[_CANCELLABLE] = True
+
+        async def watch():
+            while True:
+                message = await receive()
+                messages.put_nowait(message)
+                if message["type"] == "http.disconnect":
+                    return
+
+        async def app_receive():
+            message = await messages.get()
+            if message["type"] == "http.disconnect":
+                messages.put_nowait(message)  # later calls see it too
+            return message
+
+        async def app_send(message):
+            nonlocal response_sent
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_sent = True
+            await send(message)
+
+        handler = asyncio.ensure_future(self.app(scope, app_receive, app_send))
+        watcher = asyncio.ensure_future(watch())
+        cancelled = False
+        try:
+            await asyncio.wait({handler, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if not handler.done() and not response_sent and scope[_CANCELLABLE]:
+                cancelled = True
+                logger.info("Client disconnected — cancelling %s %s", scope["method"], scope["path"])
+                handler.cancel()
+            try:
+                await handler
+            except asyncio.CancelledError:
+                if not cancelled:
+                    raise
+        finally:
+            watcher.cancel()
+            handler.cancel()  # no-op unless this request itself was cancelled
@@ -0,0 +1,26 @@
+"""FastAPI dependency that binds the LLM scheduling class and user (services/llm_scheduler.py).
+
+Usage in a router:
+    router = APIRouter(dependencies=[Depends(llm_priority("interactive"))])
+
+An endpoint-level llm_priority() runs after the router's and overrides it.
+"""
+
+from typing import Awaitable, Callable
+
+from fastapi import Depends
+
+from middleware.auth import get_current_user
+from models.user import User
+from services import llm_scheduler
+
+
+def llm_priority(priority: str) -> Callable[..., Awaitable[str]]:
+    if priority not in llm_scheduler.PRIORITIES:
+        raise ValueError(f"Unknown LLM priority: {priority}")
+
+    async def bind_priority(current_user: User = Depends(get_current_user)) -> str:
+        llm_scheduler.bind(priority, str(current_user.id))
+        return priority
+
+    return bind_priority
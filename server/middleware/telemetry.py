@@ -0,0 +1,22 @@
+"""ASGI middleware that labels LLM telemetry with the endpoint being served.
+
+Usage in main.py:
+    app.add_middleware(LLMTelemetryMiddleware)
+"""
+
+from services import llm_telemetry
+
+
+class LLMTelemetryMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = llm_telemetry.bind_request(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            llm_telemetry.unbind_request(token)
@@ -0,0 +1,8 @@
+-- Migration 004: Add section_summaries to documents
+-- Run once against your Neon PostgreSQL database.
+
+ALTER TABLE documents
+    ADD COLUMN IF NOT EXISTS section_summaries  JSONB  NOT NULL DEFAULT '{}'::jsonb;
+
+COMMENT ON COLUMN documents.section_summaries IS
+    'Map-reduce summarisation cache: {section content hash: section notes}, reused across re-summarises and level changes';
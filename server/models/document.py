@@ -18,4 +18,5 @@ class Document(Base):
     summary = Column(Text, nullable=True)
     key_concepts = Column(JSONB, default=list)
     implementation_steps = Column(JSONB, default=list)
+    section_summaries = Column(JSONB, default=dict)  # section content hash → notes (map-reduce summaries)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -6,13 +6,19 @@ Prefix: /api/projects/{project_id}/chat
 
 from __future__ import annotations
 
+import json
 import logging
+from typing import Any
 
 from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from database import get_db
+from config import settings
+from database import SessionLocal, get_db
 from middleware.auth import get_current_user
+from middleware.deadline import llm_error_status, request_deadline
+from middleware.priority import llm_priority
 from models.project import Project
 from models.user import User
 from schemas.chat import (
@@ -27,7 +33,10 @@ from services import rag_service
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(dependencies=[
+    Depends(request_deadline(settings.request_deadline_chat_seconds)),
+    Depends(llm_priority("interactive")),
+])
 
 
 # ── Helpers ───────────────────────────────────────────────────────────────────
@@ -49,7 +58,7 @@ def _get_project_or_404(project_id: str, user: User, db: Session) -> Project:
 def _llm_error(exc: Exception) -> HTTPException:
     logger.exception("Chat query failed")
     return HTTPException(
-        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        status_code=llm_error_status(exc),
         detail=f"LLM service unavailable: {exc}",
     )
 
@@ -90,6 +99,77 @@ async def send_message(
         provider=result["provider"],
         latency_ms=result["latency_ms"],
         message_id=result["message_id"],
+        cache_hit=result.get("cache_hit", False),
+    )
+
+
+# ── POST /chat/stream ─────────────────────────────────────────────────────────
+
+def _sse(event: str, data: dict[str, Any]) -> str:
+    """Format one Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/stream")
+async def stream_message(
+    project_id: str,
+    body: ChatRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    x_inference_mode: str = Header(default="cloud"),
+):
+    """
+    Send a message and stream the AI response as Server-Sent Events.
+
+    Events: `context` (references, sent first), `token` (one per chunk),
+    `done` (drift warnings, provider, latency, persisted message id,
+    cache_hit) or `error` if the LLM call fails.
+    """
+    project = _get_project_or_404(project_id, current_user, db)
+    project_key = str(project.id)
+    user_key = str(current_user.id)
+
+    async def event_source():
+        # Request-scoped dependencies are closed before the body streams,
+        # so the generator owns its own session.
+        stream_db = SessionLocal()
+        try:
+            async for event, data in rag_service.stream_query_with_context(
+                project_id=project_key,
+                user_query=body.message,
+                user_id=user_key,
+                db=stream_db,
+                mode=x_inference_mode,
+            ):
+                if event == "context":
+                    data = {
+                        **data,
+                        "context_used": [
+                            ContextReference(**ref).model_dump() for ref in data["context_used"]
+                        ],
+                    }
+                elif event == "done":
+                    data = {
+                        **data,
+                        "drift_warnings": [
+                            DriftWarning(**w).model_dump() for w in data["drift_warnings"]
+                        ],
+                    }
+                yield _sse(event, data)
+        except Exception as exc:
+            logger.exception("Chat stream failed")
+            stream_db.rollback()
+            yield _sse("error", {
+                "detail": f"LLM service unavailable: {exc}",
+                "status_code": llm_error_status(exc),
+            })
+        finally:
+            stream_db.close()
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
@@ -8,11 +8,15 @@ from __future__ import annotations
 
 import logging
 
-from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
 from sqlalchemy.orm import Session
 
+from config import settings
 from database import get_db
 from middleware.auth import get_current_user
+from middleware.deadline import llm_error_status, request_deadline
+from middleware.disconnect import finish_even_if_disconnected
+from middleware.priority import llm_priority
 from models.user import User
 from models.project import Project
 from models.code_insight import CodeInsight
@@ -35,7 +39,10 @@ from routers.projects import cache_invalidate
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(dependencies=[
+    Depends(request_deadline(settings.request_deadline_developer_seconds)),
+    Depends(llm_priority("analysis")),
+])
 
 
 # ── Helpers ───────────────────────────────────────────────────────────────────
@@ -61,7 +68,7 @@ def _validate_code(code: str) -> None:
 def _llm_error(exc: Exception, action: str) -> HTTPException:
     logger.exception("%s failed", action)
     return HTTPException(
-        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        status_code=llm_error_status(exc),
         detail=f"LLM service unavailable: {exc}",
     )
 
@@ -72,6 +79,7 @@ def _llm_error(exc: Exception, action: str) -> HTTPException:
 async def explain_code(
     project_id: str,
     body: ExplainRequest,
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
     x_inference_mode: str = Header(default="cloud"),
@@ -97,6 +105,7 @@ async def explain_code(
     db.commit()
     db.refresh(insight)
     cache_invalidate(project_id)
+    finish_even_if_disconnected(request)  # the insight needs its context entry and embedding
 
     # Feed context engine + generate embeddings for code insight
     try:
@@ -122,6 +131,7 @@ async def explain_code(
                 )
                 db.add(emb)
                 db.commit()
+                cache_invalidate(project_id)  # retrieval can now find the insight
     except Exception:
         logger.warning("Embedding generation failed for code insight — non-blocking")
 
@@ -143,6 +153,7 @@ async def explain_code(
 async def debug_code(
     project_id: str,
     body: DebugRequest,
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
     x_inference_mode: str = Header(default="cloud"),
@@ -168,6 +179,7 @@ async def debug_code(
     db.commit()
     db.refresh(insight)
     cache_invalidate(project_id)
+    finish_even_if_disconnected(request)  # the insight needs its context entry and embedding
 
     # Feed context engine + generate embeddings for debug insight
     try:
@@ -195,6 +207,7 @@ async def debug_code(
                 )
                 db.add(emb)
                 db.commit()
+                cache_invalidate(project_id)  # retrieval can now find the insight
     except Exception:
         logger.warning("Embedding generation failed for debug insight — non-blocking")
 
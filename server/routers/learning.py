@@ -1,4 +1,4 @@
-"""Learning-module router — document upload, summaries, concepts, steps.
+"""Learning-module router — document upload, summaries, concepts, steps, one-shot analysis.
 
 All endpoints are scoped to a project and require auth.
 Prefix: /api/projects/{project_id}/documents
@@ -6,14 +6,20 @@ Prefix: /api/projects/{project_id}/documents
 
 from __future__ import annotations
 
+import asyncio
 import logging
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, Header, HTTPException, UploadFile, File, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, UploadFile, File, status
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
 
+from config import settings
 from database import get_db
 from middleware.auth import get_current_user
+from middleware.deadline import llm_error_status, request_deadline
+from middleware.disconnect import finish_even_if_disconnected
+from middleware.priority import llm_priority
 from models.user import User
 from models.project import Project
 from models.document import Document
@@ -25,6 +31,8 @@ from schemas.learning import (
     SummaryResponse,
     ConceptsResponse,
     StepsResponse,
+    AnalyzeRequest,
+    AnalyzeResponse,
 )
 from services import pdf_service, file_storage, embedding_service, learning_service
 from services.context_engine import update_context
@@ -32,7 +40,10 @@ from routers.projects import cache_invalidate
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(dependencies=[
+    Depends(request_deadline(settings.request_deadline_learning_seconds)),
+    Depends(llm_priority("analysis")),
+])
 
 ALLOWED_EXTENSIONS = {".pdf", ".txt", ".md"}
 MAX_FILE_SIZE = 20 * 1024 * 1024  # 20 MB
@@ -61,6 +72,13 @@ def _get_document_or_404(doc_id: str, project_id: str, db: Session) -> Document:
     return doc
 
 
+def _keep_section_notes(doc: Document, section_cache: dict[str, str], db: Session) -> None:
+    """Persist the section notes that finished, so a retry resumes from them."""
+    if section_cache != (doc.section_summaries or {}):
+        doc.section_summaries = section_cache
+        db.commit()
+
+
 def _ext(filename: str) -> str:
     import os
     return os.path.splitext(filename)[1].lower()
@@ -137,6 +155,8 @@ async def upload_document(
                 )
                 db.add(emb)
             db.commit()
+            # Answers cached while the chunks were being embedded don't know them
+            cache_invalidate(project_id)
             logger.info("Stored %d chunk embeddings for doc %s", len(chunks), doc.id)
     except Exception:
         logger.exception("Embedding generation failed for doc %s — document saved without embeddings", doc.id)
@@ -184,6 +204,7 @@ async def summarize_document(
     project_id: str,
     doc_id: str,
     body: SummarizeRequest,
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
     x_inference_mode: str = Header(default="cloud"),
@@ -194,15 +215,25 @@ async def summarize_document(
     if not doc.raw_text:
         raise HTTPException(status_code=400, detail="Document has no text to summarise")
 
+    section_cache = dict(doc.section_summaries or {})
     try:
-        summary = await learning_service.summarise(doc.raw_text, body.level, mode=x_inference_mode)
+        summary = await learning_service.summarise(
+            doc.raw_text, body.level, mode=x_inference_mode, section_cache=section_cache,
+        )
+    except asyncio.CancelledError:
+        _keep_section_notes(doc, section_cache, db)  # client went away
+        raise
     except (RuntimeError, Exception) as exc:
         logger.exception("Summarise failed for doc %s", doc_id)
-        raise HTTPException(status_code=503, detail=f"LLM service unavailable: {exc}")
+        _keep_section_notes(doc, section_cache, db)
+        raise HTTPException(status_code=llm_error_status(exc), detail=f"LLM service unavailable: {exc}")
 
-    # Persist latest summary
+    # Persist latest summary and the per-section notes behind it
     doc.summary = summary
+    doc.section_summaries = section_cache
     db.commit()
+    cache_invalidate(project_id)
+    finish_even_if_disconnected(request)
 
     # Feed context engine
     try:
@@ -223,6 +254,7 @@ async def summarize_document(
 async def extract_concepts(
     project_id: str,
     doc_id: str,
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
     x_inference_mode: str = Header(default="cloud"),
@@ -237,12 +269,13 @@ async def extract_concepts(
         concepts = await learning_service.extract_concepts(doc.raw_text, mode=x_inference_mode)
     except (RuntimeError, Exception) as exc:
         logger.exception("Concept extraction failed for doc %s", doc_id)
-        raise HTTPException(status_code=503, detail=f"LLM service unavailable: {exc}")
+        raise HTTPException(status_code=llm_error_status(exc), detail=f"LLM service unavailable: {exc}")
 
     # Persist
     doc.key_concepts = concepts
     db.commit()
     cache_invalidate(project_id)
+    finish_even_if_disconnected(request)
 
     # Feed context engine
     try:
@@ -264,6 +297,7 @@ async def extract_concepts(
 async def generate_steps(
     project_id: str,
     doc_id: str,
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
     x_inference_mode: str = Header(default="cloud"),
@@ -278,10 +312,12 @@ async def generate_steps(
         steps = await learning_service.generate_steps(doc.raw_text, mode=x_inference_mode)
     except (RuntimeError, Exception) as exc:
         logger.exception("Step generation failed for doc %s", doc_id)
-        raise HTTPException(status_code=503, detail=f"LLM service unavailable: {exc}")
+        raise HTTPException(status_code=llm_error_status(exc), detail=f"LLM service unavailable: {exc}")
 
     doc.implementation_steps = steps
     db.commit()
+    cache_invalidate(project_id)
+    finish_even_if_disconnected(request)
 
     # Feed context engine
     try:
@@ -297,6 +333,78 @@ async def generate_steps(
     return StepsResponse(steps=steps)
 
 
+# ── POST /{doc_id}/analyze ───────────────────────────────────────────────────
+
+@router.post("/{doc_id}/analyze", response_model=AnalyzeResponse)
+async def analyze_document(
+    project_id: str,
+    doc_id: str,
+    request: Request,
+    body: AnalyzeRequest = AnalyzeRequest(),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    x_inference_mode: str = Header(default="cloud"),
+):
+    """Summary, key concepts and implementation steps in one round trip."""
+    _get_project_or_404(project_id, current_user, db)
+    doc = _get_document_or_404(doc_id, project_id, db)
+
+    if not doc.raw_text:
+        raise HTTPException(status_code=400, detail="Document has no text to analyse")
+
+    section_cache = dict(doc.section_summaries or {})
+    try:
+        result = await learning_service.analyze(
+            doc.raw_text, body.level, mode=x_inference_mode, section_cache=section_cache,
+        )
+    except asyncio.CancelledError:
+        _keep_section_notes(doc, section_cache, db)  # client went away
+        raise
+    except (RuntimeError, Exception) as exc:
+        logger.exception("Document analysis failed for doc %s", doc_id)
+        _keep_section_notes(doc, section_cache, db)
+        raise HTTPException(status_code=llm_error_status(exc), detail=f"LLM service unavailable: {exc}")
+
+    # Validate before persisting, so a malformed reply leaves the document as it was
+    try:
+        response = AnalyzeResponse(
+            summary=result["summary"],
+            level=body.level,
+            concepts=result["concepts"],
+            steps=result["steps"],
+        )
+    except ValidationError as exc:
+        logger.warning("Document analysis for doc %s returned malformed artefacts: %s", doc_id, exc)
+        _keep_section_notes(doc, section_cache, db)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="LLM service returned a malformed analysis",
+        )
+
+    # Persist all three artefacts together
+    doc.summary = result["summary"]
+    doc.key_concepts = result["concepts"]
+    doc.implementation_steps = result["steps"]
+    doc.section_summaries = section_cache
+    db.commit()
+    cache_invalidate(project_id)
+    finish_even_if_disconnected(request)
+
+    # Feed context engine
+    try:
+        concept_names = [c.get("name", "") for c in result["concepts"][:5]]
+        await update_context(
+            str(project_id), "decision",
+            f"[Learning] Document '{doc.filename}' analysed ({body.level}): "
+            f"{result['summary'][:200]} — key concepts: {', '.join(concept_names)}",
+            db,
+        )
+    except Exception:
+        logger.warning("Context update failed after document analysis — non-blocking")
+
+    return response
+
+
 # ── DELETE /{doc_id} ──────────────────────────────────────────────────────────
 
 @router.delete("/{doc_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,75 @@
+"""LLM introspection router — provider health, latency stats, telemetry and cache statistics.
+
+All endpoints require auth.
+Prefix: /api/llm
+"""
+
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends
+
+from middleware.auth import get_current_user
+from models.user import User
+from services import embedding_service, semantic_cache
+from services.llm_cache import get_llm_cache
+from services.llm_service import (
+    coalescing_stats,
+    hedge_stats,
+    json_stats,
+    limiter_states,
+    prefix_cache_stats,
+    provider_states,
+    provider_stats,
+    retry_states,
+    route_stats,
+    scheduler_stats,
+    telemetry_snapshot,
+)
+
+router = APIRouter()
+
+
+# ── GET /providers ────────────────────────────────────────────────────────────
+
+@router.get("/providers")
+def get_provider_states(current_user: User = Depends(get_current_user)):
+    """Breaker state, rate-limit cool-downs, limiter and scheduler queues, latency / error stats, hedge, JSON-retry, auto-routing, coalescing and prefix-cache counters."""
+    return {
+        "providers": provider_states(),
+        "limits": limiter_states(),
+        "rate_limits": retry_states(),
+        "scheduler": scheduler_stats(),
+        "stats": provider_stats(),
+        "hedging": hedge_stats(),
+        "structured_output": json_stats(),
+        "auto_routing": route_stats(),
+        "coalescing": {"llm": coalescing_stats(), "embedding": embedding_service.coalescing_stats()},
+        "prefix_cache": prefix_cache_stats(),
+    }
+
+
+# ── GET /metrics ──────────────────────────────────────────────────────────────
+
+@router.get("/metrics")
+def get_metrics(current_user: User = Depends(get_current_user)):
+    """Per-endpoint LLM telemetry: tokens, latency histograms, queue time, error classes, fallback hops."""
+    return telemetry_snapshot()
+
+
+# ── GET /cache ────────────────────────────────────────────────────────────────
+
+@router.get("/cache")
+def get_cache_stats(current_user: User = Depends(get_current_user)):
+    """Hit/miss counters and size of the deterministic LLM result cache."""
+    cache = get_llm_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+
+# ── GET /semantic-cache ───────────────────────────────────────────────────────
+
+@router.get("/semantic-cache")
+def get_semantic_cache_stats(current_user: User = Depends(get_current_user)):
+    """Hit/miss counters of the project chat semantic answer cache."""
+    return semantic_cache.stats()
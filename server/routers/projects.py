@@ -18,6 +18,7 @@ from schemas.project import (
     ProjectListResponse,
 )
 from middleware.auth import get_current_user
+from services import semantic_cache
 
 router = APIRouter()
 
@@ -41,6 +42,7 @@ def _cache_set(project_id: str, data: dict) -> None:
 def cache_invalidate(project_id: str) -> None:
     """Call this whenever a project or its child resources are mutated."""
     _PROJECT_CACHE.pop(str(project_id), None)
+    semantic_cache.invalidate(project_id)
 
 
 # ── helpers ───────────────────────────────────────────────────────────────────
@@ -162,6 +164,7 @@ def update_project(
 
     db.commit()
     db.refresh(project)
+    cache_invalidate(project_id)
     return ProjectResponse(**_enrich(project, db))
 
 
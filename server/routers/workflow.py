@@ -13,6 +13,7 @@ from sqlalchemy.orm import Session
 
 from database import get_db
 from middleware.auth import get_current_user
+from middleware.priority import llm_priority
 from models.project import Project
 from models.task import Task
 from models.user import User
@@ -31,7 +32,7 @@ from routers.projects import cache_invalidate
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(llm_priority("analysis"))])
 
 
 # ── Helpers ───────────────────────────────────────────────────────────────────
@@ -72,6 +73,7 @@ def _llm_error(exc: Exception) -> HTTPException:
     "/workflow/extract",
     response_model=ExtractTasksResponse,
     status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(llm_priority("background"))],  # bulk extraction yields to chat
 )
 async def extract_tasks(
     project_id: str,
@@ -60,6 +60,7 @@ class ChatResponse(BaseModel):
     provider: str
     latency_ms: float
     message_id: UUID
+    cache_hit: bool = False  # served from the semantic answer cache
 
     @field_serializer("message_id")
     def serialize_uuid(self, v: UUID) -> str:
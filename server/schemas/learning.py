@@ -21,6 +21,10 @@ class SummarizeRequest(BaseModel):
     level: str = Field(..., pattern="^(short|detailed|comprehensive)$")
 
 
+class AnalyzeRequest(BaseModel):
+    level: str = Field("short", pattern="^(short|detailed|comprehensive)$")
+
+
 # ── Responses ─────────────────────────────────────────────────────────────────
 
 class DocumentResponse(BaseModel):
@@ -57,3 +61,10 @@ class ConceptsResponse(BaseModel):
 
 class StepsResponse(BaseModel):
     steps: list[str]
+
+
+class AnalyzeResponse(BaseModel):
+    summary: str
+    level: str
+    concepts: list[ConceptItem]
+    steps: list[str]
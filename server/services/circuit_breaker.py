@@ -0,0 +1,108 @@
+"""
+Per-provider circuit breaker for the LLM fallback chain.
+
+States:
+  closed     — calls flow normally; consecutive trip errors are counted
+  open       — after `failure_threshold` trip errors the provider is skipped
+               for `recovery_seconds`
+  half_open  — once the cool-down has passed a single probe call is let
+               through; success closes the breaker, failure re-opens it. A
+               call that gives up before reaching the provider (rate-limit
+               cool-down, busy limiter) hands the probe back
+
+Trip errors are 429s, 5xx responses, timeouts and connection errors —
+the failures that say "this provider is unhealthy right now", not
+"this request was bad".
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any, Optional
+
+from config import settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: Optional[int] = None,
+        recovery_seconds: Optional[float] = None,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold or settings.llm_breaker_failure_threshold
+        self.recovery_seconds = recovery_seconds or settings.llm_breaker_recovery_seconds
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_started_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.successes = 0
+        self.failures = 0
+        self.skipped = 0
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        """Return True if a call may be sent to the provider now."""
+        now = time.monotonic()
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and now - self.opened_at >= self.recovery_seconds:
+            self.state = HALF_OPEN
+            self.probe_started_at = None
+        if self.state == HALF_OPEN:
+            # One probe at a time; a probe that never reported back (e.g. the
+            # request was cancelled) is replaced after another cool-down.
+            if self.probe_started_at is None or now - self.probe_started_at >= self.recovery_seconds:
+                self.probe_started_at = now
+                return True
+        self.skipped += 1
+        return False
+
+    def release_probe(self) -> None:
+        """Give back the probe claimed by allow() for a call that never reached the provider."""
+        if self.state == HALF_OPEN:
+            self.probe_started_at = None
+
+    def record_success(self) -> None:
+        self.successes += 1
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = None
+        self.probe_started_at = None
+
+    def record_failure(self, reason: str) -> None:
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = reason
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.trip()
+
+    def trip(self) -> None:
+        if self.state != OPEN:
+            self.times_opened += 1
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.probe_started_at = None
+
+    def snapshot(self) -> dict[str, Any]:
+        retry_in = None
+        if self.state == OPEN:
+            retry_in = max(0.0, self.recovery_seconds - (time.monotonic() - self.opened_at))
+        return {
+            "provider": self.name,
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "retry_in_seconds": round(retry_in, 1) if retry_in is not None else None,
+            "last_error": self.last_error,
+            "successes": self.successes,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "times_opened": self.times_opened,
+        }
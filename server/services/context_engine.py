@@ -8,15 +8,18 @@ into a unified context and performs RAG retrieval via pgvector.
 from __future__ import annotations
 
 import logging
-from typing import Any
+from typing import Any, Optional
 
 from sqlalchemy.orm import Session
 
+from config import settings
 from models.project import Project
 from models.document import Document
 from models.code_insight import CodeInsight
 from models.task import Task
+from services import deadline, semantic_cache
 from services.embedding_service import generate_embedding, similarity_search
+from services.token_budget import truncate_to_tokens
 
 logger = logging.getLogger(__name__)
 
@@ -114,15 +117,17 @@ async def retrieve_relevant_chunks(
     query: str,
     db: Session,
     top_k: int = 5,
+    query_embedding: Optional[list[float]] = None,
 ) -> list[dict]:
     """
-    Generate a query embedding and run cosine similarity search against
-    the project's stored embeddings.
+    Generate a query embedding (unless one is passed in) and run cosine
+    similarity search against the project's stored embeddings.
 
     Returns list of {source_type, source_id, chunk_preview, distance}.
     """
     try:
-        query_embedding = await generate_embedding(query)
+        if query_embedding is None:
+            query_embedding = await generate_embedding(query)
         chunks = await similarity_search(db, project_id, query_embedding, top_k=top_k)
         logger.info(
             "Retrieved %d relevant chunks for project=%s query=%s…",
@@ -138,24 +143,45 @@ async def retrieve_relevant_chunks(
 
 # ── Build augmented prompt ────────────────────────────────────────────────────
 
-async def build_context_prompt(
+async def build_context_parts(
     project_id: str,
     user_query: str,
     db: Session,
-) -> tuple[str, list[dict]]:
+    query_embedding: Optional[list[float]] = None,
+    token_budget: Optional[int] = None,
+) -> tuple[str, str, list[dict]]:
     """
-    Build the full augmented prompt for the LLM.
-
-    Returns (prompt_string, context_references) where context_references
-    is a list of {source_type, source_id, chunk_preview} used for attribution.
+    Build the augmented prompt as (prefix, suffix, context_references).
+
+    The prefix (project context + recent activity) only changes when the
+    project does, so providers can cache it across chat turns; the suffix
+    holds what changes every turn (retrieved knowledge + the user query).
+    context_references is a list of {source_type, source_id, chunk_preview}
+    used for attribution. Pass *query_embedding* when the caller has
+    already embedded the query.
+
+    *token_budget* (default settings.chat_context_max_tokens) is shared out
+    between retrieved chunks (60%) and recent document summaries / code
+    insights (40%), so each item is cut only as far as it must be.
+    Retrieval is skipped when the request deadline is close.
     """
     context = await get_full_context(project_id, db)
     if not context:
-        return user_query, []
+        return "", user_query, []
+
+    chunks: list[dict] = []
+    if deadline.allows_optional("knowledge retrieval"):
+        chunks = await retrieve_relevant_chunks(
+            project_id, user_query, db, top_k=5, query_embedding=query_embedding,
+        )
 
-    chunks = await retrieve_relevant_chunks(project_id, user_query, db, top_k=5)
+    # --- Token budget per item ---
+    budget = token_budget if token_budget is not None else settings.chat_context_max_tokens
+    chunk_tokens = int(budget * 0.6) // max(1, len(chunks))
+    n_recent = len(context["documents"]) + len(context["code_insights"])
+    recent_tokens = int(budget * 0.4) // max(1, n_recent)
 
-    # ── Assemble the prompt sections ──────────────────────────────────────
+    # ── Stable prefix ─────────────────────────────────────────────────────
     sections: list[str] = []
 
     # --- Project context ---
@@ -170,25 +196,18 @@ async def build_context_prompt(
     if proj["open_questions"]:
         sections.append(f"Open Questions: {', '.join(proj['open_questions'])}")
 
-    # --- Relevant knowledge (from vector search) ---
-    if chunks:
-        sections.append("\n=== RELEVANT KNOWLEDGE ===")
-        for i, chunk in enumerate(chunks, 1):
-            preview = chunk["content_chunk"][:500]
-            sections.append(f"[{i}] ({chunk['source_type']}) {preview}")
-
     # --- Recent activity ---
     sections.append("\n=== RECENT ACTIVITY ===")
     if context["documents"]:
         sections.append("Recent Documents:")
         for doc in context["documents"]:
-            summary_preview = (doc["summary"] or "")[:200]
+            summary_preview = truncate_to_tokens(doc["summary"] or "", recent_tokens)
             sections.append(f"  - {doc['filename']}: {summary_preview}")
 
     if context["code_insights"]:
         sections.append("Recent Code Insights:")
         for ci in context["code_insights"]:
-            explanation_preview = (ci["explanation"] or "")[:200]
+            explanation_preview = truncate_to_tokens(ci["explanation"] or "", recent_tokens)
             sections.append(f"  - [{ci['language']}] {explanation_preview}")
 
     if context["tasks"]:
@@ -196,10 +215,22 @@ async def build_context_prompt(
         for task in context["tasks"]:
             sections.append(f"  - [{task['priority']}] {task['description']}")
 
+    prefix = "\n".join(sections)
+
+    # ── Per-turn suffix ───────────────────────────────────────────────────
+    sections = []
+
+    # --- Relevant knowledge (from vector search) ---
+    if chunks:
+        sections.append("\n=== RELEVANT KNOWLEDGE ===")
+        for i, chunk in enumerate(chunks, 1):
+            preview = truncate_to_tokens(chunk["content_chunk"], chunk_tokens)
+            sections.append(f"[{i}] ({chunk['source_type']}) {preview}")
+
     # --- User query ---
     sections.append(f"\n=== USER QUERY ===\n{user_query}")
 
-    prompt = "\n".join(sections)
+    suffix = "\n".join(sections)
 
     # Build context references for attribution
     context_refs = [
@@ -211,7 +242,25 @@ async def build_context_prompt(
         for chunk in chunks
     ]
 
-    return prompt, context_refs
+    return prefix, suffix, context_refs
+
+
+async def build_context_prompt(
+    project_id: str,
+    user_query: str,
+    db: Session,
+    query_embedding: Optional[list[float]] = None,
+    token_budget: Optional[int] = None,
+) -> tuple[str, list[dict]]:
+    """
+    Build the full augmented prompt for the LLM as one string.
+
+    Returns (prompt_string, context_references); see build_context_parts().
+    """
+    prefix, suffix, context_refs = await build_context_parts(
+        project_id, user_query, db, query_embedding=query_embedding, token_budget=token_budget,
+    )
+    return (f"{prefix}\n{suffix}" if prefix else suffix), context_refs
 
 
 # ── Update context (called by other modules) ─────────────────────────────────
@@ -247,4 +296,5 @@ async def update_context(
         return
 
     db.commit()
+    semantic_cache.invalidate(project_id)
     logger.info("Context updated: project=%s type=%s", project_id, update_type)
@@ -0,0 +1,114 @@
+"""
+Per-request deadlines.
+
+Routers start a deadline for their requests — from the X-Request-Timeout
+header (seconds) or the router's default — through the
+middleware.deadline.request_deadline() dependency. Everything awaited
+while serving the request can then ask how much time is left:
+
+  LLMService     a generate() caller stops waiting once the time is up
+                 (DeadlineExceeded); a stream's provider hops are bounded by
+                 the time remaining and no further hop starts after it
+  embeddings     bounded the same way
+  optional work  query retrieval and the LLM drift check are skipped once
+                 less than settings.request_deadline_optional_min_seconds
+                 remains
+
+The deadline lives in a ContextVar, so each request sees its own and work
+started outside a request (startup, background tasks) has none.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from contextvars import ContextVar
+from typing import AsyncIterator, Awaitable, Optional, TypeVar
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# time.monotonic() by which the current request must be answered
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's deadline passed before *stage* could finish."""
+
+
+def start(seconds: float) -> None:
+    """Give the current request *seconds* from now."""
+    _deadline.set(time.monotonic() + seconds)
+
+
+def clear() -> None:
+    """Drop the current context's deadline (work shared by several requests)."""
+    _deadline.set(None)
+
+
+def current() -> Optional[float]:
+    """The current request's deadline (time.monotonic()), or None without one."""
+    return _deadline.get()
+
+
+def remaining(at: Optional[float] = None) -> Optional[float]:
+    """Seconds left until *at* (default: the current request's deadline); None without a deadline."""
+    at = current() if at is None else at
+    return None if at is None else at - time.monotonic()
+
+
+def expired(at: Optional[float] = None) -> bool:
+    left = remaining(at)
+    return left is not None and left <= 0
+
+
+def allows_optional(stage: str) -> bool:
+    """False (and logged) if too little time is left for optional *stage*."""
+    left = remaining()
+    if left is None or left >= settings.request_deadline_optional_min_seconds:
+        return True
+    logger.info("Skipping %s — %.1fs left before the request deadline", stage, max(left, 0.0))
+    return False
+
+
+async def bounded(aw: Awaitable[T], stage: str, at: Optional[float] = None) -> T:
+    """Await *aw*, cancelling it with DeadlineExceeded if the deadline passes first."""
+    left = remaining(at)
+    if left is None:
+        return await aw
+    if left <= 0:
+        if asyncio.iscoroutine(aw):
+            aw.close()  # never started
+        raise DeadlineExceeded(f"request deadline passed before {stage}")
+    try:
+        return await asyncio.wait_for(aw, left)
+    except asyncio.TimeoutError as exc:
+        if isinstance(exc, DeadlineExceeded):
+            raise
+        raise DeadlineExceeded(f"request deadline passed during {stage}") from exc
+
+
+async def first_within(stream: AsyncIterator[T], stage: str, at: Optional[float] = None) -> AsyncIterator[T]:
+    """Yield from *stream*, giving up if its first item doesn't arrive before the deadline.
+
+    Once a stream has started it is left to finish — cutting off an answer
+    the user is already reading helps nobody.
+    """
+    iterator = stream.__aiter__()
+    try:
+        try:
+            first = await bounded(iterator.__anext__(), stage, at)
+        except StopAsyncIteration:
+            return
+        yield first
+        async for item in iterator:
+            yield item
+    finally:
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
@@ -14,56 +14,47 @@ import json
 import logging
 from typing import Any
 
-from services.llm_service import get_llm_service
+from services.llm_service import LLMService, get_llm_service
 from services.prompts.developer_prompts import (
     EXPLAIN_CODE,
     DEBUG_CODE,
     GENERATE_README,
-    STRICT_JSON_SUFFIX,
 )
-from services.utils import parse_json_object
+from services.token_budget import estimate_tokens, truncate_to_tokens
 
 logger = logging.getLogger(__name__)
 
-MAX_LINES = 600  # truncate code beyond this many lines
+FRAMING_TOKENS = 96  # language / project-name lines, code fences and the truncation note
 
 
 # ── Helpers ───────────────────────────────────────────────────────────────────
 
-def _truncate_code(code: str) -> tuple[str, bool]:
-    """Return (possibly-truncated code, was_truncated)."""
-    lines = code.splitlines()
-    if len(lines) <= MAX_LINES:
+def _truncate_code(code: str, llm: LLMService, system_prompt: str) -> tuple[str, bool]:
+    """Return (code cut to whole lines within the chain's input budget, was_truncated)."""
+    budget = llm.prompt_budget(system_prompt) - FRAMING_TOKENS
+    profile = llm.profile(llm.sizing_provider)
+    if estimate_tokens(code, profile) <= budget:
         return code, False
-    truncated = (
-        "\n".join(lines[:MAX_LINES])
-        + f"\n\n# ... [{len(lines) - MAX_LINES} lines truncated for analysis]"
-    )
-    logger.info("Code truncated from %d → %d lines", len(lines), MAX_LINES)
+    kept = truncate_to_tokens(code, budget, profile)
+    kept = kept[: kept.rfind("\n")] if "\n" in kept else kept
+    total_lines = len(code.splitlines())
+    kept_lines = len(kept.splitlines())
+    truncated = kept + f"\n\n# ... [{total_lines - kept_lines} lines truncated for analysis]"
+    logger.info("Code truncated from %d → %d lines (≈%d tokens)", total_lines, kept_lines, budget)
     return truncated, True
 
 
-def _clean_json(raw: str) -> str:
-    raw = raw.strip()
-    raw = re.sub(r"^```(?:json)?\s*", "", raw)
-    raw = re.sub(r"\s*```$", "", raw)
-    return raw.strip()
-
-
-def _parse_json(raw: str) -> dict[str, Any]:
-    return json.loads(_clean_json(raw))
-
-
-async def _llm_json(prompt: str, system_prompt: str, mode: str = "cloud") -> dict[str, Any]:
-    """Call LLM, parse JSON. Retry once with strict suffix on malformed JSON."""
+async def _llm_json(
+    prompt: str,
+    system_prompt: str,
+    mode: str = "cloud",
+    call_type: str = "code",
+    cache: bool = False,
+) -> dict[str, Any]:
+    """Call LLM in JSON mode and parse the reply (see LLMService.generate_json)."""
     llm = get_llm_service(mode)
-    text, provider, _ = await llm.generate(prompt, system_prompt)
-    try:
-        return parse_json_object(text)
-    except (ValueError, Exception):
-        logger.warning("Malformed JSON from %s — retrying with strict suffix", provider)
-        text2, _, _ = await llm.generate(prompt, system_prompt + STRICT_JSON_SUFFIX)
-        return parse_json_object(text2)
+    data, _, _ = await llm.generate_json(prompt, system_prompt, call_type=call_type, cache=cache)
+    return data
 
 
 # ── Public API ────────────────────────────────────────────────────────────────
@@ -73,9 +64,9 @@ async def explain(code: str, language: str, mode: str = "cloud") -> dict[str, An
     Return a dict with keys: overview, components, patterns, complexity, truncated.
     Also returns serialised storage fields: explanation_json, components_list, suggestions_list.
     """
-    code, truncated = _truncate_code(code)
+    code, truncated = _truncate_code(code, get_llm_service(mode).for_call_type("code"), EXPLAIN_CODE)
     prompt = f"Language: {language}\n\n```{language}\n{code}\n```"
-    data = await _llm_json(prompt, EXPLAIN_CODE, mode)
+    data = await _llm_json(prompt, EXPLAIN_CODE, mode, cache=True)
 
     overview = data.get("overview", "")
     components = data.get("components", [])
@@ -109,9 +100,9 @@ async def debug(code: str, language: str, mode: str = "cloud") -> dict[str, Any]
     """
     Return a dict with keys: bugs, edge_cases, inefficiencies, truncated.
     """
-    code, truncated = _truncate_code(code)
+    code, truncated = _truncate_code(code, get_llm_service(mode).for_call_type("code"), DEBUG_CODE)
     prompt = f"Language: {language}\n\n```{language}\n{code}\n```"
-    data = await _llm_json(prompt, DEBUG_CODE, mode)
+    data = await _llm_json(prompt, DEBUG_CODE, mode, cache=True)
 
     bugs = data.get("bugs", [])
     edge_cases = data.get("edge_cases", [])
@@ -147,10 +138,10 @@ async def generate_readme(code: str, language: str, project_name: str | None, mo
     """
     Return a dict with keys: readme, truncated.
     """
-    code, truncated = _truncate_code(code)
+    code, truncated = _truncate_code(code, get_llm_service(mode).for_call_type("readme"), GENERATE_README)
     name_hint = f"Project name: {project_name}\n\n" if project_name else ""
     prompt = f"{name_hint}Language: {language}\n\n```{language}\n{code}\n```"
-    data = await _llm_json(prompt, GENERATE_README, mode)
+    data = await _llm_json(prompt, GENERATE_README, mode, call_type="readme")
 
     readme = data.get("readme", "")
     overview = (readme.splitlines()[0].lstrip("# ") or "README")[:120]
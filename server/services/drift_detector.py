@@ -11,7 +11,6 @@ Returns a list of DriftWarning dicts:
 
 from __future__ import annotations
 
-import json
 import logging
 import re
 from typing import Any
@@ -19,6 +18,7 @@ from typing import Any
 from sqlalchemy.orm import Session
 
 from models.project import Project
+from services import deadline
 from services.llm_service import get_llm_service
 from services.prompts.drift_prompts import DRIFT_CHECK_SYSTEM_PROMPT
 
@@ -182,22 +182,18 @@ async def _llm_based_check(
 
     llm = get_llm_service(mode)
     try:
-        raw, _, _ = await llm.generate(
+        # Repairs fences / truncation locally; only a verdict that parses is cached
+        data, _, _ = await llm.generate_json(
             prompt=prompt,
             system_prompt=DRIFT_CHECK_SYSTEM_PROMPT,
             temperature=0.0,
             max_tokens=1024,
+            call_type="drift",
+            cache=True,
         )
-
-        # Strip possible markdown fences
-        clean = raw.strip()
-        if clean.startswith("```"):
-            clean = re.sub(r"^```[a-z]*\n?", "", clean).rstrip("`").strip()
-
-        data = json.loads(clean)
         if data.get("has_violations") and data.get("violations"):
             return data["violations"]
-    except json.JSONDecodeError as exc:
+    except ValueError as exc:
         logger.warning("Drift LLM response was not valid JSON: %s", exc)
     except Exception as exc:
         logger.warning("Drift LLM check failed: %s", exc)
@@ -229,7 +225,10 @@ async def check_drift(
     rule_warnings = _rule_based_check(constraints, llm_response)
 
     # ── Layer 2: LLM-based ────────────────────────────────────────────────
-    llm_warnings = await _llm_based_check(constraints, llm_response, mode=mode)
+    # Optional: skipped when the request deadline is close
+    llm_warnings: list[dict[str, Any]] = []
+    if deadline.allows_optional("LLM drift check"):
+        llm_warnings = await _llm_based_check(constraints, llm_response, mode=mode)
 
     # Merge — deduplicate by description prefix (first 60 chars)
     seen: set[str] = {w["description"][:60] for w in rule_warnings}
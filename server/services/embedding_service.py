@@ -1,5 +1,10 @@
 """
 Embedding generation (Gemini text-embedding-004) and pgvector similarity search.
+
+Concurrent requests for the same text share one in-flight embedding call.
+Calls go through the SDK's async client, so they don't block the event loop
+and are abandoned when the request that made them is cancelled or runs out
+of time (services/deadline.py).
 """
 
 from __future__ import annotations
@@ -11,6 +16,8 @@ from sqlalchemy.orm import Session
 from sqlalchemy import text as sql_text
 
 from config import settings
+from services import deadline
+from services.singleflight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +25,7 @@ EMBEDDING_MODEL = "text-embedding-004"
 EMBEDDING_DIM = 768
 
 _client = None
+_inflight = SingleFlight("embedding")
 
 
 def _get_client():
@@ -32,8 +40,13 @@ def _get_client():
 
 async def generate_embedding(text: str) -> list[float]:
     """Generate a 768-d embedding for a single text string."""
+    vector = await deadline.bounded(_inflight.do((EMBEDDING_MODEL, text), lambda: _embed(text)), "embedding")
+    return list(vector)  # callers may mutate their copy
+
+
+async def _embed(text: str) -> list[float]:
     client = _get_client()
-    response = client.models.embed_content(
+    response = await client.aio.models.embed_content(
         model=EMBEDDING_MODEL,
         contents=text,
     )
@@ -43,6 +56,11 @@ async def generate_embedding(text: str) -> list[float]:
     return list(vector)
 
 
+def coalescing_stats() -> dict:
+    """Single-flight counters for single-text embedding calls."""
+    return _inflight.stats()
+
+
 # ── Batch embeddings ──────────────────────────────────────────────────────────
 
 async def generate_embeddings_batch(texts: list[str]) -> list[list[float]]:
@@ -50,9 +68,9 @@ async def generate_embeddings_batch(texts: list[str]) -> list[list[float]]:
     if not texts:
         return []
     client = _get_client()
-    response = client.models.embed_content(
-        model=EMBEDDING_MODEL,
-        contents=texts,
+    response = await deadline.bounded(
+        client.aio.models.embed_content(model=EMBEDDING_MODEL, contents=texts),
+        "batch embedding",
     )
     return [list(e.values) for e in response.embeddings]
 
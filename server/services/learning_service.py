@@ -5,25 +5,43 @@ extraction, and implementation-step generation.
 Every function:
 1. Picks the right system prompt
 2. Calls the LLM
-3. Parses the JSON response (retries once on malformed JSON)
+3. Parses the JSON response (provider JSON mode, local repair, one strict retry)
 4. Returns a typed result
+
+Documents too long for one call are summarised map-reduce: sections are
+summarised concurrently (bounded fan-out), the section notes are merged
+hierarchically until they fit, and the level prompt is applied once to
+the result. Section notes are keyed by content hash so they can be
+persisted and reused across re-summarises and level changes.
+
+analyze() produces summary, concepts and steps together — in one
+structured call when the model's output budget allows, otherwise as three
+concurrent calls over the same document text.
 """
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import logging
-from typing import Any
+from typing import Any, Optional
 
+from config import settings
+from services import llm_scheduler
 from services.llm_service import LLMService, get_llm_service
 from services.prompts.learning_prompts import (
     SUMMARIZE_SHORT,
     SUMMARIZE_DETAILED,
     SUMMARIZE_COMPREHENSIVE,
+    SUMMARIZE_SECTION,
+    MERGE_SECTION_SUMMARIES,
+    SECTION_NOTES_PREAMBLE,
     EXTRACT_CONCEPTS,
     IMPLEMENTATION_STEPS,
-    STRICT_JSON_SUFFIX,
+    analyze_document_prompt,
 )
-from services.utils import clean_json, parse_json_object
+from services.token_budget import estimate_tokens, fit_text, split_by_tokens
+from services.utils import clean_json
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +51,26 @@ _SUMMARY_PROMPTS = {
     "comprehensive": SUMMARIZE_COMPREHENSIVE,
 }
 
+ANALYSIS_MAX_TOKENS = 8_192  # output room for summary + concepts + steps in one response
+
+# Shape each analysis artefact must have; anything else counts as missing
+_ARTEFACT_SHAPES = {
+    "summary": lambda v: isinstance(v, str),
+    "concepts": lambda v: isinstance(v, list) and all(isinstance(c, dict) for c in v),
+    "steps": lambda v: isinstance(v, list) and all(isinstance(s, str) for s in v),
+}
+
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+
+def _fit_document(llm: LLMService, raw_text: str, system_prompt: str, marker: str = "") -> str:
+    """Trim *raw_text* to the chain's input budget (context window − output)."""
+    budget = llm.prompt_budget(system_prompt)
+    text, truncated = fit_text(raw_text, budget, llm.profile(llm.sizing_provider), marker)
+    if truncated:
+        logger.info("Document truncated to ≈%d tokens for %s", budget, llm.sizing_provider.name)
+    return text
+
 
 # ── JSON helpers ──────────────────────────────────────────────────────────────
 
@@ -40,53 +78,218 @@ async def _llm_json(
     llm: LLMService,
     prompt: str,
     system_prompt: str,
+    call_type: str,
+    max_tokens: int = 4096,
 ) -> dict[str, Any]:
-    """Call LLM, parse JSON. On failure, retry once with stricter instructions."""
-    text, provider, latency = await llm.generate(prompt, system_prompt)
+    """Call LLM in JSON mode and parse the reply (see LLMService.generate_json).
+
+    Results are cached by content, so resubmitting the same document is free.
+    """
+    data, _, _ = await llm.generate_json(
+        prompt, system_prompt, max_tokens=max_tokens, call_type=call_type, cache=True,
+    )
+    return data
+
+
+# ── Map-reduce summarisation ──────────────────────────────────────────────────
+
+def section_key(section: str) -> str:
+    """Content hash of a map section (and of the prompt that summarises it)."""
+    return hashlib.sha256(f"{SUMMARIZE_SECTION}\0{section}".encode("utf-8")).hexdigest()[:32]
+
+
+def _join_notes(notes: list[str]) -> str:
+    return "\n\n---\n\n".join(notes)
+
+
+async def _summarise_text(llm: LLMService, text: str, system_prompt: str, slots: asyncio.Semaphore) -> str:
+    async with slots:
+        data = await _llm_json(llm, text, system_prompt, "summarise")
+    return data.get("summary", str(data))
+
+
+async def _map_sections(
+    llm: LLMService,
+    raw_text: str,
+    section_cache: dict[str, str],
+    slots: asyncio.Semaphore,
+) -> list[str]:
+    """Summarise every section concurrently, reusing cached notes.
+
+    *section_cache* is rewritten to hold the notes of exactly the current
+    sections — including those that finished if another one failed or the
+    request was cancelled.
+    """
+    size = min(settings.summary_section_tokens, llm.prompt_budget(SUMMARIZE_SECTION))
+    sections = split_by_tokens(raw_text, size, llm.profile(llm.sizing_provider))
+    keys = [section_key(s) for s in sections]
+    reused = sum(key in section_cache for key in keys)
+
+    async def one(section: str, key: str) -> str:
+        if key in section_cache:
+            return section_cache[key]
+        return await _summarise_text(llm, section, SUMMARIZE_SECTION, slots)
+
+    with llm_scheduler.priority("background"):  # one call per section; chat turns go first
+        tasks = [asyncio.ensure_future(one(s, k)) for s, k in zip(sections, keys)]
     try:
-        return parse_json_object(text)
-    except (ValueError, Exception):
-        logger.warning("Malformed JSON from %s — retrying with strict suffix", provider)
-        text2, provider2, latency2 = await llm.generate(
-            prompt,
-            system_prompt + STRICT_JSON_SUFFIX,
-        )
-        return parse_json_object(text2)  # let it raise if still bad
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        done = {
+            key: task.result()
+            for key, task in zip(keys, tasks)
+            if task.done() and not task.cancelled() and task.exception() is None
+        }
+        section_cache.clear()
+        section_cache.update(done)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    logger.info("Summary map step: %d sections, %d reused from cache", len(sections), reused)
+    return list(results)
+
+
+async def _reduce_notes(llm: LLMService, notes: list[str], target: int, slots: asyncio.Semaphore) -> str:
+    """Merge section notes level by level until they fit in *target* tokens."""
+    profile = llm.profile(llm.sizing_provider)
+    merge_budget = min(target, llm.prompt_budget(MERGE_SECTION_SUMMARIES))
+    depth = 0
+    while True:
+        joined = _join_notes(notes)
+        if len(notes) == 1 or estimate_tokens(joined, profile) <= target:
+            return joined
+
+        groups: list[list[str]] = [[]]
+        group_tokens = 0
+        for note in notes:
+            tokens = estimate_tokens(note, profile)
+            if groups[-1] and group_tokens + tokens > merge_budget:
+                groups.append([])
+                group_tokens = 0
+            groups[-1].append(note)
+            group_tokens += tokens
+        if len(groups) == len(notes):
+            # No two notes fit together — nothing left to merge, so trim
+            return fit_text(joined, target, profile)[0]
+
+        depth += 1
+        logger.info("Summary reduce level %d: %d notes → %d", depth, len(notes), len(groups))
+        merged = iter(await asyncio.gather(*(
+            _summarise_text(llm, _join_notes(group), MERGE_SECTION_SUMMARIES, slots)
+            for group in groups
+            if len(group) > 1
+        )))
+        notes = [next(merged) if len(group) > 1 else group[0] for group in groups]
+
+
+async def _condense(
+    llm: LLMService,
+    raw_text: str,
+    target: int,
+    section_cache: Optional[dict[str, str]],
+) -> str:
+    """Return *raw_text* itself, or map-reduced section notes if it exceeds *target* tokens."""
+    if estimate_tokens(raw_text, llm.profile(llm.sizing_provider)) <= target:
+        return raw_text
+    slots = asyncio.Semaphore(settings.summary_map_concurrency)
+    cache = section_cache if section_cache is not None else {}
+    notes = await _map_sections(llm, raw_text, cache, slots)
+    return SECTION_NOTES_PREAMBLE + await _reduce_notes(llm, notes, target, slots)
 
 
 # ── Public API ────────────────────────────────────────────────────────────────
 
-async def summarise(raw_text: str, level: str, mode: str = "cloud") -> str:
-    """Return a summary string for the given level."""
+async def summarise(
+    raw_text: str,
+    level: str,
+    mode: str = "cloud",
+    section_cache: Optional[dict[str, str]] = None,
+) -> str:
+    """Return a summary string for the given level.
+
+    Documents longer than settings.summary_map_reduce_threshold_tokens (or
+    the chain's input budget) are summarised map-reduce. Pass the
+    document's persisted section notes as *section_cache*; it is updated in
+    place for the caller to save back.
+    """
     system_prompt = _SUMMARY_PROMPTS.get(level, SUMMARIZE_SHORT)
-    llm = get_llm_service(mode)
+    llm = get_llm_service(mode).for_call_type("summarise")
+    target = min(llm.prompt_budget(system_prompt), settings.summary_map_reduce_threshold_tokens)
+    text = await _condense(llm, raw_text, target, section_cache)
+    data = await _llm_json(llm, text, system_prompt, "summarise")
+    return data.get("summary", str(data))
 
-    # Trim very long texts to ~12 000 words to stay within context window
-    words = raw_text.split()
-    if len(words) > 12_000:
-        raw_text = " ".join(words[:12_000]) + "\n\n[Text truncated for summarisation]"
 
-    data = await _llm_json(llm, raw_text, system_prompt)
-    return data.get("summary", str(data))
+async def analyze(
+    raw_text: str,
+    level: str = "short",
+    mode: str = "cloud",
+    section_cache: Optional[dict[str, str]] = None,
+) -> dict[str, Any]:
+    """Return {summary, concepts, steps} for a document.
+
+    The document is sent once, with one structured prompt, when the model
+    it is sized for (LLMService.sizing_provider) can produce all three
+    artefacts in a single response. Otherwise the three prompts run
+    concurrently over the same text; an artefact the combined call returns
+    in the wrong shape (e.g. steps as one string) is fetched the same way.
+    Long documents are condensed to map-reduced section notes first (see
+    summarise()).
+    """
+    llm = get_llm_service(mode).for_call_type("analyze_document")
+    system_prompt = analyze_document_prompt(level)
+    target = min(
+        llm.prompt_budget(system_prompt, max_tokens=ANALYSIS_MAX_TOKENS),
+        settings.summary_map_reduce_threshold_tokens,
+    )
+    text = await _condense(llm, raw_text, target, section_cache)
+
+    if llm.profile(llm.sizing_provider).max_output >= ANALYSIS_MAX_TOKENS:
+        data = await _llm_json(llm, text, system_prompt, "analyze_document", max_tokens=ANALYSIS_MAX_TOKENS)
+        result = {key: _artefact(data, key) for key in _ARTEFACT_SHAPES}
+    else:
+        result = {"summary": None, "concepts": None, "steps": None}
+
+    # Anything the combined call didn't return (or couldn't fit) is fetched
+    # separately, concurrently, over the same text.
+    prompts = {
+        "summary": _SUMMARY_PROMPTS.get(level, SUMMARIZE_SHORT),
+        "concepts": EXTRACT_CONCEPTS,
+        "steps": IMPLEMENTATION_STEPS,
+    }
+    missing = [key for key, value in result.items() if value is None]
+    if missing:
+        logger.info("Document analysis: fetching %s separately", ", ".join(missing))
+        fetched = await asyncio.gather(*(
+            _llm_json(llm, _fit_document(llm, text, prompts[key]), prompts[key], "analyze_document")
+            for key in missing
+        ))
+        for key, data in zip(missing, fetched):
+            value = _artefact(data, key)
+            result[key] = value if value is not None else (str(data) if key == "summary" else [])
+    return result
+
+
+def _artefact(data: dict[str, Any], key: str) -> Any:
+    """data[key] if it has the shape the artefact needs, else None (missing)."""
+    value = data.get(key)
+    if value is not None and not _ARTEFACT_SHAPES[key](value):
+        logger.warning("Document analysis: ignoring %s of type %s", key, type(value).__name__)
+        return None
+    return value
 
 
 async def extract_concepts(raw_text: str, mode: str = "cloud") -> list[dict]:
     """Return a list of concept dicts."""
-    llm = get_llm_service(mode)
-    words = raw_text.split()
-    if len(words) > 12_000:
-        raw_text = " ".join(words[:12_000])
-
-    data = await _llm_json(llm, raw_text, EXTRACT_CONCEPTS)
+    llm = get_llm_service(mode).for_call_type("extract")
+    raw_text = _fit_document(llm, raw_text, EXTRACT_CONCEPTS)
+    data = await _llm_json(llm, raw_text, EXTRACT_CONCEPTS, "extract")
     return data.get("concepts", [])
 
 
 async def generate_steps(raw_text: str, mode: str = "cloud") -> list[str]:
     """Return a list of implementation step strings."""
-    llm = get_llm_service(mode)
-    words = raw_text.split()
-    if len(words) > 12_000:
-        raw_text = " ".join(words[:12_000])
-
-    data = await _llm_json(llm, raw_text, IMPLEMENTATION_STEPS)
+    llm = get_llm_service(mode).for_call_type("extract")
+    raw_text = _fit_document(llm, raw_text, IMPLEMENTATION_STEPS)
+    data = await _llm_json(llm, raw_text, IMPLEMENTATION_STEPS, "extract")
     return data.get("steps", [])
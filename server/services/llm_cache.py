@@ -0,0 +1,172 @@
+"""
+Content-addressed cache for deterministic LLM results.
+
+Keys are a SHA-256 over (provider chain, models, system prompt, prompt,
+temperature, max_tokens), so a resubmitted summary, concept extraction,
+code explanation or drift verdict is served without another LLM call.
+
+Two tiers:
+  1. Bounded in-memory LRU (per process)
+  2. Optional SQLite file shared by every worker on the host
+     (settings.llm_cache_sqlite_path; empty disables it)
+
+Entries expire after a TTL. Hit/miss counters are exposed via stats().
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Sequence
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(
+    chain: Sequence[tuple[str, str]],
+    system_prompt: str,
+    prompt: str,
+    temperature: float,
+    max_tokens: int,
+    json_mode: bool = False,
+) -> str:
+    """Hash an LLM request. *chain* is [(provider_name, model), ...] in order."""
+    fields = [list(chain), system_prompt, prompt, round(temperature, 4), max_tokens]
+    if json_mode:
+        fields.append("json")  # appended only when set, so existing keys stay valid
+    material = json.dumps(fields, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LLMResultCache:
+    """In-memory LRU with an optional SQLite tier behind it."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 86_400, sqlite_path: str = ""):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # key → (expires_at, text, provider)
+        self._memory: OrderedDict[str, tuple[float, str, str]] = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "sqlite_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            with self._db_lock:
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_cache ("
+                    " key TEXT PRIMARY KEY, text TEXT NOT NULL,"
+                    " provider TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+                self._db.commit()
+
+    # ── Memory tier ───────────────────────────────────────────────────────
+
+    def _memory_get(self, key: str) -> Optional[tuple[str, str]]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        expires_at, text, provider = entry
+        if time.time() >= expires_at:
+            self._memory.pop(key, None)
+            return None
+        self._memory.move_to_end(key)
+        return text, provider
+
+    def _memory_set(self, key: str, text: str, provider: str, expires_at: float) -> None:
+        self._memory[key] = (expires_at, text, provider)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    # ── SQLite tier (runs in a worker thread) ─────────────────────────────
+
+    def _sqlite_get(self, key: str) -> Optional[tuple[str, str, float]]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT text, provider, expires_at FROM llm_cache WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def _sqlite_set(self, key: str, text: str, provider: str, expires_at: float) -> None:
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, text, provider, expires_at) VALUES (?, ?, ?, ?)",
+                (key, text, provider, expires_at),
+            )
+            self._db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+
+    # ── Public API ────────────────────────────────────────────────────────
+
+    async def get(self, key: str) -> Optional[tuple[str, str]]:
+        """Return (text, provider) for *key*, or None on a miss."""
+        hit = self._memory_get(key)
+        if hit is not None:
+            self._counters["memory_hits"] += 1
+            return hit
+        if self._db is not None:
+            row = await asyncio.to_thread(self._sqlite_get, key)
+            if row is not None:
+                text, provider, expires_at = row
+                self._memory_set(key, text, provider, expires_at)
+                self._counters["sqlite_hits"] += 1
+                return text, provider
+        self._counters["misses"] += 1
+        return None
+
+    async def set(self, key: str, text: str, provider: str, ttl_seconds: Optional[float] = None) -> None:
+        expires_at = time.time() + (ttl_seconds if ttl_seconds is not None else self.ttl_seconds)
+        self._memory_set(key, text, provider, expires_at)
+        self._counters["writes"] += 1
+        if self._db is not None:
+            try:
+                await asyncio.to_thread(self._sqlite_set, key, text, provider, expires_at)
+            except sqlite3.Error as exc:
+                logger.warning("LLM cache SQLite write failed: %s", exc)
+
+    def clear(self) -> None:
+        self._memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+
+    def stats(self) -> dict[str, Any]:
+        hits = self._counters["memory_hits"] + self._counters["sqlite_hits"]
+        lookups = hits + self._counters["misses"]
+        return {
+            **self._counters,
+            "hits": hits,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "sqlite_enabled": self._db is not None,
+        }
+
+
+_cache: Optional[LLMResultCache] = None
+
+
+def get_llm_cache() -> Optional[LLMResultCache]:
+    """Return the process-wide cache, or None when caching is disabled."""
+    global _cache
+    if not settings.llm_cache_enabled:
+        return None
+    if _cache is None:
+        _cache = LLMResultCache(
+            max_entries=settings.llm_cache_max_entries,
+            ttl_seconds=settings.llm_cache_ttl_seconds,
+            sqlite_path=settings.llm_cache_sqlite_path,
+        )
+    return _cache
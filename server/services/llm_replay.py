@@ -0,0 +1,228 @@
+"""
+Record / replay of LLM traffic for deterministic offline runs.
+
+A cassette is a JSONL file with one recorded provider response per line,
+keyed by the request (prompt, system prompt, temperature, max_tokens,
+JSON mode) — not by provider, so a response recorded from any provider in
+the chain replays for the same request.
+
+  RecordingProvider — wraps a real provider and appends each successful
+                      generate() / generate_stream() response to the cassette
+  ReplayProvider    — answers from the cassette, sleeping for the recorded
+                      latency × settings.llm_replay_latency_scale plus
+                      settings.llm_replay_latency_ms; streams are re-chunked
+                      with the recorded time to first token
+
+get_llm_service("replay") builds one or the other depending on
+settings.llm_replay_record. A request missing from the cassette raises
+CassetteMissError, which fails the call like any provider error.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import re
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Optional
+
+from config import settings
+from services.llm_cache import make_key
+from services.llm_service import LLMProvider
+
+logger = logging.getLogger(__name__)
+
+_STREAM_WORDS_PER_CHUNK = 8
+_cassettes: dict[str, "Cassette"] = {}
+
+
+class CassetteMissError(LookupError):
+    """The request was never recorded to the cassette."""
+
+
+def request_key(prompt: str, system_prompt: str, temperature: float, max_tokens: int, json_mode: bool) -> str:
+    return make_key([], system_prompt, prompt, temperature, max_tokens, json_mode)
+
+
+# ── Cassette ──────────────────────────────────────────────────────────────────
+
+class Cassette:
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._entries: Optional[dict[str, dict[str, Any]]] = None
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+
+    def _load(self) -> dict[str, dict[str, Any]]:
+        if self._entries is None:
+            self._entries = {}
+            if self.path.exists():
+                with self.path.open(encoding="utf-8") as fh:
+                    for line in fh:
+                        if line.strip():
+                            entry = json.loads(line)
+                            self._entries[entry["key"]] = entry  # later recordings win
+            logger.info("Cassette %s: %d recorded responses", self.path, len(self._entries))
+        return self._entries
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+    def get(self, key: str) -> dict[str, Any]:
+        entry = self._load().get(key)
+        if entry is None:
+            self.misses += 1
+            raise CassetteMissError(f"request {key[:12]} not in cassette {self.path}")
+        self.hits += 1
+        return entry
+
+    def record(self, key: str, provider: LLMProvider, response: str, latency_ms: float, **extra: Any) -> None:
+        entry = {
+            "key": key,
+            "provider": provider.name,
+            "model": getattr(provider, "model", ""),
+            "response": response,
+            "latency_ms": round(latency_ms, 1),
+            **extra,
+            "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as fh:
+            fh.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._load()[key] = entry
+        self.recorded += 1
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "path": str(self.path),
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "recorded": self.recorded,
+        }
+
+
+def get_cassette(path: Optional[str] = None) -> Cassette:
+    """Return the process-wide cassette for *path* (default: settings.llm_replay_cassette)."""
+    path = path or settings.llm_replay_cassette
+    cassette = _cassettes.get(path)
+    if cassette is None:
+        cassette = _cassettes[path] = Cassette(path)
+    return cassette
+
+
+# ── Recording ─────────────────────────────────────────────────────────────────
+
+class RecordingProvider(LLMProvider):
+    """Pass-through to *inner* that records every successful response.
+
+    Keeps the inner provider's name and model so breakers, limiters, stats
+    and token budgets behave exactly as without recording.
+    """
+
+    def __init__(self, inner: LLMProvider, cassette: Cassette):
+        self.inner = inner
+        self.cassette = cassette
+        self.name = inner.name
+        self.model = getattr(inner, "model", "")
+        self.supports_json_mode = getattr(inner, "supports_json_mode", False)
+
+    async def generate(
+        self,
+        prompt: str,
+        system_prompt: str = "",
+        temperature: float = 0.3,
+        max_tokens: int = 4096,
+        json_mode: bool = False,
+    ) -> str:
+        extra = {"json_mode": True} if json_mode else {}
+        start = time.perf_counter()
+        text = await self.inner.generate(prompt, system_prompt, temperature, max_tokens, **extra)
+        latency = (time.perf_counter() - start) * 1000
+        key = request_key(prompt, system_prompt, temperature, max_tokens, json_mode)
+        self.cassette.record(key, self.inner, text, latency)
+        return text
+
+    async def generate_stream(
+        self,
+        prompt: str,
+        system_prompt: str = "",
+        temperature: float = 0.3,
+        max_tokens: int = 4096,
+    ) -> AsyncIterator[str]:
+        start = time.perf_counter()
+        first_chunk_ms: Optional[float] = None
+        chunks: list[str] = []
+        async for chunk in self.inner.generate_stream(prompt, system_prompt, temperature, max_tokens):
+            if first_chunk_ms is None:
+                first_chunk_ms = (time.perf_counter() - start) * 1000
+            chunks.append(chunk)
+            yield chunk
+        latency = (time.perf_counter() - start) * 1000
+        key = request_key(prompt, system_prompt, temperature, max_tokens, False)
+        self.cassette.record(key, self.inner, "".join(chunks), latency, ttft_ms=round(first_chunk_ms or latency, 1))
+
+
+# ── Replay ────────────────────────────────────────────────────────────────────
+
+class ReplayProvider(LLMProvider):
+    name = "replay"
+    supports_json_mode = True
+
+    def __init__(
+        self,
+        cassette: Cassette,
+        model: Optional[str] = None,
+        latency_scale: Optional[float] = None,
+        latency_ms: Optional[float] = None,
+    ):
+        self.cassette = cassette
+        self.model = model or settings.llm_replay_model
+        self.latency_scale = settings.llm_replay_latency_scale if latency_scale is None else latency_scale
+        self.latency_ms = settings.llm_replay_latency_ms if latency_ms is None else latency_ms
+
+    def _delay(self, recorded_ms: float) -> float:
+        """Synthetic latency in seconds for a response recorded in *recorded_ms*."""
+        return max(0.0, self.latency_ms + recorded_ms * self.latency_scale) / 1000
+
+    async def generate(
+        self,
+        prompt: str,
+        system_prompt: str = "",
+        temperature: float = 0.3,
+        max_tokens: int = 4096,
+        json_mode: bool = False,
+    ) -> str:
+        entry = self.cassette.get(request_key(prompt, system_prompt, temperature, max_tokens, json_mode))
+        delay = self._delay(entry.get("latency_ms", 0.0))
+        if delay:
+            await asyncio.sleep(delay)
+        return entry["response"]
+
+    async def generate_stream(
+        self,
+        prompt: str,
+        system_prompt: str = "",
+        temperature: float = 0.3,
+        max_tokens: int = 4096,
+    ) -> AsyncIterator[str]:
+        entry = self.cassette.get(request_key(prompt, system_prompt, temperature, max_tokens, False))
+        latency = entry.get("latency_ms", 0.0)
+        ttft = entry.get("ttft_ms", latency)
+        words = re.findall(r"\s*\S+\s*", entry["response"]) or [entry["response"]]
+        chunks = [
+            "".join(words[i:i + _STREAM_WORDS_PER_CHUNK])
+            for i in range(0, len(words), _STREAM_WORDS_PER_CHUNK)
+        ]
+        first = self._delay(ttft)
+        if first:
+            await asyncio.sleep(first)
+        gap = max(0.0, latency - ttft) * self.latency_scale / 1000 / max(1, len(chunks) - 1)
+        for index, chunk in enumerate(chunks):
+            if index and gap:
+                await asyncio.sleep(gap)
+            yield chunk
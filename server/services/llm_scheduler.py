@@ -0,0 +1,210 @@
+"""
+Priority scheduling of LLM calls.
+
+Every LLMService call that reaches the providers (result-cache misses,
+one per coalesced group) first takes one of
+settings.llm_scheduler_max_concurrency slots. While they are all busy,
+waiting calls are admitted by weighted fair queuing:
+
+  classes  interactive (chat turns), analysis (user-triggered document,
+           code and task work) and background (bulk work such as
+           map-reduce section summaries); routers bind the class and the
+           user for their requests through middleware.priority
+  flows    each (user, class) is a flow; an admission advances the flow's
+           virtual finish time by 1 / weight of its class and the waiter
+           with the smallest finish time goes next. A weight-8 class gets
+           eight admissions for every one of a weight-1 class, and a user
+           with a burst of calls can't crowd out another user's single one
+  aging    a call that has waited settings.llm_scheduler_aging_seconds goes
+           ahead of every younger one, so background work is delayed but
+           never starved
+
+Work started outside a request (startup, tests) runs as background unless
+it binds a class itself.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from config import settings
+from services import deadline
+
+PRIORITIES = ("interactive", "analysis", "background")
+DEFAULT_PRIORITY = "background"
+
+_priority: ContextVar[str] = ContextVar("llm_priority", default=DEFAULT_PRIORITY)
+_user: ContextVar[str] = ContextVar("llm_user", default="")
+
+
+def bind(priority: str, user: Optional[str] = None) -> None:
+    """Run the current request's LLM calls as *priority*, on behalf of *user*."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown LLM priority: {priority}")
+    _priority.set(priority)
+    if user is not None:
+        _user.set(user)
+
+
+@contextmanager
+def priority(name: str) -> Iterator[None]:
+    """Run the calls (and tasks) started inside the block as *name*."""
+    if name not in PRIORITIES:
+        raise ValueError(f"Unknown LLM priority: {name}")
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current() -> tuple[str, str]:
+    """(priority, user) the current context's LLM calls are scheduled as."""
+    return _priority.get(), _user.get()
+
+
+class _Waiter:
+    __slots__ = ("priority", "flow", "finish", "seq", "enqueued", "future")
+
+    def __init__(self, priority: str, flow: tuple[str, str], finish: float, seq: int):
+        self.priority = priority
+        self.flow = flow
+        self.finish = finish
+        self.seq = seq
+        self.enqueued = time.monotonic()
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class _ClassStats:
+    __slots__ = ("admitted", "queued", "aged", "total_wait_ms", "max_wait_ms")
+
+    def __init__(self):
+        self.admitted = 0
+        self.queued = 0  # admissions that had to wait for a slot
+        self.aged = 0  # admissions that jumped the queue after waiting too long
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+
+class PriorityScheduler:
+    def __init__(
+        self,
+        max_concurrency: int,
+        weights: Optional[dict[str, float]] = None,
+        aging_seconds: Optional[float] = None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.weights = weights if weights is not None else settings.llm_scheduler_weights
+        self.aging_seconds = aging_seconds if aging_seconds is not None else settings.llm_scheduler_aging_seconds
+        self.in_flight = 0
+        self._waiters: list[_Waiter] = []
+        self._finish: dict[tuple[str, str], float] = {}  # flow → last virtual finish time
+        self._virtual_time = 0.0
+        self._seq = 0
+        self._stats = {name: _ClassStats() for name in PRIORITIES}
+
+    @classmethod
+    def from_settings(cls) -> "PriorityScheduler":
+        return cls(settings.llm_scheduler_max_concurrency)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_concurrency > 0
+
+    def _enqueue(self, priority: str, user: str) -> _Waiter:
+        flow = (user, priority)
+        weight = max(self.weights.get(priority, 1.0), 1e-6)
+        finish = max(self._virtual_time, self._finish.get(flow, 0.0)) + 1.0 / weight
+        self._finish[flow] = finish
+        self._seq += 1
+        waiter = _Waiter(priority, flow, finish, self._seq)
+        self._waiters.append(waiter)
+        return waiter
+
+    def _next(self) -> tuple[_Waiter, bool]:
+        """The waiter to admit next, and whether it was promoted by aging."""
+        now = time.monotonic()
+        aged = [w for w in self._waiters if now - w.enqueued >= self.aging_seconds]
+        if aged:
+            return min(aged, key=lambda w: w.seq), True
+        return min(self._waiters, key=lambda w: (w.finish, w.seq)), False
+
+    def _dispatch(self) -> None:
+        while self._waiters and self.in_flight < self.max_concurrency:
+            waiter, aged = self._next()
+            self._waiters.remove(waiter)
+            self._virtual_time = max(self._virtual_time, waiter.finish)
+            self._stats[waiter.priority].aged += int(aged)
+            self.in_flight += 1
+            waiter.future.set_result(None)
+        if not self._waiters:
+            # Idle: forget finish times so old bursts don't count against new work
+            self._finish.clear()
+
+    async def _admit(self, priority: str, user: str, at: Optional[float]) -> float:
+        """Wait for a slot; return the queue wait in milliseconds."""
+        start = time.perf_counter()
+        waiter = self._enqueue(priority, user)
+        self._dispatch()
+        if not waiter.future.done():
+            self._stats[priority].queued += 1
+            try:
+                await deadline.bounded(asyncio.shield(waiter.future), "LLM scheduler queue", at)
+            except BaseException:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                elif waiter.future.done():
+                    self._release()  # admitted just as we gave up
+                raise
+        wait_ms = (time.perf_counter() - start) * 1000
+        stats = self._stats[priority]
+        stats.admitted += 1
+        stats.total_wait_ms += wait_ms
+        stats.max_wait_ms = max(stats.max_wait_ms, wait_ms)
+        return wait_ms
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, at: Optional[float] = None) -> AsyncIterator[float]:
+        """Hold a slot as the current context's (priority, user); yields the queue wait in ms.
+
+        *at* is the request deadline; DeadlineExceeded is raised if no slot
+        frees up before it.
+        """
+        if not self.enabled:
+            yield 0.0
+            return
+        priority, user = current()
+        wait_ms = await self._admit(priority, user, at)
+        try:
+            yield wait_ms
+        finally:
+            self._release()
+
+    def snapshot(self) -> dict[str, Any]:
+        waiting = {name: 0 for name in PRIORITIES}
+        for waiter in self._waiters:
+            waiting[waiter.priority] += 1
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "classes": {
+                name: {
+                    "weight": self.weights.get(name, 1.0),
+                    "waiting": waiting[name],
+                    "admitted": s.admitted,
+                    "queued": s.queued,
+                    "aged": s.aged,
+                    "avg_wait_ms": round(s.total_wait_ms / s.admitted, 1) if s.admitted else 0.0,
+                    "max_wait_ms": round(s.max_wait_ms, 1),
+                }
+                for name, s in self._stats.items()
+            },
+        }
@@ -8,9 +8,15 @@ Every call is logged with provider name and latency.
 from __future__ import annotations
 
 import abc
+import asyncio
+import importlib.util
+import json
 import logging
+import random
 import time
-from typing import Optional
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Any, AsyncIterator, Iterator, Optional
 
 import httpx
 
@@ -25,16 +31,108 @@ except ImportError:
     GroqAPIStatusError = None  # type: ignore[assignment,misc]
 
 from config import settings
+from services import deadline, llm_scheduler
+from services.circuit_breaker import CircuitBreaker
+from services.llm_cache import get_llm_cache, make_key
+from services.llm_scheduler import PriorityScheduler
+from services.llm_stats import StatsRegistry
+from services.llm_telemetry import Telemetry
+from services.prompt_cache import PrefixCacheRegistry, PromptPrefix
+from services.prompts import STRICT_JSON_SUFFIX
+from services.rate_limiter import ProviderBusyError, ProviderLimiter
+from services.retry_policy import ProviderCoolingDown, RetryPolicy, reset_after
+from services.singleflight import SingleFlight
+from services.token_budget import ModelProfile, count_units, estimate_tokens, input_budget, output_budget, profile_for
+from services.utils import load_json
 
 logger = logging.getLogger(__name__)
 
 
+# ── Shared HTTP clients ───────────────────────────────────────────────────────
+# One pooled keep-alive client per httpx-based provider, created in the app
+# lifespan and reused by every call so DNS/TCP/TLS setup is paid once.
+
+_HTTP_CLIENT_NAMES = ("openrouter", "ollama")
+_http_clients: dict[str, httpx.AsyncClient] = {}
+
+
+def _build_http_client() -> httpx.AsyncClient:
+    http2 = settings.llm_http2 and importlib.util.find_spec("h2") is not None
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=settings.llm_http_max_connections,
+            max_keepalive_connections=settings.llm_http_max_keepalive_connections,
+            keepalive_expiry=settings.llm_http_keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(
+            settings.llm_http_timeout,
+            connect=settings.llm_http_connect_timeout,
+        ),
+    )
+
+
+def get_http_client(name: str) -> httpx.AsyncClient:
+    """Return the shared client for *name*, creating it lazily if needed."""
+    client = _http_clients.get(name)
+    if client is None or client.is_closed:
+        client = _build_http_client()
+        _http_clients[name] = client
+    return client
+
+
+async def init_http_clients() -> None:
+    """Open the shared provider clients. Called from the app lifespan."""
+    for name in _HTTP_CLIENT_NAMES:
+        get_http_client(name)
+    logger.info(
+        "LLM HTTP pools ready: providers=%s max_connections=%d http2=%s",
+        ",".join(_HTTP_CLIENT_NAMES),
+        settings.llm_http_max_connections,
+        settings.llm_http2 and importlib.util.find_spec("h2") is not None,
+    )
+
+
+async def warm_up_local_model() -> None:
+    """Load the Ollama model before the first local-mode request. Called from the app lifespan.
+
+    Best effort: if Ollama isn't running, local mode simply cold-starts later.
+    """
+    provider = get_provider("ollama")
+    start = time.perf_counter()
+    try:
+        await provider.warm_up()
+    except Exception as exc:
+        logger.info("Ollama warm-up skipped (%s: %s)", type(exc).__name__, exc)
+        return
+    logger.info(
+        "Ollama model=%s loaded in %.0fms (keep_alive=%s)",
+        provider.model, (time.perf_counter() - start) * 1000, settings.ollama_keep_alive,
+    )
+
+
+async def close_http_clients() -> None:
+    """Close every shared provider client. Called on app shutdown."""
+    clients = list(_http_clients.values())
+    _http_clients.clear()
+    for client in clients:
+        await client.aclose()
+
+
 # ── Abstract base ─────────────────────────────────────────────────────────────
 
 class LLMProvider(abc.ABC):
     """Base class every provider must implement."""
 
     name: str = "base"
+    # True if generate(json_mode=True) constrains the reply to valid JSON
+    supports_json_mode: bool = False
+    # True if generate() / generate_stream() accept session= to continue a
+    # conversation; such providers also implement end_session(session)
+    supports_sessions: bool = False
+    # True if generate() / generate_stream() accept prefix= (a PromptPrefix) and
+    # prompt= as the part after it; other providers get prefix + prompt joined
+    supports_prompt_prefix: bool = False
 
     @abc.abstractmethod
     async def generate(
@@ -43,20 +141,116 @@ class LLMProvider(abc.ABC):
         system_prompt: str = "",
         temperature: float = 0.3,
         max_tokens: int = 4096,
+        json_mode: bool = False,
     ) -> str:
         ...
 
+    async def generate_stream(
+        self,
+        prompt: str,
+        system_prompt: str = "",
+        temperature: float = 0.3,
+        max_tokens: int = 4096,
+    ) -> AsyncIterator[str]:
+        """Yield the response text as it is produced.
+
+        The default implementation yields the full generate() result as a
+        single chunk; providers with a native streaming API override it.
+        """
+        yield await self.generate(prompt, system_prompt, temperature, max_tokens)
+
+
+def _chat_messages(prompt: str, system_prompt: str) -> list[dict]:
+    """Build an OpenAI-style messages list (Groq, OpenRouter)."""
+    messages: list[dict] = []
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
 
 # ── Gemini ────────────────────────────────────────────────────────────────────
 
 class GeminiProvider(LLMProvider):
+    """Gemini via google-genai's async client.
+
+    A prompt prefix of at least settings.gemini_prefix_cache_min_tokens
+    (system prompt included) is stored as cached content, one handle per
+    prefix scope (services/prompt_cache.py). Calls made once the handle
+    exists send only the suffix and reference the cache; a handle Gemini
+    no longer accepts is dropped and the call is repeated in full.
+    """
+
     name = "gemini"
+    supports_json_mode = True
+    supports_prompt_prefix = True
 
     def __init__(self, api_key: str, model: str = "gemini-2.0-flash"):
         from google import genai
         self.model = model
-        self.client = genai.Client(api_key=api_key)
+        self.client = genai.Client(api_key=api_key)  # async calls go through client.aio
         self._key_set = bool(api_key)
+        self.prefix_cache = PrefixCacheRegistry(self._create_cached_prefix, self._delete_cached_prefix)
+
+    def _config(
+        self,
+        system_prompt: str,
+        temperature: float,
+        max_tokens: int,
+        json_mode: bool = False,
+        cached_content: Optional[str] = None,
+    ):
+        from google.genai import types as genai_types
+        config = genai_types.GenerateContentConfig(
+            temperature=temperature,
+            max_output_tokens=max_tokens,
+        )
+        if cached_content:
+            config.cached_content = cached_content  # holds the system prompt too
+        elif system_prompt:
+            config.system_instruction = system_prompt
+        if json_mode:
+            config.response_mime_type = "application/json"
+        return config
+
+    # ── Prefix caching ────────────────────────────────────────────────────
+
+    def _cached_prefix(self, system_prompt: str, prefix: Optional[PromptPrefix]) -> Optional[str]:
+        """Cached-content name for *prefix*, or None to send it in full (creating the cache if worthwhile)."""
+        if prefix is None or not prefix.text or settings.gemini_prefix_cache_ttl_seconds <= 0:
+            return None
+        tokens = estimate_tokens(system_prompt + prefix.text, profile_for(self.name, self.model))
+        if tokens < settings.gemini_prefix_cache_min_tokens:
+            return None
+        return self.prefix_cache.lookup(
+            prefix.scope, prefix.fingerprint(system_prompt, self.model), system_prompt, prefix.text,
+        )
+
+    async def _create_cached_prefix(self, system_prompt: str, text: str) -> tuple[str, float]:
+        from google.genai import types as genai_types
+        ttl = settings.gemini_prefix_cache_ttl_seconds
+        cached = await self.client.aio.caches.create(
+            model=self.model,
+            config=genai_types.CreateCachedContentConfig(
+                system_instruction=system_prompt or None,
+                contents=[text],
+                ttl=f"{ttl}s",
+            ),
+        )
+        return cached.name, float(ttl)
+
+    async def _delete_cached_prefix(self, name: str) -> None:
+        await self.client.aio.caches.delete(name=name)
+
+    def _stale_cache(self, exc: Exception, prefix: PromptPrefix, name: str) -> bool:
+        """True (and the handle forgotten) if *exc* means Gemini rejected cached content *name*."""
+        if GeminiClientError is None or not isinstance(exc, GeminiClientError) or _error_status(exc) == 429:
+            return False
+        logger.info("Gemini: cached prefix %s rejected (%s) — sending the prompt in full", name, exc)
+        self.prefix_cache.forget(prefix.scope)
+        return True
+
+    # ── Generation ────────────────────────────────────────────────────────
 
     async def generate(
         self,
@@ -64,33 +258,82 @@ class GeminiProvider(LLMProvider):
         system_prompt: str = "",
         temperature: float = 0.3,
         max_tokens: int = 4096,
+        json_mode: bool = False,
+        prefix: Optional[PromptPrefix] = None,
     ) -> str:
         logger.debug("Gemini: calling model=%s key_set=%s prompt_len=%d", self.model, self._key_set, len(prompt))
-        from google.genai import types as genai_types
-        config = genai_types.GenerateContentConfig(
-            temperature=temperature,
-            max_output_tokens=max_tokens,
+        cached = self._cached_prefix(system_prompt, prefix)
+        if cached:
+            try:
+                response = await self.client.aio.models.generate_content(
+                    model=self.model,
+                    contents=prompt,
+                    config=self._config(system_prompt, temperature, max_tokens, json_mode, cached),
+                )
+                return response.text or ""
+            except Exception as exc:
+                if not self._stale_cache(exc, prefix, cached):
+                    raise
+        response = await self.client.aio.models.generate_content(
+            model=self.model,
+            contents=prefix.join(prompt) if prefix else prompt,
+            config=self._config(system_prompt, temperature, max_tokens, json_mode),
         )
-        if system_prompt:
-            config.system_instruction = system_prompt
+        return response.text or ""
 
-        response = self.client.models.generate_content(
+    async def generate_stream(
+        self,
+        prompt: str,
+        system_prompt: str = "",
+        temperature: float = 0.3,
+        max_tokens: int = 4096,
+        prefix: Optional[PromptPrefix] = None,
+    ) -> AsyncIterator[str]:
+        logger.debug("Gemini: streaming model=%s key_set=%s prompt_len=%d", self.model, self._key_set, len(prompt))
+        cached = self._cached_prefix(system_prompt, prefix)
+        if cached:
+            try:
+                stream = await self.client.aio.models.generate_content_stream(
+                    model=self.model,
+                    contents=prompt,
+                    config=self._config(system_prompt, temperature, max_tokens, cached_content=cached),
+                )
+                # The stream may be lazy: the request, and a rejected handle,
+                # only surface with the first chunk.
+                first = await stream.__anext__()
+            except StopAsyncIteration:
+                return
+            except Exception as exc:
+                if not self._stale_cache(exc, prefix, cached):
+                    raise
+            else:
+                if first.text:
+                    yield first.text
+                async for chunk in stream:
+                    if chunk.text:
+                        yield chunk.text
+                return
+        stream = await self.client.aio.models.generate_content_stream(
             model=self.model,
-            contents=prompt,
-            config=config,
+            contents=prefix.join(prompt) if prefix else prompt,
+            config=self._config(system_prompt, temperature, max_tokens),
         )
-        return response.text or ""
+        async for chunk in stream:
+            if chunk.text:
+                yield chunk.text
 
 
 # ── Groq ──────────────────────────────────────────────────────────────────────
 
 class GroqProvider(LLMProvider):
     name = "groq"
+    supports_json_mode = True
 
     def __init__(self, api_key: str, model: str = "llama-3.3-70b-versatile"):
-        from groq import Groq
+        from groq import AsyncGroq
         self.model = model
-        self.client = Groq(api_key=api_key)
+        # No SDK retries: 429s go back to LLMService, which cools the provider down (retry_policy)
+        self.client = AsyncGroq(api_key=api_key, max_retries=0)
         self._key_set = bool(api_key)
 
     async def generate(
@@ -99,77 +342,238 @@ class GroqProvider(LLMProvider):
         system_prompt: str = "",
         temperature: float = 0.3,
         max_tokens: int = 4096,
+        json_mode: bool = False,
     ) -> str:
         logger.debug("Groq: calling model=%s key_set=%s prompt_len=%d", self.model, self._key_set, len(prompt))
-        messages: list[dict] = []
-        if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
-        messages.append({"role": "user", "content": prompt})
-
-        response = self.client.chat.completions.create(
+        extra = {"response_format": {"type": "json_object"}} if json_mode else {}
+        response = await self.client.chat.completions.create(
             model=self.model,
-            messages=messages,
+            messages=_chat_messages(prompt, system_prompt),
             temperature=temperature,
             max_tokens=max_tokens,
+            **extra,
         )
         return response.choices[0].message.content or ""
 
+    async def generate_stream(
+        self,
+        prompt: str,
+        system_prompt: str = "",
+        temperature: float = 0.3,
+        max_tokens: int = 4096,
+    ) -> AsyncIterator[str]:
+        logger.debug("Groq: streaming model=%s key_set=%s prompt_len=%d", self.model, self._key_set, len(prompt))
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=_chat_messages(prompt, system_prompt),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+        )
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+
 
 # ── OpenRouter ────────────────────────────────────────────────────────────────
 
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+
 class OpenRouterProvider(LLMProvider):
     name = "openrouter"
+    supports_json_mode = True
 
     def __init__(self, api_key: str, model: str = "meta-llama/llama-3-8b-instruct"):
         self.api_key = api_key
         self.model = model
         self._key_set = bool(api_key)
 
+    def _headers(self) -> dict[str, str]:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": "https://workflow-app.local",  # Required by OpenRouter
+            "X-Title": "WorkFlow App",  # Optional but recommended
+        }
+
     async def generate(
         self,
         prompt: str,
         system_prompt: str = "",
         temperature: float = 0.3,
         max_tokens: int = 4096,
+        json_mode: bool = False,
     ) -> str:
         logger.debug("OpenRouter: calling model=%s key_set=%s prompt_len=%d", self.model, self._key_set, len(prompt))
-        messages: list[dict] = []
-        if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
-        messages.append({"role": "user", "content": prompt})
-
-        async with httpx.AsyncClient(timeout=120) as client:
-            response = await client.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json",
-                    "HTTP-Referer": "https://workflow-app.local",  # Required by OpenRouter
-                    "X-Title": "WorkFlow App",  # Optional but recommended
-                },
-                json={
-                    "model": self.model,
-                    "messages": messages,
-                    "temperature": temperature,
-                    "max_tokens": max_tokens,
-                },
-            )
+        payload = {
+            "model": self.model,
+            "messages": _chat_messages(prompt, system_prompt),
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }
+        if json_mode:
+            payload["response_format"] = {"type": "json_object"}
+        client = get_http_client(self.name)
+        response = await client.post(OPENROUTER_URL, headers=self._headers(), json=payload)
+        if response.status_code != 200:
+            error_text = response.text
+            logger.error(f"OpenRouter error: {response.status_code} - {error_text}")
+        response.raise_for_status()
+        data = response.json()
+        return data["choices"][0]["message"]["content"] or ""
+
+    async def generate_stream(
+        self,
+        prompt: str,
+        system_prompt: str = "",
+        temperature: float = 0.3,
+        max_tokens: int = 4096,
+    ) -> AsyncIterator[str]:
+        logger.debug("OpenRouter: streaming model=%s key_set=%s prompt_len=%d", self.model, self._key_set, len(prompt))
+        client = get_http_client(self.name)
+        async with client.stream(
+            "POST",
+            OPENROUTER_URL,
+            headers=self._headers(),
+            json={
+                "model": self.model,
+                "messages": _chat_messages(prompt, system_prompt),
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "stream": True,
+            },
+        ) as response:
             if response.status_code != 200:
-                error_text = response.text
-                logger.error(f"OpenRouter error: {response.status_code} - {error_text}")
+                await response.aread()
+                logger.error(f"OpenRouter error: {response.status_code} - {response.text}")
             response.raise_for_status()
-            data = response.json()
-            return data["choices"][0]["message"]["content"] or ""
+            # Server-Sent Events; lines starting with ":" are keep-alive comments
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or [{}]
+                delta = choices[0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
 
 
 # ── Ollama (local) ────────────────────────────────────────────────────────────
 
 class OllamaProvider(LLMProvider):
+    """Local models via Ollama's /api/generate, always consumed as a stream.
+
+    Streaming keeps the read timeout per token batch rather than per
+    generation, and closing the stream stops the generation server-side.
+    Requests carry keep_alive so the model stays resident between calls.
+
+    With session=, the token context Ollama returns is kept (LRU, up to
+    settings.ollama_session_contexts conversations) and sent with that
+    session's next turn, so earlier turns aren't evaluated again. The
+    context is dropped once the next turn would no longer fit num_ctx, or
+    when a turn of the session is answered elsewhere (end_session).
+    With prefix= as well, follow-up turns whose system prompt and prefix
+    are unchanged send only the new suffix — the prefix is already in the
+    context. A changed prefix starts a fresh context.
+    """
+
     name = "ollama"
+    supports_json_mode = True
+    supports_sessions = True
+    supports_prompt_prefix = True
 
     def __init__(self, base_url: str = "http://localhost:11434", model: str = "phi3:mini"):
         self.base_url = base_url.rstrip("/")
         self.model = model
+        # session → (context, fingerprint of the system prompt + prefix it was built from)
+        self._contexts: OrderedDict[str, tuple[list[int], Optional[str]]] = OrderedDict()
+
+    def _payload(
+        self,
+        prompt: str,
+        system_prompt: str,
+        temperature: float,
+        max_tokens: int,
+        session: Optional[str] = None,
+        prefix: Optional[PromptPrefix] = None,
+    ) -> tuple[dict, Optional[str]]:
+        """(request body, prefix fingerprint to remember with the returned context)."""
+        fingerprint = prefix.fingerprint(system_prompt) if prefix else None
+        user_prompt = prefix.join(prompt) if prefix else prompt
+        full_prompt = f"{system_prompt}\n\n{user_prompt}" if system_prompt else user_prompt
+        context = self._session_context(
+            session, prompt if fingerprint else full_prompt, max_tokens, fingerprint,
+        )
+        payload = {
+            "model": self.model,
+            "prompt": prompt if context and fingerprint else full_prompt,
+            "stream": True,
+            "keep_alive": settings.ollama_keep_alive,
+            "options": {
+                "temperature": temperature,
+                "num_predict": max_tokens,
+                "num_ctx": settings.ollama_num_ctx,
+            },
+        }
+        if context:
+            payload["context"] = context
+        return payload, fingerprint
+
+    def _session_context(
+        self, session: Optional[str], new_text: str, max_tokens: int, fingerprint: Optional[str] = None,
+    ) -> Optional[list[int]]:
+        """Context of *session*'s previous turn, if it has the same prefix and the new turn still fits."""
+        entry = self._contexts.get(session) if session else None
+        if entry is None:
+            return None
+        context, previous = entry
+        if previous != fingerprint:
+            logger.debug("Ollama: prompt prefix changed — starting a fresh session context")
+            del self._contexts[session]
+            return None
+        needed = len(context) + estimate_tokens(new_text, profile_for(self.name, self.model)) + max_tokens
+        if needed > settings.ollama_num_ctx:
+            logger.debug("Ollama: session context full (%d tokens) — starting a fresh one", len(context))
+            del self._contexts[session]
+            return None
+        self._contexts.move_to_end(session)
+        return context
+
+    def end_session(self, session: str) -> None:
+        """Forget *session*'s context: a turn of it was answered elsewhere."""
+        if self._contexts.pop(session, None) is not None:
+            logger.debug("Ollama: session %s continued elsewhere — dropping its context", session)
+
+    def _remember(
+        self, session: Optional[str], context: Optional[list[int]], fingerprint: Optional[str] = None,
+    ) -> None:
+        if not session or not context or settings.ollama_session_contexts <= 0:
+            return
+        self._contexts[session] = (context, fingerprint)
+        self._contexts.move_to_end(session)
+        while len(self._contexts) > settings.ollama_session_contexts:
+            self._contexts.popitem(last=False)
+
+    async def _stream(
+        self, payload: dict, session: Optional[str], fingerprint: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        client = get_http_client(self.name)
+        async with client.stream("POST", f"{self.base_url}/api/generate", json=payload) as resp:
+            resp.raise_for_status()
+            # Newline-delimited JSON, one object per token batch
+            async for line in resp.aiter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                if data.get("response"):
+                    yield data["response"]
+                if data.get("done"):
+                    self._remember(session, data.get("context"), fingerprint)
+                    break
 
     async def generate(
         self,
@@ -177,27 +581,156 @@ class OllamaProvider(LLMProvider):
         system_prompt: str = "",
         temperature: float = 0.3,
         max_tokens: int = 4096,
+        json_mode: bool = False,
+        session: Optional[str] = None,
+        prefix: Optional[PromptPrefix] = None,
     ) -> str:
         logger.debug("Ollama: calling model=%s url=%s prompt_len=%d", self.model, self.base_url, len(prompt))
-        full_prompt = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
-        payload = {
-            "model": self.model,
-            "prompt": full_prompt,
-            "stream": False,
-            "options": {"temperature": temperature, "num_predict": max_tokens},
-        }
-        async with httpx.AsyncClient(timeout=120) as client:
-            resp = await client.post(f"{self.base_url}/api/generate", json=payload)
-            resp.raise_for_status()
-            return resp.json().get("response", "")
+        payload, fingerprint = self._payload(prompt, system_prompt, temperature, max_tokens, session, prefix)
+        if json_mode:
+            payload["format"] = "json"
+        return "".join([chunk async for chunk in self._stream(payload, session, fingerprint)])
+
+    async def generate_stream(
+        self,
+        prompt: str,
+        system_prompt: str = "",
+        temperature: float = 0.3,
+        max_tokens: int = 4096,
+        session: Optional[str] = None,
+        prefix: Optional[PromptPrefix] = None,
+    ) -> AsyncIterator[str]:
+        logger.debug("Ollama: streaming model=%s url=%s prompt_len=%d", self.model, self.base_url, len(prompt))
+        payload, fingerprint = self._payload(prompt, system_prompt, temperature, max_tokens, session, prefix)
+        async for chunk in self._stream(payload, session, fingerprint):
+            yield chunk
+
+    async def warm_up(self) -> None:
+        """Load the model into memory; a request without a prompt only loads it."""
+        client = get_http_client(self.name)
+        resp = await client.post(
+            f"{self.base_url}/api/generate",
+            json={"model": self.model, "keep_alive": settings.ollama_keep_alive},
+        )
+        resp.raise_for_status()
 
 
 # ── Orchestrator ──────────────────────────────────────────────────────────────
 
+@dataclass(frozen=True)
+class LLMRequest:
+    """One generate() / generate_stream() request as it moves down the provider chain."""
+
+    prompt: str
+    system_prompt: str
+    temperature: float
+    max_tokens: int
+    call_type: str
+    json_mode: bool = False
+    session: Optional[str] = None
+    prefix: Optional[PromptPrefix] = None  # stable part in front of prompt
+    deadline: Optional[float] = None  # time.monotonic() by which the request must be answered
+
+    @property
+    def full_prompt(self) -> str:
+        return self.prefix.join(self.prompt) if self.prefix else self.prompt
+
+    @property
+    def units(self) -> float:
+        """Model-independent size estimate (token_budget.count_units)."""
+        return count_units(self.full_prompt + self.system_prompt)
+
+    def prompt_for(self, provider: "LLMProvider") -> str:
+        """The prompt argument for *provider*: the suffix alone if it takes prefix= separately."""
+        if self.prefix and getattr(provider, "supports_prompt_prefix", False):
+            return self.prompt
+        return self.full_prompt
+
+    def provider_kwargs(self, provider: "LLMProvider") -> dict[str, Any]:
+        """Optional generate() arguments *provider* declares support for."""
+        kwargs: dict[str, Any] = {}
+        if self.json_mode and getattr(provider, "supports_json_mode", False):
+            kwargs["json_mode"] = True
+        if self.session and getattr(provider, "supports_sessions", False):
+            kwargs["session"] = self.session
+        if self.prefix and getattr(provider, "supports_prompt_prefix", False):
+            kwargs["prefix"] = self.prefix
+        return kwargs
+
+
+def _error_status(exc: Exception) -> Optional[int]:
+    """Best-effort HTTP status of a provider SDK/httpx error."""
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    if status is None and isinstance(getattr(exc, "code", None), int):
+        status = exc.code  # google-genai APIError
+    return status
+
+
+def _falls_back(status: Optional[int]) -> bool:
+    """True if an API error with *status* should move on to the next provider.
+
+    Rate limits, timeouts, conflicts and server errors are the provider's
+    trouble; a 400 may be specific to its model (context size, JSON mode).
+    Other client errors from the primary (auth, not found) are raised.
+    """
+    return status in (400, 408, 409, 429) or (status is not None and status >= 500)
+
+
+def _breaker_trip_reason(exc: Exception) -> Optional[str]:
+    """Return a short reason if *exc* should count against the provider's breaker."""
+    if isinstance(exc, (httpx.TimeoutException, httpx.ConnectError)):
+        return type(exc).__name__
+    status = _error_status(exc)
+    if status == 429 or (status is not None and status >= 500):
+        return f"HTTP {status}"
+    return None
+
+
 class LLMService:
-    """Try primary provider, fall back through a chain of providers on errors."""
+    """Try primary provider, fall back through a chain of providers on errors.
+
+    Each provider has a circuit breaker; providers whose breaker is open are
+    skipped until a half-open probe succeeds. Every call feeds EWMA latency /
+    error-rate stats per (provider, model, call_type), and waits for a slot
+    in the provider's concurrency / RPM / TPM limiter first. Identical
+    concurrent generate() calls are coalesced into one provider call.
+    Providers whose context window can't hold the prompt are skipped, and
+    max_tokens is clamped to what each model can produce. Every attempt and
+    request is also recorded in the structured telemetry (llm_telemetry).
+    With a scheduler, calls that reach the providers first wait for a slot
+    in priority / per-user fair order (llm_scheduler). A provider that
+    rate-limits us cools down until the reset it announces (retry_policy):
+    it moves to the back of the chain, and a call that still reaches it
+    waits for a short reset or moves on.
+
+    routing:
+      "static"   → try providers in the configured order
+      "adaptive" → rank providers by their live stats for the call type
+      "auto"     → lead with the local provider (Ollama) for small requests
+                   while its queue is short and its latency keeps up with
+                   the cloud; otherwise rank the cloud providers adaptively
+                   and keep the local one as the last fallback
+
+    tiers maps call types to sibling services whose chains use that call
+    type's model tier (settings.llm_call_type_tiers); generate() and
+    generate_stream() hand those call types over to them.
+    """
 
-    def __init__(self, primary: LLMProvider, fallback: Optional[LLMProvider] = None, fallbacks: Optional[list[LLMProvider]] = None):
+    def __init__(
+        self,
+        primary: LLMProvider,
+        fallback: Optional[LLMProvider] = None,
+        fallbacks: Optional[list[LLMProvider]] = None,
+        breakers: Optional[dict[str, CircuitBreaker]] = None,
+        stats: Optional[StatsRegistry] = None,
+        routing: str = "static",
+        limiters: Optional[dict[str, ProviderLimiter]] = None,
+        inflight: Optional[SingleFlight] = None,
+        telemetry: Optional[Telemetry] = None,
+        tiers: Optional[dict[str, "LLMService"]] = None,
+        scheduler: Optional[PriorityScheduler] = None,
+        retries: Optional[dict[str, RetryPolicy]] = None,
+    ):
         self.primary = primary
         # Support both single fallback (backward compatibility) and multiple fallbacks
         if fallbacks:
@@ -206,6 +739,249 @@ class LLMService:
             self.providers = [primary, fallback]
         else:
             self.providers = [primary]
+        # Shared across services by the factory so every mode sees the same health
+        self.breakers = breakers if breakers is not None else {}
+        self.stats = stats if stats is not None else StatsRegistry()
+        self.limiters = limiters if limiters is not None else {}
+        self.inflight = inflight if inflight is not None else SingleFlight("llm")
+        self.telemetry = telemetry if telemetry is not None else Telemetry()
+        self.routing = routing
+        self.tiers = tiers if tiers is not None else {}
+        self.scheduler = scheduler
+        self.retries = retries if retries is not None else {}
+
+    def end_session(self, session: str, served_by: Optional[str] = None) -> None:
+        """A turn of *session* was answered by *served_by* (None: not by a provider, e.g. a cache).
+
+        Providers that keep conversation state forget it, so their next turn
+        doesn't continue from a conversation that has moved on without them.
+        """
+        for provider in self.providers:
+            if provider is not None and provider.name != served_by and getattr(provider, "supports_sessions", False):
+                provider.end_session(session)
+
+    def for_call_type(self, call_type: str) -> "LLMService":
+        """The service that serves *call_type*: its model tier's sibling, or this one."""
+        return self.tiers.get(call_type, self)
+
+    def breaker(self, provider: LLMProvider) -> CircuitBreaker:
+        breaker = self.breakers.get(provider.name)
+        if breaker is None:
+            breaker = self.breakers[provider.name] = CircuitBreaker(provider.name)
+        return breaker
+
+    def limiter(self, provider: LLMProvider) -> ProviderLimiter:
+        limiter = self.limiters.get(provider.name)
+        if limiter is None:
+            limiter = self.limiters[provider.name] = ProviderLimiter.from_settings(provider.name)
+        return limiter
+
+    def retry(self, provider: LLMProvider) -> RetryPolicy:
+        policy = self.retries.get(provider.name)
+        if policy is None:
+            policy = self.retries[provider.name] = RetryPolicy(provider.name)
+        return policy
+
+    async def _await_reset(self, provider: LLMProvider, request: LLMRequest) -> None:
+        """Wait out a short rate-limit cool-down; raise ProviderCoolingDown for a long one."""
+        policy = self.retry(provider)
+        wait = policy.wait_time()
+        if wait <= 0:
+            return
+        left = deadline.remaining(request.deadline)
+        if wait > settings.llm_retry_max_wait_seconds or (left is not None and wait >= left):
+            policy.skipped += 1
+            raise ProviderCoolingDown(f"{provider.name} rate-limited, resets in {wait:.1f}s")
+        policy.waited += 1
+        logger.info("LLM WAIT provider=%s — rate-limit reset in %.1fs", provider.name, wait)
+        await asyncio.sleep(wait + random.uniform(0, policy.base))  # jitter: don't all retry at once
+
+    @staticmethod
+    def profile(provider: LLMProvider) -> ModelProfile:
+        return profile_for(provider.name, getattr(provider, "model", ""))
+
+    @property
+    def sizing_provider(self) -> LLMProvider:
+        """The provider prompts are sized for: the primary, or the largest window in auto mode.
+
+        Auto mode sends prompts too big for the local model to the cloud, so
+        sizing them to the local window would cut them down before routing.
+        """
+        if self.routing != "auto":
+            return self.providers[0]
+        return max((p for p in self.providers if p is not None), key=lambda p: self.profile(p).context_window)
+
+    def prompt_budget(self, system_prompt: str = "", max_tokens: int = 4096) -> int:
+        """Tokens available for the variable part of a prompt sent to the sizing provider."""
+        return input_budget(self.profile(self.sizing_provider), system_prompt, max_tokens)
+
+    def _prepare(
+        self, provider: LLMProvider, request: LLMRequest, units: float, errors: list[str],
+    ) -> Optional[tuple[int, int]]:
+        """(output_tokens, input_tokens) for *provider*, or None if it can't take the request now.
+
+        *units* is request.units, computed once per request.
+        """
+        if deadline.expired(request.deadline):
+            errors.append(f"provider={provider.name} skipped: request deadline passed")
+            return None
+        profile = self.profile(provider)
+        input_tokens = profile.tokens(units)
+        output_tokens = output_budget(profile, input_tokens, request.max_tokens)
+        if output_tokens is None:
+            detail = (
+                f"provider={provider.name} prompt≈{input_tokens} tokens exceeds "
+                f"context window {profile.context_window}"
+            )
+            errors.append(detail)
+            logger.warning("LLM SKIP %s", detail)
+            return None
+        if not self._available(provider, errors):
+            return None
+        return output_tokens, input_tokens
+
+    def _available(self, provider: Optional[LLMProvider], errors: list[str]) -> bool:
+        """False (and noted in *errors*) if the provider is missing or its circuit is open."""
+        if provider is None:
+            return False
+        if not self.breaker(provider).allow():
+            errors.append(f"provider={provider.name} circuit open")
+            logger.info("LLM SKIP provider=%s — circuit open", provider.name)
+            return False
+        return True
+
+    def _record(self, provider: LLMProvider, call_type: str, start: float, ok: bool) -> float:
+        """Feed the call outcome into the live stats; return latency in ms."""
+        latency = (time.perf_counter() - start) * 1000
+        self.stats.record(provider.name, getattr(provider, "model", ""), call_type, latency, ok)
+        return latency
+
+    def _ordered_providers(self, request: LLMRequest, units: float) -> list[LLMProvider]:
+        """Provider order for this call: static, ranked by live stats, or local-first (auto).
+
+        Providers cooling down after a rate limit go last, soonest reset first.
+        """
+        providers = [p for p in self.providers if p is not None]
+        if self.routing == "auto":
+            order = self._auto_order(providers, request, units)
+        elif self.routing == "adaptive" and len(providers) >= 2:
+            order = self._ranked(providers, request.call_type)
+        else:
+            order = providers
+        return sorted(order, key=lambda p: self.retry(p).wait_time())  # stable: ready providers keep their order
+
+    def _ranked(self, providers: list[LLMProvider], call_type: str) -> list[LLMProvider]:
+        """*providers* ordered by live latency / error score for *call_type*."""
+        if len(providers) < 2:
+            return list(providers)
+        ranked: list[tuple[float, int, LLMProvider]] = []
+        unexplored: list[LLMProvider] = []
+        for index, provider in enumerate(providers):
+            stats = self.stats.get(provider.name, getattr(provider, "model", ""), call_type)
+            score = stats.score(settings.llm_adaptive_error_penalty)
+            if score is None or stats.samples < settings.llm_adaptive_min_samples:
+                unexplored.append(provider)
+            else:
+                ranked.append((score, index, provider))
+        order = [p for _, _, p in sorted(ranked, key=lambda r: (r[0], r[1]))] + unexplored
+
+        # Occasionally lead with a random provider so slower-looking or
+        # unexplored ones keep getting fresh measurements.
+        if random.random() < settings.llm_adaptive_explore_ratio:
+            pick = random.choice(providers)
+            order.remove(pick)
+            order.insert(0, pick)
+        return order
+
+    def _auto_order(self, providers: list[LLMProvider], request: LLMRequest, units: float) -> list[LLMProvider]:
+        local = [p for p in providers if p.name == "ollama"]
+        cloud = self._ranked([p for p in providers if p.name != "ollama"], request.call_type)
+        if not local or not cloud:
+            return local + cloud
+        reason = self._local_rejection(local[0], cloud, request, units)
+        self.stats.record_route(request.call_type, reason or "local")
+        if reason is None:
+            return local + cloud
+        logger.debug("LLM auto → cloud for %s (%s)", request.call_type, reason)
+        return cloud + local
+
+    def _local_rejection(
+        self, local: LLMProvider, cloud: list[LLMProvider], request: LLMRequest, units: float,
+    ) -> Optional[str]:
+        """Why *request* should not lead with the local provider, or None if it should."""
+        if self.profile(local).tokens(units) > settings.llm_auto_local_max_prompt_tokens:
+            return "prompt_size"
+        if request.max_tokens > settings.llm_auto_local_max_output_tokens:
+            return "output_budget"
+        limiter = self.limiter(local)
+        if limiter.in_flight + limiter.waiting >= settings.llm_auto_local_max_queue:
+            return "queue"
+        local_stats = self.stats.get(local.name, getattr(local, "model", ""), request.call_type)
+        cloud_stats = self.stats.get(cloud[0].name, getattr(cloud[0], "model", ""), request.call_type)
+        if (
+            local_stats.latency_ms is not None
+            and cloud_stats.latency_ms is not None
+            and local_stats.samples >= settings.llm_adaptive_min_samples
+            and local_stats.latency_ms > cloud_stats.latency_ms * settings.llm_auto_local_latency_factor
+        ):
+            return "latency"
+        return None
+
+    def _handle_failure(self, provider: LLMProvider, exc: Exception, errors: list[str]) -> None:
+        """Log a provider failure and decide whether to fall back (return) or re-raise."""
+        if isinstance(exc, ProviderBusyError):
+            errors.append(f"provider={provider.name} busy: {exc}")
+            logger.warning("LLM BUSY %s — trying fallback", exc)
+            return
+        if isinstance(exc, deadline.DeadlineExceeded):
+            errors.append(f"provider={provider.name} cut off: {exc}")
+            logger.warning("LLM DEADLINE provider=%s — %s", provider.name, exc)
+            return  # not the provider's fault; no breaker failure
+
+        reason = _breaker_trip_reason(exc)
+        if reason is not None:
+            self.breaker(provider).record_failure(reason)
+
+        if isinstance(exc, (httpx.TimeoutException, httpx.ConnectError)):
+            detail = f"provider={provider.name} error={type(exc).__name__}: {exc}"
+            errors.append(detail)
+            logger.warning("LLM FAIL %s — trying fallback", detail)
+            return
+
+        _available = [t for t in (httpx.HTTPStatusError, GroqAPIStatusError, GeminiClientError) if t is not None]
+        api_errors = tuple(_available)
+        if isinstance(exc, api_errors):
+            status = _error_status(exc)
+            detail = f"provider={provider.name} status={status} error={exc}"
+            if status == 429 or (status == 503 and reset_after(exc) is not None):
+                detail += f" cooling down {self.retry(provider).record_rate_limit(exc):.1f}s"
+            errors.append(detail)
+            logger.warning("LLM FAIL %s — trying fallback", detail)
+            if not _falls_back(status) and provider == self.primary:
+                raise exc
+        else:
+            detail = f"provider={provider.name} error={type(exc).__name__}: {exc}"
+            errors.append(detail)
+            logger.error("LLM FAIL %s — trying fallback", detail, exc_info=True)
+
+    @staticmethod
+    def _all_failed(errors: list[str], request: LLMRequest) -> Exception:
+        error_summary = "; ".join(errors) if errors else "no providers configured"
+        if deadline.expired(request.deadline):
+            logger.error("LLM request ran out of time: %s", error_summary)
+            return deadline.DeadlineExceeded(f"Request deadline exceeded — {error_summary}")
+        logger.error("All LLM providers failed: %s", error_summary)
+        return RuntimeError(f"All LLM providers failed — {error_summary}")
+
+    @property
+    def chain(self) -> list[tuple[str, str]]:
+        """(provider, model) of every hop, in configured order."""
+        return [(p.name, getattr(p, "model", "")) for p in self.providers if p is not None]
+
+    def cache_key(
+        self, prompt: str, system_prompt: str, temperature: float, max_tokens: int, json_mode: bool = False,
+    ) -> str:
+        return make_key(self.chain, system_prompt, prompt, temperature, max_tokens, json_mode)
 
     async def generate(
         self,
@@ -213,76 +989,744 @@ class LLMService:
         system_prompt: str = "",
         temperature: float = 0.3,
         max_tokens: int = 4096,
+        *,
+        call_type: str = "general",
+        cache: bool = False,
+        json_mode: bool = False,
+        session: Optional[str] = None,
+        prefix: Optional[PromptPrefix] = None,
     ) -> tuple[str, str, float]:
-        """Return (text, provider_name, latency_ms)."""
+        """Return (text, provider_name, latency_ms).
+
+        call_type labels the call site (chat, drift, summarise, extract, …)
+        for stats and adaptive routing. With cache=True the result is looked
+        up in / stored to the content-addressed LLM cache; only use it for
+        deterministic calls. Concurrent calls with the same request share
+        one in-flight provider call. json_mode asks providers that support
+        it for a JSON-constrained reply. session names a conversation that
+        providers with server-side conversation state (Ollama) may continue.
+        prefix is a stable part of the prompt that goes in front of *prompt*;
+        providers that can cache it (Gemini, Ollama) avoid re-processing it.
+        Within a request deadline (services/deadline.py) the caller gets
+        DeadlineExceeded once it is used up; a coalesced provider call keeps
+        running for callers that still have time.
+        """
+        tiered = self.for_call_type(call_type)
+        if tiered is not self:
+            return await tiered.generate(
+                prompt, system_prompt, temperature, max_tokens,
+                call_type=call_type, cache=cache, json_mode=json_mode, session=session, prefix=prefix,
+            )
+        request = LLMRequest(
+            prompt, system_prompt, temperature, max_tokens, call_type, json_mode, session, prefix, deadline.current(),
+        )
+        key = self.cache_key(request.full_prompt, system_prompt, temperature, max_tokens, json_mode)
+        if session:
+            cache = False  # the reply depends on the conversation so far
+        result_cache = get_llm_cache() if cache else None
+        if result_cache is not None:
+            start = time.perf_counter()
+            hit = await result_cache.get(key)
+            if hit is not None:
+                text, provider_name = hit
+                latency = (time.perf_counter() - start) * 1000
+                logger.info("LLM CACHE HIT provider=%s latency=%.1fms", provider_name, latency)
+                return text, provider_name, latency
+
+        # The shared call runs without a deadline; each caller is bounded by
+        # its own, so a follower isn't cut off by a leader in a hurry. Calls
+        # of different priority classes don't share: the shared task is
+        # scheduled as its leader's class.
+        priority, _ = llm_scheduler.current()
+        text, provider_name, latency = await deadline.bounded(
+            self.inflight.do((key, session, priority), lambda: self._generate_shared(request)),
+            f"{call_type} call",
+            request.deadline,
+        )
+        if session:
+            self.end_session(session, served_by=provider_name)
+        if result_cache is not None:
+            await result_cache.set(key, text, provider_name)
+        return text, provider_name, latency
+
+    async def generate_json(
+        self,
+        prompt: str,
+        system_prompt: str = "",
+        temperature: float = 0.3,
+        max_tokens: int = 4096,
+        *,
+        call_type: str = "general",
+        cache: bool = False,
+        expect: type = dict,
+    ) -> tuple[Any, str, float]:
+        """Return (parsed JSON, provider_name, latency_ms); *expect* is dict or list.
+
+        Providers are asked for JSON-constrained output where supported, and
+        malformed replies are repaired locally. Only a reply that can't be
+        recovered is re-issued once with STRICT_JSON_SUFFIX. Each outcome
+        (ok / repaired / retried / failed) is counted per call type. With
+        cache=True only the parsed result is cached, re-serialised, so a
+        malformed reply is never served from the cache.
+        """
+        tiered = self.for_call_type(call_type)
+        if tiered is not self:
+            return await tiered.generate_json(
+                prompt, system_prompt, temperature, max_tokens,
+                call_type=call_type, cache=cache, expect=expect,
+            )
+        key = self.cache_key(prompt, system_prompt, temperature, max_tokens, json_mode=True)
+        result_cache = get_llm_cache() if cache else None
+        if result_cache is not None:
+            start = time.perf_counter()
+            hit = await result_cache.get(key)
+            if hit is not None:
+                text, provider_name = hit
+                try:
+                    data, _ = load_json(text, expect)
+                except ValueError:
+                    pass  # an entry stored before replies were parsed first; fetch a fresh one
+                else:
+                    latency = (time.perf_counter() - start) * 1000
+                    logger.info("LLM CACHE HIT provider=%s latency=%.1fms", provider_name, latency)
+                    return data, provider_name, latency
+
+        data, provider_name, latency = await self._generate_json_uncached(
+            prompt, system_prompt, temperature, max_tokens, call_type, expect,
+        )
+        if result_cache is not None:
+            await result_cache.set(key, json.dumps(data), provider_name)
+        return data, provider_name, latency
+
+    async def _generate_json_uncached(
+        self, prompt: str, system_prompt: str, temperature: float, max_tokens: int, call_type: str, expect: type,
+    ) -> tuple[Any, str, float]:
+        text, provider_name, latency = await self.generate(
+            prompt, system_prompt, temperature, max_tokens, call_type=call_type, json_mode=True,
+        )
+        try:
+            data, repaired = load_json(text, expect)
+            self.stats.record_json(call_type, "repaired" if repaired else "ok")
+            return data, provider_name, latency
+        except ValueError:
+            logger.warning("Malformed JSON from %s (call=%s) — retrying with strict suffix", provider_name, call_type)
+
+        text, provider_name, retry_latency = await self.generate(
+            prompt, system_prompt + STRICT_JSON_SUFFIX, temperature, max_tokens, call_type=call_type, json_mode=True,
+        )
+        try:
+            data, _ = load_json(text, expect)
+        except ValueError:
+            self.stats.record_json(call_type, "failed")
+            raise
+        self.stats.record_json(call_type, "retried")
+        return data, provider_name, latency + retry_latency
+
+    async def _generate_shared(self, request: LLMRequest) -> tuple[str, str, float]:
+        """The coalesced call for *request*, run in its own task without a deadline."""
+        deadline.clear()
+        return await self._generate_scheduled(replace(request, deadline=None))
+
+    async def _generate_scheduled(self, request: LLMRequest) -> tuple[str, str, float]:
+        if self.scheduler is None:
+            return await self._generate_uncached(request)
+        async with self.scheduler.slot(request.deadline):
+            return await self._generate_uncached(request)
+
+    async def _generate_uncached(self, request: LLMRequest) -> tuple[str, str, float]:
         errors: list[str] = []
-        for provider in self.providers:
-            if provider is None:
+        call_type = request.call_type
+        units = request.units
+        order = self._ordered_providers(request, units)
+        candidates = iter(order)
+        try:
+            for provider in candidates:
+                budget = self._prepare(provider, request, units, errors)
+                if budget is None:
+                    continue
+                hedge_after = self._hedge_delay(provider, call_type)
+                if hedge_after is not None:
+                    result = await self._generate_hedged(
+                        provider, budget, candidates, hedge_after, request, units, errors,
+                    )
+                    if result is not None:
+                        self._record_request(call_type, order, result[1])
+                        return result
+                    continue
+                try:
+                    text, latency = await self._call(provider, request, *budget)
+                except Exception as exc:
+                    self._handle_failure(provider, exc, errors)
+                    continue
+                self._record_request(call_type, order, provider.name)
+                return text, provider.name, latency
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._record_request(call_type, order, None)  # primary API error re-raised
+            raise
+
+        self._record_request(call_type, order, None)
+        raise self._all_failed(errors, request)
+
+    def _record_request(self, call_type: str, order: list[LLMProvider], served_by: Optional[str]) -> None:
+        """Telemetry for one request; hops = providers in *order* ahead of the one that answered."""
+        names = [p.name for p in order]
+        hops = names.index(served_by) if served_by in names else len(names)
+        self.telemetry.record_request(call_type, served_by, hops)
+
+    async def _call(
+        self,
+        provider: LLMProvider,
+        request: LLMRequest,
+        max_tokens: int,
+        input_tokens: int = 0,
+    ) -> tuple[str, float]:
+        """One provider call; records stats and breaker success. Returns (text, latency_ms).
+
+        Latency excludes the time spent queueing for the provider's limiter.
+        json_mode / session / prefix are only passed on to providers that support them.
+        """
+        call_type = request.call_type
+        model = getattr(provider, "model", "")
+        limiter = self.limiter(provider)
+        queue_ms = latency = 0.0
+        sent = False
+        try:
+            await self._await_reset(provider, request)
+            async with limiter.slot(input_tokens) as queue_ms:
+                start = time.perf_counter()
+                sent = True
+                try:
+                    text = await deadline.bounded(
+                        provider.generate(
+                            request.prompt_for(provider), request.system_prompt, request.temperature, max_tokens,
+                            **request.provider_kwargs(provider),
+                        ),
+                        f"{provider.name} call",
+                        request.deadline,
+                    )
+                except (asyncio.CancelledError, deadline.DeadlineExceeded):
+                    # A cancelled hedge loser or the caller running out of time
+                    # says nothing about provider health
+                    raise
+                except Exception:
+                    latency = self._record(provider, call_type, start, ok=False)
+                    raise
+                latency = self._record(provider, call_type, start, ok=True)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            self.telemetry.record_call(
+                provider.name, model, call_type, latency_ms=latency, queue_ms=queue_ms, error=type(exc).__name__,
+            )
+            raise
+        finally:
+            if not sent:
+                self.breaker(provider).release_probe()  # cooling down, busy or out of time
+        completion_tokens = estimate_tokens(text, self.profile(provider))
+        limiter.charge(completion_tokens)
+        self.breaker(provider).record_success()
+        self.retry(provider).record_success()
+        self.telemetry.record_call(
+            provider.name, model, call_type,
+            latency_ms=latency,
+            queue_ms=queue_ms,
+            prompt_tokens=input_tokens,
+            completion_tokens=completion_tokens,
+        )
+        logger.info(
+            "LLM OK  provider=%s call=%s queue=%.0fms latency=%.0fms tokens≈%d+%d",
+            provider.name,
+            call_type,
+            queue_ms,
+            latency,
+            input_tokens,
+            completion_tokens,
+        )
+        return text, latency
+
+    # ── Hedging ───────────────────────────────────────────────────────────
+
+    def _hedge_delay(self, provider: LLMProvider, call_type: str) -> Optional[float]:
+        """Seconds to wait on *provider* before hedging, or None to not hedge.
+
+        The delay is the configured latency percentile of the provider's
+        recent successful calls for this call type; hedging stays off until
+        enough samples have been observed.
+        """
+        percentile = settings.llm_hedge_percentiles.get(call_type)
+        if percentile is None or len(self.providers) < 2:
+            return None
+        stats = self.stats.get(provider.name, getattr(provider, "model", ""), call_type)
+        if len(stats.recent) < settings.llm_hedge_min_samples:
+            return None
+        return max(stats.percentile(percentile), settings.llm_hedge_min_delay_ms) / 1000
+
+    async def _generate_hedged(
+        self,
+        provider: LLMProvider,
+        budget: tuple[int, int],
+        candidates: Iterator[LLMProvider],
+        hedge_after: float,
+        request: LLMRequest,
+        units: float,
+        errors: list[str],
+    ) -> Optional[tuple[str, str, float]]:
+        """Race *provider* against the next available candidate once it is slow.
+
+        Returns (text, provider_name, latency_ms) from whichever finishes
+        first — the other call is cancelled — or None when every raced
+        provider failed, so the caller continues down the chain.
+        """
+        call_type = request.call_type
+        start = time.perf_counter()
+        tasks: dict[asyncio.Task, LLMProvider] = {
+            asyncio.create_task(self._call(provider, request, *budget)): provider,
+        }
+        hedged = False
+        try:
+            while tasks:
+                done, _ = await asyncio.wait(
+                    tasks,
+                    timeout=None if hedged else hedge_after,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    # Primary is slower than its usual tail — fire the hedge
+                    hedged = True
+                    backup, backup_budget = next(
+                        ((p, b) for p in candidates if (b := self._prepare(p, request, units, errors)) is not None),
+                        (None, None),
+                    )
+                    if backup is not None:
+                        logger.info(
+                            "LLM HEDGE provider=%s slower than %.0fms — also trying %s",
+                            provider.name, hedge_after * 1000, backup.name,
+                        )
+                        self.stats.record_hedge(call_type, fired=True)
+                        tasks[asyncio.create_task(self._call(backup, request, *backup_budget))] = backup
+                    continue
+                for task in done:
+                    winner = tasks.pop(task)
+                    try:
+                        text, _ = task.result()
+                    except Exception as exc:
+                        self._handle_failure(winner, exc, errors)
+                        continue
+                    if hedged and winner is not provider:
+                        self.stats.record_hedge(call_type, won=True)
+                    return text, winner.name, (time.perf_counter() - start) * 1000
+            return None
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def generate_stream(
+        self,
+        prompt: str,
+        system_prompt: str = "",
+        temperature: float = 0.3,
+        max_tokens: int = 4096,
+        *,
+        call_type: str = "chat",
+        session: Optional[str] = None,
+        prefix: Optional[PromptPrefix] = None,
+    ) -> AsyncIterator[tuple[str, str]]:
+        """Yield (chunk, provider_name) pairs as tokens arrive.
+
+        Falls back to the next provider only while nothing has been yielded;
+        once a provider has started streaming, its errors propagate.
+        session, prefix and the request deadline are handled as in
+        generate(); the deadline bounds the wait for a provider's first
+        chunk, not a stream that has started.
+        """
+        tiered = self.for_call_type(call_type)
+        if tiered is not self:
+            async for item in tiered.generate_stream(
+                prompt, system_prompt, temperature, max_tokens, call_type=call_type, session=session, prefix=prefix,
+            ):
+                yield item
+            return
+        request = LLMRequest(
+            prompt, system_prompt, temperature, max_tokens, call_type,
+            session=session, prefix=prefix, deadline=deadline.current(),
+        )
+        if self.scheduler is None:
+            async for item in self._stream_uncached(request):
+                yield item
+            return
+        async with self.scheduler.slot(request.deadline):  # held until the stream ends
+            async for item in self._stream_uncached(request):
+                yield item
+
+    async def _stream_uncached(self, request: LLMRequest) -> AsyncIterator[tuple[str, str]]:
+        errors: list[str] = []
+        call_type = request.call_type
+        units = request.units
+        order = self._ordered_providers(request, units)
+        for provider in order:
+            budget = self._prepare(provider, request, units, errors)
+            if budget is None:
                 continue
+            output_tokens, input_tokens = budget
+            model = getattr(provider, "model", "")
+            limiter = self.limiter(provider)
             start = time.perf_counter()
+            queue_ms = 0.0
+            first_chunk_ms: Optional[float] = None
+            chunks: list[str] = []
+            sent = False
             try:
-                text = await provider.generate(prompt, system_prompt, temperature, max_tokens)
+                await self._await_reset(provider, request)
+                async with limiter.slot(input_tokens) as queue_ms:
+                    start = time.perf_counter()
+                    sent = True
+                    stream = deadline.first_within(
+                        provider.generate_stream(
+                            request.prompt_for(provider), request.system_prompt, request.temperature, output_tokens,
+                            **request.provider_kwargs(provider),
+                        ),
+                        f"{provider.name} stream",
+                        request.deadline,
+                    )
+                    async for chunk in stream:
+                        if first_chunk_ms is None:
+                            first_chunk_ms = (time.perf_counter() - start) * 1000
+                        chunks.append(chunk)
+                        yield chunk, provider.name
+            except ProviderBusyError as exc:
+                self.telemetry.record_call(provider.name, model, call_type, latency_ms=0.0, error=type(exc).__name__)
+                self._handle_failure(provider, exc, errors)
+                continue
+            except deadline.DeadlineExceeded as exc:
+                # Out of time before the first chunk: not the provider's fault, so no stats sample
                 latency = (time.perf_counter() - start) * 1000
-                logger.info(
-                    "LLM OK  provider=%s latency=%.0fms tokens≈%d",
-                    provider.name,
-                    latency,
-                    len(text.split()),
+                self.telemetry.record_call(
+                    provider.name, model, call_type, latency_ms=latency, queue_ms=queue_ms, error=type(exc).__name__,
                 )
-                return text, provider.name, latency
-            except (httpx.TimeoutException, httpx.ConnectError) as exc:
-                detail = f"provider={provider.name} error={type(exc).__name__}: {exc}"
-                errors.append(detail)
-                logger.warning("LLM FAIL %s — trying fallback", detail)
+                self._handle_failure(provider, exc, errors)
+                continue
             except Exception as exc:
-                _available = [t for t in (httpx.HTTPStatusError, GroqAPIStatusError, GeminiClientError) if t is not None]
-                api_errors = tuple(_available)
-                if isinstance(exc, api_errors):
-                    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
-                    detail = f"provider={provider.name} status={status} error={exc}"
-                    errors.append(detail)
-                    logger.warning("LLM FAIL %s — trying fallback", detail)
-                    if status not in (429, 400) and provider == self.primary:
-                        raise
-                else:
-                    detail = f"provider={provider.name} error={type(exc).__name__}: {exc}"
-                    errors.append(detail)
-                    logger.error("LLM FAIL %s — trying fallback", detail, exc_info=True)
+                latency = self._record(provider, call_type, start, ok=False)
+                self.telemetry.record_call(
+                    provider.name, model, call_type, latency_ms=latency, queue_ms=queue_ms, error=type(exc).__name__,
+                )
+                if first_chunk_ms is not None:
+                    logger.error("LLM stream broke mid-response provider=%s error=%s", provider.name, exc)
+                    reason = _breaker_trip_reason(exc)
+                    if reason is not None:
+                        self.breaker(provider).record_failure(reason)
+                    self._record_request(call_type, order, None)
+                    raise
+                try:
+                    self._handle_failure(provider, exc, errors)
+                except Exception:
+                    self._record_request(call_type, order, None)
+                    raise
+                continue
+            finally:
+                if not sent:
+                    self.breaker(provider).release_probe()
+
+            latency = self._record(provider, call_type, start, ok=True)
+            text = "".join(chunks)
+            completion_tokens = estimate_tokens(text, self.profile(provider))
+            limiter.charge(completion_tokens)
+            self.breaker(provider).record_success()
+            self.retry(provider).record_success()
+            self.telemetry.record_call(
+                provider.name, model, call_type,
+                latency_ms=latency,
+                queue_ms=queue_ms,
+                prompt_tokens=input_tokens,
+                completion_tokens=completion_tokens,
+            )
+            self._record_request(call_type, order, provider.name)
+            if request.session:
+                self.end_session(request.session, served_by=provider.name)
+            logger.info(
+                "LLM STREAM OK  provider=%s call=%s queue=%.0fms ttft=%.0fms latency=%.0fms chars=%d",
+                provider.name,
+                call_type,
+                queue_ms,
+                first_chunk_ms or 0.0,
+                latency,
+                len(text),
+            )
+            return
+
+        self._record_request(call_type, order, None)
+        raise self._all_failed(errors, request)
+
+
+# ── Provider registry ─────────────────────────────────────────────────────────
+# Providers are built once per process and every mode hands back the same
+# LLMService chain. The registry rebuilds itself when the provider settings
+# change; call reset_llm_services() to force a rebuild explicitly.
+
+_KNOWN_MODES = ("cloud", "groq", "local", "adaptive", "auto", "replay")
+_providers: dict[str, LLMProvider] = {}
+_services: dict[str, LLMService] = {}
+_breakers: dict[str, CircuitBreaker] = {}
+_stats = StatsRegistry()
+_limiters: dict[str, ProviderLimiter] = {}
+_inflight = SingleFlight("llm")
+_telemetry = Telemetry()
+_scheduler = PriorityScheduler.from_settings()
+_retries: dict[str, RetryPolicy] = {}
+_settings_fingerprint: Optional[tuple] = None
+
+
+def _provider_settings_fingerprint() -> tuple:
+    return (
+        settings.gemini_api_key,
+        settings.groq_api_key,
+        settings.openrouter_api_key,
+        settings.ollama_base_url,
+        settings.ollama_model,
+        settings.llm_replay_cassette,
+        settings.llm_replay_record,
+        json.dumps(settings.llm_model_tiers, sort_keys=True),
+        json.dumps(settings.llm_call_type_tiers, sort_keys=True),
+    )
+
+
+def _build_provider(name: str, model: Optional[str] = None) -> LLMProvider:
+    model_kwargs = {"model": model} if model else {}
+    if name == "gemini":
+        if not settings.gemini_api_key:
+            logger.warning("GEMINI_API_KEY is empty or not set")
+        return GeminiProvider(api_key=settings.gemini_api_key, **model_kwargs)
+    if name == "groq":
+        if not settings.groq_api_key:
+            logger.warning("GROQ_API_KEY is empty or not set")
+        return GroqProvider(api_key=settings.groq_api_key, **model_kwargs)
+    if name == "openrouter":
+        if not settings.openrouter_api_key:
+            logger.warning("OPENROUTER_API_KEY is empty or not set")
+        return OpenRouterProvider(api_key=settings.openrouter_api_key, **model_kwargs)
+    if name == "ollama":
+        return OllamaProvider(base_url=settings.ollama_base_url, model=model or settings.ollama_model)
+    if name == "replay":
+        from services.llm_replay import ReplayProvider, get_cassette
+        return ReplayProvider(get_cassette())
+    raise ValueError(f"Unknown LLM provider: {name}")
+
+
+def get_provider(name: str, model: Optional[str] = None) -> LLMProvider:
+    """Return the process-wide provider instance for *name* (serving *model*, default: its configured one)."""
+    key = f"{name}:{model}" if model else name
+    provider = _providers.get(key)
+    if provider is None:
+        provider = _build_provider(name, model)
+        _providers[key] = provider
+    return provider
+
+
+def _shared_state() -> dict:
+    """Process-wide health, stats, limits, coalescing and telemetry for every mode's service."""
+    return {
+        "breakers": _breakers,
+        "stats": _stats,
+        "limiters": _limiters,
+        "inflight": _inflight,
+        "telemetry": _telemetry,
+        "scheduler": _scheduler,
+        "retries": _retries,
+    }
+
+
+def _build_service(mode: str, models: Optional[dict[str, str]] = None) -> LLMService:
+    """Build the chain for *mode*; *models* overrides the model per provider name (a tier)."""
+    models = models or {}
+
+    def provider(name: str) -> LLMProvider:
+        return get_provider(name, models.get(name))
+
+    if mode == "local":
+        logger.info("LLM mode=local → Ollama (model=%s, url=%s)", settings.ollama_model, settings.ollama_base_url)
+        return LLMService(
+            primary=provider("ollama"),
+            **_shared_state(),
+        )
+    elif mode == "groq":
+        logger.info("LLM mode=groq → Groq primary, Gemini → OpenRouter fallback chain")
+        return LLMService(
+            primary=provider("groq"),
+            fallbacks=[provider("gemini"), provider("openrouter")],
+            **_shared_state(),
+        )
+    elif mode == "replay" and settings.llm_replay_record:
+        from services.llm_replay import RecordingProvider, get_cassette
+        logger.info("LLM mode=replay → recording cloud chain to %s", settings.llm_replay_cassette)
+        cassette = get_cassette()
+        return LLMService(
+            primary=RecordingProvider(provider("gemini"), cassette),
+            fallbacks=[RecordingProvider(provider(name), cassette) for name in ("groq", "openrouter")],
+            **_shared_state(),
+        )
+    elif mode == "replay":
+        logger.info("LLM mode=replay → cassette %s", settings.llm_replay_cassette)
+        return LLMService(
+            primary=provider("replay"),
+            **_shared_state(),
+        )
+    elif mode == "adaptive":
+        logger.info("LLM mode=adaptive → Gemini / Groq / OpenRouter ranked by live latency per call type")
+        return LLMService(
+            primary=provider("gemini"),
+            fallbacks=[provider("groq"), provider("openrouter")],
+            **_shared_state(),
+            routing="adaptive",
+        )
+    elif mode == "auto":
+        logger.info("LLM mode=auto → Ollama for small requests while it keeps up, else Gemini / Groq / OpenRouter")
+        return LLMService(
+            primary=provider("ollama"),
+            fallbacks=[provider("gemini"), provider("groq"), provider("openrouter")],
+            **_shared_state(),
+            routing="auto",
+        )
+    else:  # "cloud" (default)
+        logger.info("LLM mode=cloud → Gemini primary, Groq → OpenRouter fallback chain")
+        return LLMService(
+            primary=provider("gemini"),
+            fallbacks=[provider("groq"), provider("openrouter")],
+            **_shared_state(),
+        )
+
+
+def reset_llm_services() -> None:
+    """Drop every cached provider and service so the next call rebuilds them."""
+    global _settings_fingerprint
+    _providers.clear()
+    _services.clear()
+    _breakers.clear()
+    _stats.clear()
+    _limiters.clear()
+    _retries.clear()
+    _telemetry.clear()
+    _settings_fingerprint = None
+
+
+def provider_states() -> list[dict]:
+    """Circuit-breaker snapshot of every provider used so far."""
+    return [breaker.snapshot() for breaker in _breakers.values()]
+
+
+def provider_stats() -> list[dict]:
+    """EWMA latency / error-rate per (provider, model, call type)."""
+    return _stats.snapshot()
+
+
+def retry_states() -> list[dict]:
+    """Rate-limit cool-down of every provider that has been rate-limited."""
+    return [policy.snapshot() for policy in _retries.values()]
+
+
+def limiter_states() -> list[dict]:
+    """Concurrency / rate-limit state and queue wait of every provider used so far."""
+    return [limiter.snapshot() for limiter in _limiters.values()]
+
+
+def coalescing_stats() -> dict:
+    """Single-flight counters for LLM generate() calls."""
+    return _inflight.stats()
+
+
+def telemetry_snapshot() -> dict:
+    """Per-endpoint / call-type / provider tokens, latency histograms, queue time and fallbacks."""
+    return _telemetry.snapshot()
 
-        error_summary = "; ".join(errors) if errors else "no providers configured"
-        logger.error("All LLM providers failed: %s", error_summary)
-        raise RuntimeError(f"All LLM providers failed — {error_summary}")
+
+def hedge_stats() -> dict[str, dict]:
+    """Hedged-request counters per call type."""
+    return _stats.hedge_snapshot()
+
+
+def route_stats() -> dict[str, dict]:
+    """"auto" mode local / cloud decisions and why cloud was chosen, per call type."""
+    return _stats.route_snapshot()
+
+
+def json_stats() -> dict[str, dict]:
+    """Structured-output outcomes and retry rate per call type."""
+    return _stats.json_snapshot()
+
+
+def scheduler_stats() -> dict:
+    """Slots in use and per-class queue depth, admissions and queue wait of the LLM scheduler."""
+    return _scheduler.snapshot()
+
+
+def prefix_cache_stats() -> dict[str, dict]:
+    """Provider-side prompt prefix cache handles and hit counts, per provider that keeps them."""
+    return {
+        name: provider.prefix_cache.stats()
+        for name, provider in _providers.items()
+        if getattr(provider, "prefix_cache", None) is not None
+    }
 
 
 # ── Factory ───────────────────────────────────────────────────────────────────
 
 def get_llm_service(mode: str = "cloud") -> LLMService:
     """
+    Return the shared LLMService for *mode* (built on first use).
+
     mode:
       "cloud"  → Gemini primary, Groq → OpenRouter fallback chain
       "local"  → Ollama only
       "groq"   → Groq primary, Gemini → OpenRouter fallback chain
+      "adaptive" → Gemini / Groq / OpenRouter, fastest healthy provider first
+                   per call type (EWMA latency and error rate)
+      "auto"   → Ollama for short prompts with small output budgets while
+                 its queue is short and its latency keeps up; cloud
+                 providers (ranked as in "adaptive") for everything else
+      "replay" → answers from the recorded-traffic cassette; with
+                 settings.llm_replay_record, the cloud chain is called and
+                 recorded instead
+
+    Unknown modes fall back to "cloud".
+
+    Call types mapped to a model tier (settings.llm_call_type_tiers) are
+    served by a sibling chain with the tier's models, e.g. drift checks on
+    gemini-2.0-flash-lite / llama-3.1-8b-instant while chat keeps the
+    default models.
     """
-    logger.info("Creating LLM service: mode=%s", mode)
+    global _settings_fingerprint
+    fingerprint = _provider_settings_fingerprint()
+    if fingerprint != _settings_fingerprint:
+        if _settings_fingerprint is not None:
+            logger.info("LLM provider settings changed — rebuilding providers")
+        reset_llm_services()
+        _settings_fingerprint = fingerprint
 
-    if not settings.gemini_api_key:
-        logger.warning("GEMINI_API_KEY is empty or not set")
-    if not settings.groq_api_key:
-        logger.warning("GROQ_API_KEY is empty or not set")
-    if not settings.openrouter_api_key:
-        logger.warning("OPENROUTER_API_KEY is empty or not set")
+    if mode not in _KNOWN_MODES:
+        mode = "cloud"
+    service = _services.get(mode)
+    if service is None:
+        logger.info("Creating LLM service: mode=%s", mode)
+        service = _build_service(mode)
+        service.tiers = _tier_services(mode, service)
+        _services[mode] = service
+    return service
 
-    gemini = GeminiProvider(api_key=settings.gemini_api_key)
-    groq = GroqProvider(api_key=settings.groq_api_key)
-    openrouter = OpenRouterProvider(api_key=settings.openrouter_api_key)
-    ollama = OllamaProvider(base_url=settings.ollama_base_url, model=settings.ollama_model)
 
-    if mode == "local":
-        logger.info("LLM mode=local → Ollama (model=%s, url=%s)", settings.ollama_model, settings.ollama_base_url)
-        return LLMService(primary=ollama)
-    elif mode == "groq":
-        logger.info("LLM mode=groq → Groq primary, Gemini → OpenRouter fallback chain")
-        return LLMService(primary=groq, fallbacks=[gemini, openrouter])
-    else:  # "cloud" (default)
-        logger.info("LLM mode=cloud → Gemini primary, Groq → OpenRouter fallback chain")
-        return LLMService(primary=gemini, fallbacks=[groq, openrouter])
+def _tier_services(mode: str, base: LLMService) -> dict[str, LLMService]:
+    """Map each tiered call type to the *mode* chain built with its tier's models."""
+    tiers: dict[str, LLMService] = {}
+    for call_type, tier in settings.llm_call_type_tiers.items():
+        models = settings.llm_model_tiers.get(tier)
+        if models is None:
+            logger.warning("Unknown LLM model tier %r for call type %r — using the default models", tier, call_type)
+            continue
+        key = f"{mode}/{tier}"
+        service = _services.get(key)
+        if service is None:
+            service = _build_service(mode, models)
+            _services[key] = service
+        if service.chain != base.chain:  # a tier naming only absent providers changes nothing
+            tiers[call_type] = service
+    return tiers
@@ -0,0 +1,153 @@
+"""
+Live latency / error-rate statistics per (provider, model, call type).
+
+Every LLMService call updates an exponentially weighted moving average
+(EWMA) of latency and error rate. The "adaptive" routing mode ranks
+providers by these numbers, so the fastest healthy provider for each kind
+of call (chat, drift, summarise, extract, …) is tried first.
+
+A window of recent successful latencies is kept as well; hedged requests
+use its percentiles to decide when a provider is being unusually slow.
+
+Structured-output calls (LLMService.generate_json) are counted by outcome
+per call type, giving the rate at which malformed JSON still costs a
+second LLM round trip.
+
+"auto" mode routing decisions are counted per call type: how often the
+local provider led, and why cloud providers led otherwise.
+"""
+
+from __future__ import annotations
+
+import math
+from collections import deque
+from typing import Any, Optional
+
+from config import settings
+
+
+class ProviderStats:
+    """EWMA latency and error rate for one (provider, model, call type)."""
+
+    def __init__(self, alpha: float, window: int = 200):
+        self.alpha = alpha
+        self.latency_ms: Optional[float] = None  # successful calls only
+        self.recent: deque[float] = deque(maxlen=window)
+        self.error_rate = 0.0
+        self.samples = 0
+        self.errors = 0
+
+    def record(self, latency_ms: float, ok: bool) -> None:
+        self.samples += 1
+        if ok:
+            self.recent.append(latency_ms)
+            if self.latency_ms is None:
+                self.latency_ms = latency_ms
+            else:
+                self.latency_ms += self.alpha * (latency_ms - self.latency_ms)
+        else:
+            self.errors += 1
+        self.error_rate += self.alpha * ((0.0 if ok else 1.0) - self.error_rate)
+
+    def score(self, error_penalty: float) -> Optional[float]:
+        """Lower is better; None until a successful latency has been observed."""
+        if self.latency_ms is None:
+            return None
+        return self.latency_ms * (1.0 + error_penalty * self.error_rate)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Nearest-rank percentile (0–100) of recent successful latencies."""
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        rank = max(1, math.ceil(q / 100 * len(ordered)))
+        return ordered[min(rank, len(ordered)) - 1]
+
+
+JSON_OUTCOMES = ("ok", "repaired", "retried", "failed")
+ROUTES = ("local", "prompt_size", "output_budget", "queue", "latency")
+
+
+class StatsRegistry:
+    def __init__(self, alpha: Optional[float] = None):
+        self.alpha = alpha or settings.llm_ewma_alpha
+        self._stats: dict[tuple[str, str, str], ProviderStats] = {}
+        self._hedges: dict[str, dict[str, int]] = {}
+        self._json: dict[str, dict[str, int]] = {}
+        self._routes: dict[str, dict[str, int]] = {}
+
+    def get(self, provider: str, model: str, call_type: str) -> ProviderStats:
+        key = (provider, model, call_type)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = ProviderStats(self.alpha)
+        return stats
+
+    def record(self, provider: str, model: str, call_type: str, latency_ms: float, ok: bool) -> None:
+        self.get(provider, model, call_type).record(latency_ms, ok)
+
+    def record_hedge(self, call_type: str, fired: bool = False, won: bool = False) -> None:
+        counters = self._hedges.setdefault(call_type, {"fired": 0, "won": 0})
+        counters["fired"] += int(fired)
+        counters["won"] += int(won)
+
+    def record_json(self, call_type: str, outcome: str) -> None:
+        counters = self._json.setdefault(call_type, dict.fromkeys(JSON_OUTCOMES, 0))
+        counters[outcome] += 1
+
+    def record_route(self, call_type: str, route: str) -> None:
+        counters = self._routes.setdefault(call_type, dict.fromkeys(ROUTES, 0))
+        counters[route] += 1
+
+    def clear(self) -> None:
+        self._stats.clear()
+        self._hedges.clear()
+        self._json.clear()
+        self._routes.clear()
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        return [
+            {
+                "provider": provider,
+                "model": model,
+                "call_type": call_type,
+                "ewma_latency_ms": _round(s.latency_ms),
+                "ewma_error_rate": round(s.error_rate, 4),
+                "p50_latency_ms": _round(s.percentile(50)),
+                "p95_latency_ms": _round(s.percentile(95)),
+                "samples": s.samples,
+                "errors": s.errors,
+            }
+            for (provider, model, call_type), s in sorted(self._stats.items())
+        ]
+
+    def hedge_snapshot(self) -> dict[str, dict[str, Any]]:
+        return {
+            call_type: {
+                **counters,
+                "win_rate": round(counters["won"] / counters["fired"], 4) if counters["fired"] else 0.0,
+            }
+            for call_type, counters in sorted(self._hedges.items())
+        }
+
+    def json_snapshot(self) -> dict[str, dict[str, Any]]:
+        snapshot = {}
+        for call_type, counters in sorted(self._json.items()):
+            calls = sum(counters.values())
+            snapshot[call_type] = {
+                **counters,
+                "calls": calls,
+                "retry_rate": round((counters["retried"] + counters["failed"]) / calls, 4),
+                "repair_rate": round(counters["repaired"] / calls, 4),
+            }
+        return snapshot
+
+    def route_snapshot(self) -> dict[str, dict[str, Any]]:
+        return {
+            call_type: {**counters, "local_share": round(counters["local"] / sum(counters.values()), 4)}
+            for call_type, counters in sorted(self._routes.items())
+        }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 1) if value is not None else None
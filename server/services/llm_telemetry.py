@@ -0,0 +1,171 @@
+"""
+Structured per-call LLM telemetry, aggregated in-process.
+
+Two tables, both labelled with the API endpoint that triggered the call
+(set per request by middleware.telemetry) and the call type (chat, drift,
+summarise, extract, …):
+
+  attempts — one row per (endpoint, call type, provider, model): calls,
+             error classes, prompt / completion tokens (≈, from
+             token_budget), a latency histogram and limiter queue time
+  requests — one row per (endpoint, call type): LLMService requests, which
+             provider served them, fallback hops (0 = first choice
+             answered) and how many failed on every provider
+
+Exposed at GET /api/llm/metrics.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Optional
+
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1_000, 2_500, 5_000, 10_000, 30_000, 60_000)
+NO_ENDPOINT = "-"  # calls made outside an HTTP request (startup, background work)
+
+# ASGI scope of the HTTP request being served; the matched route is read
+# lazily because routing happens after the middleware has run.
+_request_scope: ContextVar[Optional[dict]] = ContextVar("llm_request_scope", default=None)
+
+
+def bind_request(scope: dict):
+    """Label LLM calls made while serving *scope*; returns a reset token."""
+    return _request_scope.set(scope)
+
+
+def unbind_request(token) -> None:
+    _request_scope.reset(token)
+
+
+def current_endpoint() -> str:
+    """'METHOD /route/{template}' of the current request, or NO_ENDPOINT."""
+    scope = _request_scope.get()
+    if scope is None:
+        return NO_ENDPOINT
+    route = scope.get("route")
+    path = getattr(route, "path", None) or scope.get("path", "")
+    return f"{scope.get('method', '')} {path}".strip()
+
+
+# ── Aggregates ────────────────────────────────────────────────────────────────
+
+class _Attempts:
+    __slots__ = (
+        "calls", "errors", "prompt_tokens", "completion_tokens",
+        "latency_ms", "buckets", "queue_ms", "max_queue_ms",
+    )
+
+    def __init__(self):
+        self.calls = 0
+        self.errors: dict[str, int] = {}
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latency_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)  # last bucket is +Inf
+        self.queue_ms = 0.0
+        self.max_queue_ms = 0.0
+
+
+class _Requests:
+    __slots__ = ("requests", "failed", "served_by", "hops")
+
+    def __init__(self):
+        self.requests = 0
+        self.failed = 0
+        self.served_by: dict[str, int] = {}
+        self.hops: dict[int, int] = {}
+
+
+class Telemetry:
+    def __init__(self):
+        self._attempts: dict[tuple[str, str, str, str], _Attempts] = {}
+        self._requests: dict[tuple[str, str], _Requests] = {}
+
+    def record_call(
+        self,
+        provider: str,
+        model: str,
+        call_type: str,
+        *,
+        latency_ms: float,
+        queue_ms: float = 0.0,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        error: Optional[str] = None,
+    ) -> None:
+        """One provider attempt; tokens are only counted for successful calls."""
+        key = (current_endpoint(), call_type, provider, model or "")
+        row = self._attempts.get(key)
+        if row is None:
+            row = self._attempts[key] = _Attempts()
+        row.calls += 1
+        row.latency_ms += latency_ms
+        row.buckets[bisect_left(LATENCY_BUCKETS_MS, latency_ms)] += 1
+        row.queue_ms += queue_ms
+        row.max_queue_ms = max(row.max_queue_ms, queue_ms)
+        if error is not None:
+            row.errors[error] = row.errors.get(error, 0) + 1
+        else:
+            row.prompt_tokens += prompt_tokens
+            row.completion_tokens += completion_tokens
+
+    def record_request(self, call_type: str, served_by: Optional[str], hops: int) -> None:
+        """One LLMService request; *served_by* is None when every provider failed."""
+        key = (current_endpoint(), call_type)
+        row = self._requests.get(key)
+        if row is None:
+            row = self._requests[key] = _Requests()
+        row.requests += 1
+        if served_by is None:
+            row.failed += 1
+        else:
+            row.served_by[served_by] = row.served_by.get(served_by, 0) + 1
+            row.hops[hops] = row.hops.get(hops, 0) + 1
+
+    def clear(self) -> None:
+        self._attempts.clear()
+        self._requests.clear()
+
+    def snapshot(self) -> dict[str, Any]:
+        attempts = []
+        for (endpoint, call_type, provider, model), row in sorted(self._attempts.items()):
+            ok = row.calls - sum(row.errors.values())
+            attempts.append({
+                "endpoint": endpoint,
+                "call_type": call_type,
+                "provider": provider,
+                "model": model,
+                "calls": row.calls,
+                "errors": dict(sorted(row.errors.items())),
+                "prompt_tokens": row.prompt_tokens,
+                "completion_tokens": row.completion_tokens,
+                "avg_completion_tokens": round(row.completion_tokens / ok, 1) if ok else 0.0,
+                "avg_latency_ms": round(row.latency_ms / row.calls, 1),
+                "latency_histogram": _histogram(row.buckets),
+                "avg_queue_ms": round(row.queue_ms / row.calls, 1),
+                "max_queue_ms": round(row.max_queue_ms, 1),
+            })
+        requests = []
+        for (endpoint, call_type), row in sorted(self._requests.items()):
+            fell_back = sum(n for hops, n in row.hops.items() if hops > 0)
+            requests.append({
+                "endpoint": endpoint,
+                "call_type": call_type,
+                "requests": row.requests,
+                "failed": row.failed,
+                "served_by": dict(sorted(row.served_by.items())),
+                "fallback_hops": {str(h): n for h, n in sorted(row.hops.items())},
+                "fallback_rate": round(fell_back / row.requests, 4),
+            })
+        return {"latency_buckets_ms": list(LATENCY_BUCKETS_MS), "attempts": attempts, "requests": requests}
+
+
+def _histogram(buckets: list[int]) -> dict[str, int]:
+    """Cumulative counts per upper bound, Prometheus-style (le = less or equal)."""
+    histogram: dict[str, int] = {}
+    total = 0
+    for bound, count in zip([*map(str, LATENCY_BUCKETS_MS), "+Inf"], buckets):
+        total += count
+        histogram[bound] = total
+    return histogram
@@ -0,0 +1,144 @@
+"""
+Provider-side caching of stable prompt prefixes.
+
+Chat prompts are split into a stable prefix (system prompt + project
+context, identical across turns until the project changes) and a volatile
+suffix (retrieved knowledge + the user's question). Callers pass the
+prefix as a PromptPrefix with a scope (the project id); providers that
+can cache it do so:
+
+  Gemini — an explicit cached-content handle per scope, created in the
+           background the first time a prefix is seen and used from the
+           next turn on. A changed prefix (project context edited) gets a
+           new handle and the old one is deleted. Prefixes below
+           settings.gemini_prefix_cache_min_tokens aren't cached — Gemini
+           rejects them, and they are cheap to resend anyway.
+  Ollama — follow-up turns of a session whose prefix fingerprint hasn't
+           changed send only the suffix (see OllamaProvider).
+
+Other providers receive prefix + suffix as one prompt, which still lets
+their automatic prefix caching match.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PromptPrefix:
+    text: str
+    scope: str  # what the prefix belongs to, e.g. the project id
+
+    def fingerprint(self, *parts: str) -> str:
+        """Hash of the prefix text plus anything else that shapes the cache (system prompt, model)."""
+        material = "\0".join((self.text, *parts))
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()[:24]
+
+    def join(self, suffix: str) -> str:
+        """The full prompt for providers without prefix caching."""
+        return f"{self.text}\n{suffix}" if self.text else suffix
+
+
+# ── Gemini cached-content handles ─────────────────────────────────────────────
+
+@dataclass
+class _Handle:
+    fingerprint: str
+    name: Optional[str] = None  # cached-content resource name once created
+    expires_at: float = 0.0
+    failed: bool = False  # creation failed; not retried until the prefix changes
+
+
+class PrefixCacheRegistry:
+    """Tracks one cache handle per scope for a provider.
+
+    *create(*args)* builds a handle from the arguments given to lookup()
+    and returns (resource_name, ttl_seconds); *delete(name)* drops one on
+    the provider side. Both run as
+    background tasks so no chat turn waits on cache management.
+    """
+
+    REFRESH_MARGIN_SECONDS = 60.0  # stop using a handle this close to expiry
+
+    def __init__(
+        self,
+        create: Callable[..., Awaitable[tuple[str, float]]],
+        delete: Callable[[str], Awaitable[None]],
+    ):
+        self._create = create
+        self._delete = delete
+        self._handles: dict[str, _Handle] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self.failures = 0
+
+    def lookup(self, scope: str, fingerprint: str, *create_args: Any) -> Optional[str]:
+        """Cached-content name for *scope* if it matches *fingerprint*; otherwise start creating one."""
+        handle = self._handles.get(scope)
+        if handle is not None and handle.fingerprint == fingerprint:
+            if handle.name and time.monotonic() < handle.expires_at - self.REFRESH_MARGIN_SECONDS:
+                self.hits += 1
+                return handle.name
+            if handle.failed or not handle.name:
+                self.misses += 1  # being created, or not cacheable
+                return None
+        self.misses += 1
+        if handle is not None and handle.name:
+            self._spawn(self._delete_quietly(handle.name))
+        self._handles[scope] = _Handle(fingerprint)
+        self._spawn(self._build(scope, fingerprint, *create_args))
+        return None
+
+    def forget(self, scope: str) -> None:
+        """Drop *scope*'s handle (e.g. the provider no longer knows it)."""
+        self._handles.pop(scope, None)
+
+    async def _build(self, scope: str, fingerprint: str, *create_args: Any) -> None:
+        try:
+            name, ttl = await self._create(*create_args)
+        except Exception as exc:
+            self.failures += 1
+            logger.warning("Prompt prefix cache for %s not created: %s", scope, exc)
+            handle = self._handles.get(scope)
+            if handle is not None and handle.fingerprint == fingerprint:
+                handle.failed = True
+            return
+        self.created += 1
+        handle = self._handles.get(scope)
+        if handle is None or handle.fingerprint != fingerprint:
+            await self._delete_quietly(name)  # the prefix changed meanwhile
+            return
+        handle.name = name
+        handle.expires_at = time.monotonic() + ttl
+        logger.info("Prompt prefix cached: scope=%s name=%s ttl=%.0fs", scope, name, ttl)
+
+    async def _delete_quietly(self, name: str) -> None:
+        try:
+            await self._delete(name)
+        except Exception as exc:
+            logger.debug("Prompt prefix cache %s not deleted: %s", name, exc)
+
+    def _spawn(self, coro: Awaitable[None]) -> None:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "scopes": len(self._handles),
+            "active": sum(1 for h in self._handles.values() if h.name),
+            "hits": self.hits,
+            "misses": self.misses,
+            "created": self.created,
+            "failures": self.failures,
+        }
@@ -39,6 +39,39 @@ Return your answer as a JSON object with this exact structure:
 Only output valid JSON, nothing else."""
 
 
+# ── Map-reduce summarisation (documents beyond one context window) ─────────────
+# Section notes are level-independent so a level change reuses them; the
+# level prompt above is applied once, to the reduced notes.
+
+SUMMARIZE_SECTION = """You are an expert academic note-taker.
+The following text is one section of a longer document.
+Write dense, faithful notes on it: the main points, arguments, evidence,
+definitions, figures and conclusions. Do not add anything that is not in
+the text, and do not refer to "this section".
+
+Return your answer as a JSON object with this exact structure:
+{"summary": "<your notes>"}
+
+Only output valid JSON, nothing else."""
+
+
+MERGE_SECTION_SUMMARIES = """You are an expert academic note-taker.
+The following are notes on consecutive sections of one document.
+Merge them into a single set of notes, in document order. Keep every
+distinct point, argument and conclusion; remove only repetition.
+
+Return your answer as a JSON object with this exact structure:
+{"summary": "<the merged notes>"}
+
+Only output valid JSON, nothing else."""
+
+
+SECTION_NOTES_PREAMBLE = (
+    "The text below is a set of notes covering an entire long document, "
+    "section by section. Treat it as the document itself.\n\n"
+)
+
+
 # ── Concepts ──────────────────────────────────────────────────────────────────
 
 EXTRACT_CONCEPTS = """You are a knowledge extraction expert.
@@ -68,6 +101,43 @@ Return your answer as a JSON object with this exact structure:
 Only output valid JSON, nothing else."""
 
 
+# ── One-shot analysis (summary + concepts + steps in one call) ───────────────
+
+_ANALYSIS_SUMMARY_STYLES = {
+    "short": "a concise 3-5 sentence summary focused on the main argument and key conclusions",
+    "detailed": (
+        "a comprehensive summary organised with Markdown headers, including all major "
+        "points, supporting evidence, and conclusions"
+    ),
+    "comprehensive": (
+        "a comprehensive, concept-focused Markdown summary covering core definitions, key "
+        "theories and how they connect, practical applications, common misconceptions, "
+        "and memory aids or analogies where helpful"
+    ),
+}
+
+ANALYZE_DOCUMENT_TEMPLATE = """You are an expert learning assistant.
+Analyse the following text and produce three things:
+1. summary: {summary_style}.
+2. concepts: up to 10 key concepts, each with
+   - name: short concept name
+   - definition: one-line definition
+   - importance: integer 1-5 (5 = most important)
+   - analogy: a simple real-world analogy (or null if none fits)
+3. steps: a 5-15 step implementation plan turning the concepts into
+   actionable, specific, logically ordered steps.
+
+Return your answer as a JSON object with this exact structure:
+{{"summary": "...", "concepts": [{{"name": "...", "definition": "...", "importance": 3, "analogy": "..."}}], "steps": ["Step 1: ...", "Step 2: ..."]}}
+
+Only output valid JSON, nothing else."""
+
+
+def analyze_document_prompt(level: str) -> str:
+    style = _ANALYSIS_SUMMARY_STYLES.get(level, _ANALYSIS_SUMMARY_STYLES["short"])
+    return ANALYZE_DOCUMENT_TEMPLATE.format(summary_style=style)
+
+
 # ── Retry wrapper (appended on second attempt) ───────────────────────────────
 # Imported from services.prompts — kept here for backward compatibility
 from services.prompts import STRICT_JSON_SUFFIX  # noqa: F401
@@ -2,6 +2,7 @@
 RAG Service — orchestrates the full Retrieval-Augmented Generation pipeline.
 
 1. Detect query intent (smart routing)
+   — near-identical questions are served from the semantic answer cache
 2. Build an augmented prompt via the context engine
 3. Call the LLM with project-aware system prompt
 4. Run drift detection on the response
@@ -13,14 +14,19 @@ from __future__ import annotations
 
 import logging
 import re
-from typing import Any
+import time
+from typing import Any, AsyncIterator, Optional
 
 from sqlalchemy.orm import Session
 
+from config import settings
 from models.chat_message import ChatMessage
-from services.context_engine import build_context_prompt
+from services import deadline, semantic_cache
+from services.context_engine import build_context_parts
+from services.embedding_service import generate_embedding
 from services.drift_detector import check_drift
 from services.llm_service import get_llm_service
+from services.prompt_cache import PromptPrefix
 from services.prompts.chat_prompts import CHAT_SYSTEM_PROMPT
 
 logger = logging.getLogger(__name__)
@@ -63,6 +69,27 @@ def _detect_intent(query: str) -> str:
     return "rag"
 
 
+async def _embed_query(user_query: str) -> Optional[list[float]]:
+    """Embed the query once for both the semantic cache and RAG retrieval."""
+    if not deadline.allows_optional("query embedding"):
+        return None
+    try:
+        return await generate_embedding(user_query)
+    except Exception as exc:
+        logger.warning("Query embedding failed: %s — continuing without semantic cache", exc)
+        return None
+
+
+def _chat_session(project_id: str, user_id: str) -> str:
+    """Conversation key; lets local models continue from the previous turn."""
+    return f"{project_id}:{user_id}"
+
+
+def _context_budget(llm) -> int:
+    """Token budget for project context + retrieved knowledge in the chat prompt."""
+    return min(settings.chat_context_max_tokens, llm.prompt_budget(CHAT_SYSTEM_PROMPT, max_tokens=4096))
+
+
 async def query_with_context(
     project_id: str,
     user_query: str,
@@ -73,36 +100,212 @@ async def query_with_context(
     """
     Full RAG pipeline:
       1. Detect query intent (smart routing)
-      2. Build context-augmented prompt
-      3. Call LLM
-      4. Run drift detection
-      5. Persist both messages
-      6. Return structured response
+      2. Serve from the semantic answer cache when possible
+      3. Build context-augmented prompt
+      4. Call LLM
+      5. Run drift detection
+      6. Persist both messages
+      7. Return structured response
 
-    Returns {answer, context_used, drift_warnings, routed_module, provider, latency_ms, message_id}
+    Returns {answer, context_used, drift_warnings, routed_module, provider, latency_ms, message_id, cache_hit}
     """
+    start = time.perf_counter()
+
     # ── 1. Smart routing ──────────────────────────────────────────────────
     routed_module = _detect_intent(user_query)
     logger.info("Query routed to module=%s for project=%s", routed_module, project_id)
 
-    # ── 2. Build the augmented prompt ─────────────────────────────────────
-    augmented_prompt, context_refs = await build_context_prompt(
-        project_id, user_query, db,
+    # ── 2. Semantic answer cache ──────────────────────────────────────────
+    cache_version = semantic_cache.context_version(project_id)
+    query_embedding = await _embed_query(user_query)
+    cached = semantic_cache.lookup(project_id, query_embedding) if query_embedding else None
+    if cached is not None:
+        # The local model's conversation state no longer includes this turn
+        get_llm_service(mode).for_call_type("chat").end_session(_chat_session(project_id, user_id))
+        assistant_msg = _persist_exchange(
+            db, project_id, user_query, cached["answer"], cached["context_used"],
+            cached["drift_warnings"], routed_module,
+        )
+        latency_ms = (time.perf_counter() - start) * 1000
+        logger.info(
+            "RAG cache hit: project=%s distance=%.4f latency=%.0fms",
+            project_id, cached["cache_distance"], latency_ms,
+        )
+        return {
+            "answer": cached["answer"],
+            "context_used": cached["context_used"],
+            "drift_warnings": cached["drift_warnings"],
+            "routed_module": routed_module,
+            "provider": cached["provider"],
+            "latency_ms": round(latency_ms, 1),
+            "message_id": str(assistant_msg.id),
+            "cache_hit": True,
+        }
+
+    # ── 3. Build the augmented prompt ─────────────────────────────────────
+    llm = get_llm_service(mode).for_call_type("chat")
+    context_prefix, augmented_prompt, context_refs = await build_context_parts(
+        project_id, user_query, db, query_embedding=query_embedding,
+        token_budget=_context_budget(llm),
     )
 
-    # ── 3. Call the LLM ──────────────────────────────────────────────────
-    llm = get_llm_service(mode)
+    # ── 4. Call the LLM ──────────────────────────────────────────────────
     answer, provider, latency_ms = await llm.generate(
         prompt=augmented_prompt,
         system_prompt=CHAT_SYSTEM_PROMPT,
         temperature=0.4,
         max_tokens=4096,
+        call_type="chat",
+        session=_chat_session(project_id, user_id),
+        prefix=PromptPrefix(context_prefix, scope=project_id),
+    )
+
+    # ── 5. Drift detection ────────────────────────────────────────────────
+    drift_warnings = await check_drift(project_id, answer, db, mode=mode)
+
+    # ── 6. Persist messages ──────────────────────────────────────────────
+    assistant_msg = _persist_exchange(
+        db, project_id, user_query, answer, context_refs, drift_warnings, routed_module,
+    )
+    if query_embedding:
+        semantic_cache.store(project_id, query_embedding, {
+            "answer": answer,
+            "context_used": context_refs,
+            "drift_warnings": drift_warnings,
+            "provider": provider,
+        }, version=cache_version)
+
+    logger.info(
+        "RAG query: project=%s module=%s provider=%s latency=%.0fms chunks=%d drift=%d",
+        project_id,
+        routed_module,
+        provider,
+        latency_ms,
+        len(context_refs),
+        len(drift_warnings),
+    )
+
+    # ── 7. Return structured response ────────────────────────────────────
+    return {
+        "answer": answer,
+        "context_used": context_refs,
+        "drift_warnings": drift_warnings,
+        "routed_module": routed_module,
+        "provider": provider,
+        "latency_ms": round(latency_ms, 1),
+        "message_id": str(assistant_msg.id),
+        "cache_hit": False,
+    }
+
+
+async def stream_query_with_context(
+    project_id: str,
+    user_query: str,
+    user_id: str,
+    db: Session,
+    mode: str = "cloud",
+) -> AsyncIterator[tuple[str, dict[str, Any]]]:
+    """
+    Streaming variant of query_with_context().
+
+    Yields (event, data) pairs in order:
+      ("context", {context_used, routed_module})   — before the LLM call
+      ("token",   {text})                           — one per streamed chunk
+      ("done",    {drift_warnings, routed_module, provider, latency_ms, message_id, cache_hit})
+    Drift detection and persistence run after the last token. A semantic
+    cache hit is sent as a single token.
+    """
+    start = time.perf_counter()
+    routed_module = _detect_intent(user_query)
+    logger.info("Query routed to module=%s for project=%s (stream)", routed_module, project_id)
+
+    cache_version = semantic_cache.context_version(project_id)
+    query_embedding = await _embed_query(user_query)
+    cached = semantic_cache.lookup(project_id, query_embedding) if query_embedding else None
+    if cached is not None:
+        get_llm_service(mode).for_call_type("chat").end_session(_chat_session(project_id, user_id))
+        yield "context", {"context_used": cached["context_used"], "routed_module": routed_module}
+        yield "token", {"text": cached["answer"]}
+        assistant_msg = _persist_exchange(
+            db, project_id, user_query, cached["answer"], cached["context_used"],
+            cached["drift_warnings"], routed_module,
+        )
+        yield "done", {
+            "drift_warnings": cached["drift_warnings"],
+            "routed_module": routed_module,
+            "provider": cached["provider"],
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+            "message_id": str(assistant_msg.id),
+            "cache_hit": True,
+        }
+        return
+
+    llm = get_llm_service(mode).for_call_type("chat")
+    context_prefix, augmented_prompt, context_refs = await build_context_parts(
+        project_id, user_query, db, query_embedding=query_embedding,
+        token_budget=_context_budget(llm),
     )
+    yield "context", {"context_used": context_refs, "routed_module": routed_module}
+
+    llm_start = time.perf_counter()
+    parts: list[str] = []
+    provider = ""
+    async for chunk, provider in llm.generate_stream(
+        prompt=augmented_prompt,
+        system_prompt=CHAT_SYSTEM_PROMPT,
+        temperature=0.4,
+        max_tokens=4096,
+        call_type="chat",
+        session=_chat_session(project_id, user_id),
+        prefix=PromptPrefix(context_prefix, scope=project_id),
+    ):
+        parts.append(chunk)
+        yield "token", {"text": chunk}
+    latency_ms = (time.perf_counter() - llm_start) * 1000
+    answer = "".join(parts)
 
-    # ── 4. Drift detection ────────────────────────────────────────────────
     drift_warnings = await check_drift(project_id, answer, db, mode=mode)
+    assistant_msg = _persist_exchange(
+        db, project_id, user_query, answer, context_refs, drift_warnings, routed_module,
+    )
+    if query_embedding:
+        semantic_cache.store(project_id, query_embedding, {
+            "answer": answer,
+            "context_used": context_refs,
+            "drift_warnings": drift_warnings,
+            "provider": provider,
+        }, version=cache_version)
+
+    logger.info(
+        "RAG stream: project=%s module=%s provider=%s latency=%.0fms chunks=%d drift=%d",
+        project_id,
+        routed_module,
+        provider,
+        latency_ms,
+        len(context_refs),
+        len(drift_warnings),
+    )
+
+    yield "done", {
+        "drift_warnings": drift_warnings,
+        "routed_module": routed_module,
+        "provider": provider,
+        "latency_ms": round(latency_ms, 1),
+        "message_id": str(assistant_msg.id),
+        "cache_hit": False,
+    }
+
 
-    # ── 5. Persist messages ──────────────────────────────────────────────
+def _persist_exchange(
+    db: Session,
+    project_id: str,
+    user_query: str,
+    answer: str,
+    context_refs: list[dict],
+    drift_warnings: list[dict],
+    routed_module: str,
+) -> ChatMessage:
+    """Store the user + assistant messages in one commit; return the assistant row."""
     # User message
     user_msg = ChatMessage(
         project_id=project_id,
@@ -127,27 +330,7 @@ async def query_with_context(
     db.add(assistant_msg)
     db.commit()
     db.refresh(assistant_msg)
-
-    logger.info(
-        "RAG query: project=%s module=%s provider=%s latency=%.0fms chunks=%d drift=%d",
-        project_id,
-        routed_module,
-        provider,
-        latency_ms,
-        len(context_refs),
-        len(drift_warnings),
-    )
-
-    # ── 6. Return structured response ────────────────────────────────────
-    return {
-        "answer": answer,
-        "context_used": context_refs,
-        "drift_warnings": drift_warnings,
-        "routed_module": routed_module,
-        "provider": provider,
-        "latency_ms": round(latency_ms, 1),
-        "message_id": str(assistant_msg.id),
-    }
+    return assistant_msg
 
 
 async def get_chat_history(
@@ -0,0 +1,174 @@
+"""
+Per-provider concurrency limits and token-bucket rate limiting.
+
+Each LLM provider gets a ProviderLimiter built from flat settings
+(llm_<provider>_max_concurrency / _rpm / _tpm; 0 = unlimited):
+
+  concurrency — at most N calls in flight (asyncio.Semaphore)
+  rpm         — requests per minute (token bucket, one token per call)
+  tpm         — tokens per minute (token bucket; the prompt estimate is
+                reserved up front, the generated output is charged after)
+
+Callers queue for up to settings.llm_limit_max_wait_seconds. If a slot
+could not be had in time, ProviderBusyError is raised so LLMService falls
+back to the next provider instead of firing a call that would only 429.
+Queue wait is reported separately from call latency.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
+
+from config import settings
+
+
+class ProviderBusyError(Exception):
+    """The provider's local limits could not admit the call in time."""
+
+
+class TokenBucket:
+    """Continuous-refill bucket of `per_minute` capacity.
+
+    Reservations may drive the level negative; later callers then wait
+    for the deficit to refill. This keeps concurrent reservations honest
+    without a lock.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0  # tokens per second
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until *amount* could be taken from the bucket."""
+        self._refill()
+        amount = min(amount, self.capacity)  # a single oversized call can still run
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+
+class ProviderLimiter:
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int = 0,
+        rpm: int = 0,
+        tpm: int = 0,
+        max_wait: Optional[float] = None,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait if max_wait is not None else settings.llm_limit_max_wait_seconds
+        self._semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency > 0 else None
+        self._requests = TokenBucket(rpm) if rpm > 0 else None
+        self._tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.total_queue_ms = 0.0
+        self.max_queue_ms = 0.0
+
+    @classmethod
+    def from_settings(cls, name: str) -> "ProviderLimiter":
+        return cls(
+            name,
+            max_concurrency=getattr(settings, f"llm_{name}_max_concurrency", 0),
+            rpm=getattr(settings, f"llm_{name}_rpm", 0),
+            tpm=getattr(settings, f"llm_{name}_tpm", 0),
+        )
+
+    @property
+    def unlimited(self) -> bool:
+        return self._semaphore is None and self._requests is None and self._tokens is None
+
+    def _reject(self, why: str) -> ProviderBusyError:
+        self.rejected += 1
+        return ProviderBusyError(f"{self.name} {why} (waited up to {self.max_wait:.1f}s)")
+
+    @asynccontextmanager
+    async def slot(self, tokens: int = 0) -> AsyncIterator[float]:
+        """Hold a call slot; yields the queue wait in milliseconds."""
+        if self.unlimited:
+            self.admitted += 1
+            self.in_flight += 1
+            try:
+                yield 0.0
+            finally:
+                self.in_flight -= 1
+            return
+
+        start = time.perf_counter()
+        deadline = time.monotonic() + self.max_wait
+        self.waiting += 1
+        try:
+            if self._semaphore is not None:
+                try:
+                    await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_wait)
+                except asyncio.TimeoutError:
+                    raise self._reject("concurrency limit reached") from None
+            try:
+                wait = max(
+                    self._requests.wait_time(1) if self._requests else 0.0,
+                    self._tokens.wait_time(tokens) if self._tokens else 0.0,
+                )
+                if time.monotonic() + wait > deadline:
+                    raise self._reject("rate limit reached")
+                # Reserve before sleeping so concurrent callers queue behind us
+                if self._requests:
+                    self._requests.take(1)
+                if self._tokens:
+                    self._tokens.take(tokens)
+                if wait:
+                    await asyncio.sleep(wait)
+            except BaseException:
+                if self._semaphore is not None:
+                    self._semaphore.release()
+                raise
+        finally:
+            self.waiting -= 1
+
+        queue_ms = (time.perf_counter() - start) * 1000
+        self.admitted += 1
+        self.total_queue_ms += queue_ms
+        self.max_queue_ms = max(self.max_queue_ms, queue_ms)
+        self.in_flight += 1
+        try:
+            yield queue_ms
+        finally:
+            self.in_flight -= 1
+            if self._semaphore is not None:
+                self._semaphore.release()
+
+    def charge(self, tokens: int) -> None:
+        """Count generated output tokens against the TPM budget."""
+        if self._tokens is not None:
+            self._tokens.take(tokens)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "provider": self.name,
+            "max_concurrency": self.max_concurrency or None,
+            "rpm": int(self._requests.capacity) if self._requests else None,
+            "tpm": int(self._tokens.capacity) if self._tokens else None,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_queue_ms": round(self.total_queue_ms / self.admitted, 1) if self.admitted else 0.0,
+            "max_queue_ms": round(self.max_queue_ms, 1),
+        }
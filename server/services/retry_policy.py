@@ -0,0 +1,165 @@
+"""
+Rate-limit cool-downs for LLM providers.
+
+When a provider answers 429 (or 503 with a Retry-After), its RetryPolicy
+records when it will accept calls again:
+
+  headers  Retry-After (seconds or HTTP date), Groq's
+           x-ratelimit-reset-requests / -tokens ("2m59.56s", "350ms"),
+           OpenRouter's x-ratelimit-reset (epoch milliseconds) and Gemini's
+           RetryInfo.retryDelay ("37s") in the error details
+  jitter   without any of them, decorrelated jitter:
+           delay = min(cap, uniform(base, previous delay × 3)), reset to
+           base by the next success
+
+LLMService moves cooling providers to the back of every chain (soonest
+reset first). A call that reaches a cooling provider waits for the reset
+if it is within settings.llm_retry_max_wait_seconds and the request
+deadline, and otherwise moves on without spending a request on it.
+"""
+
+from __future__ import annotations
+
+import random
+import re
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Optional
+
+from config import settings
+from services.rate_limiter import ProviderBusyError
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class ProviderCoolingDown(ProviderBusyError):
+    """The provider rate-limited us and its reset is too far away to wait for."""
+
+
+def _parse_duration(value: str) -> Optional[float]:
+    """Seconds in a Go-style duration ("1m30.5s", "350ms") or a bare number of seconds."""
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts or "".join(n + u for n, u in parts) != value:
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+def _parse_retry_after(value: str) -> Optional[float]:
+    seconds = _parse_duration(value)
+    if seconds is not None:
+        return seconds
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return (when - datetime.now(timezone.utc)).total_seconds()
+
+
+def _parse_reset_timestamp(value: str) -> Optional[float]:
+    """x-ratelimit-reset: epoch milliseconds / seconds, or seconds from now."""
+    try:
+        number = float(value)
+    except ValueError:
+        return _parse_duration(value)
+    if number > 1e12:
+        return number / 1000 - time.time()
+    if number > 1e9:
+        return number - time.time()
+    return number
+
+
+def _headers(exc: Exception) -> dict[str, str]:
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return {}
+    try:
+        return {str(k).lower(): str(v) for k, v in headers.items()}
+    except AttributeError:
+        return {}
+
+
+def _gemini_retry_delay(exc: Exception) -> Optional[float]:
+    details = getattr(exc, "details", None)
+    if not isinstance(details, dict):
+        return None
+    error = details.get("error", details)
+    for item in error.get("details", []) if isinstance(error, dict) else []:
+        if isinstance(item, dict) and isinstance(item.get("retryDelay"), str):
+            return _parse_duration(item["retryDelay"])
+    return None
+
+
+def reset_after(exc: Exception) -> Optional[float]:
+    """Seconds until the provider that raised *exc* says it will accept calls again, if it says."""
+    headers = _headers(exc)
+    if "retry-after" in headers:
+        seconds = _parse_retry_after(headers["retry-after"])
+        if seconds is not None:
+            return max(seconds, 0.0)
+    resets = [
+        _parse_duration(headers[name])
+        for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")
+        if name in headers
+    ]
+    if "x-ratelimit-reset" in headers:
+        resets.append(_parse_reset_timestamp(headers["x-ratelimit-reset"]))
+    resets.append(_gemini_retry_delay(exc))
+    known = [r for r in resets if r is not None]
+    return max(max(known), 0.0) if known else None
+
+
+class RetryPolicy:
+    def __init__(self, name: str, base_seconds: Optional[float] = None, cap_seconds: Optional[float] = None):
+        self.name = name
+        self.base = base_seconds if base_seconds is not None else settings.llm_retry_base_seconds
+        self.cap = cap_seconds if cap_seconds is not None else settings.llm_retry_cap_seconds
+        self._delay = self.base  # previous decorrelated-jitter delay
+        self.blocked_until: Optional[float] = None  # time.monotonic()
+        self.rate_limited = 0
+        self.from_headers = 0
+        self.waited = 0
+        self.skipped = 0
+
+    def wait_time(self) -> float:
+        """Seconds until the provider's reset; 0 when it isn't cooling down."""
+        if self.blocked_until is None:
+            return 0.0
+        return max(0.0, self.blocked_until - time.monotonic())
+
+    def record_rate_limit(self, exc: Exception) -> float:
+        """Start a cool-down for *exc*; returns its length in seconds."""
+        self.rate_limited += 1
+        seconds = reset_after(exc)
+        if seconds is not None:
+            self.from_headers += 1
+            seconds = min(seconds, self.cap)
+        else:
+            self._delay = min(self.cap, random.uniform(self.base, self._delay * 3))
+            seconds = self._delay
+        self.blocked_until = max(self.blocked_until or 0.0, time.monotonic() + seconds)
+        return seconds
+
+    def record_success(self) -> None:
+        self._delay = self.base
+        self.blocked_until = None
+
+    def snapshot(self) -> dict[str, Any]:
+        wait = self.wait_time()
+        return {
+            "provider": self.name,
+            "cooling_down": wait > 0,
+            "reset_in_seconds": round(wait, 1) if wait else None,
+            "rate_limited": self.rate_limited,
+            "from_headers": self.from_headers,
+            "waited": self.waited,
+            "skipped": self.skipped,
+        }
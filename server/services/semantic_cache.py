@@ -0,0 +1,111 @@
+"""
+Semantic answer cache for project chat.
+
+Stores (query embedding, answer payload) per project. A new query whose
+embedding lies within settings.chat_semantic_cache_distance (cosine
+distance) of a stored query is answered from the cache, provided the
+project context has not changed since the answer was produced.
+
+Every call to invalidate(project_id) bumps the project's context version
+and drops its entries. It is called whenever documents, tasks, code
+insights, constraints, decisions or open questions change
+(routers.projects.cache_invalidate and context_engine.update_context).
+Answers computed against an older version are never stored.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from config import settings
+
+
+@dataclass
+class _Entry:
+    embedding: list[float]
+    norm: float
+    payload: dict[str, Any]
+    expires_at: float
+
+
+_entries: dict[str, list[_Entry]] = {}
+_versions: dict[str, int] = {}
+_counters = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0}
+
+
+def _norm(vec: list[float]) -> float:
+    return math.sqrt(sum(v * v for v in vec))
+
+
+def cosine_distance(a: list[float], b: list[float], norm_a: Optional[float] = None, norm_b: Optional[float] = None) -> float:
+    norm_a = norm_a if norm_a is not None else _norm(a)
+    norm_b = norm_b if norm_b is not None else _norm(b)
+    if not norm_a or not norm_b:
+        return 1.0
+    return 1.0 - sum(x * y for x, y in zip(a, b)) / (norm_a * norm_b)
+
+
+def context_version(project_id: str) -> int:
+    """Current context version; capture it before building the answer."""
+    return _versions.get(str(project_id), 0)
+
+
+def lookup(project_id: str, embedding: list[float]) -> Optional[dict[str, Any]]:
+    """Return the cached payload of the closest matching query, or None."""
+    if not settings.chat_semantic_cache_enabled:
+        return None
+    now = time.monotonic()
+    entries = [e for e in _entries.get(str(project_id), []) if e.expires_at > now]
+    _entries[str(project_id)] = entries
+
+    query_norm = _norm(embedding)
+    best: Optional[_Entry] = None
+    best_distance = settings.chat_semantic_cache_distance
+    for entry in entries:
+        distance = cosine_distance(embedding, entry.embedding, query_norm, entry.norm)
+        if distance <= best_distance:
+            best, best_distance = entry, distance
+
+    if best is None:
+        _counters["misses"] += 1
+        return None
+    _counters["hits"] += 1
+    return {**best.payload, "cache_distance": round(best_distance, 4)}
+
+
+def store(project_id: str, embedding: list[float], payload: dict[str, Any], version: int) -> None:
+    """Cache *payload* unless the project context changed since *version*."""
+    if not settings.chat_semantic_cache_enabled or version != context_version(project_id):
+        return
+    entries = _entries.setdefault(str(project_id), [])
+    entries.append(_Entry(
+        embedding=list(embedding),
+        norm=_norm(embedding),
+        payload=payload,
+        expires_at=time.monotonic() + settings.chat_semantic_cache_ttl_seconds,
+    ))
+    del entries[:-settings.chat_semantic_cache_max_entries]
+    _counters["stores"] += 1
+
+
+def invalidate(project_id: str) -> None:
+    """Drop the project's cached answers and bump its context version."""
+    pid = str(project_id)
+    _versions[pid] = _versions.get(pid, 0) + 1
+    _entries.pop(pid, None)
+    _counters["invalidations"] += 1
+
+
+def stats() -> dict[str, Any]:
+    lookups = _counters["hits"] + _counters["misses"]
+    return {
+        "enabled": settings.chat_semantic_cache_enabled,
+        **_counters,
+        "hit_rate": round(_counters["hits"] / lookups, 4) if lookups else 0.0,
+        "projects": len(_entries),
+        "entries": sum(len(e) for e in _entries.values()),
+        "max_distance": settings.chat_semantic_cache_distance,
+    }
@@ -0,0 +1,175 @@
+"""
+Token budgeting — fast token estimates and prompt sizing per model.
+
+Every prompt is sized against the model it is sent to:
+
+  input budget = min(context window × (1 − safety margin) − output budget,
+                     settings.llm_prompt_token_cap) − system prompt
+
+Token counts are estimated without a tokenizer. The text is encoded once
+and counted with C-level bytes operations (punctuation, word-ish bytes,
+whitespace-separated words, multi-byte characters), then scaled by a
+per-model factor: bigger vocabularies (Gemini, Llama 3) need fewer tokens
+than small ones (Phi-3). Estimates lean high so budgets stay safe.
+benchmarks/bench_token_estimates.py compares them with real tokenizers.
+"""
+
+from __future__ import annotations
+
+import math
+import string
+from dataclasses import dataclass
+from typing import Optional
+
+from config import settings
+
+_PUNCT_BYTES = string.punctuation.encode()
+MIN_OUTPUT_TOKENS = 512  # below this a provider is skipped rather than starved
+
+
+@dataclass(frozen=True)
+class ModelProfile:
+    context_window: int  # tokens, prompt + output
+    max_output: int  # hard cap on generated tokens
+    token_factor: float = 1.0  # tokens per estimate unit (vocabulary size)
+
+    def tokens(self, units: float) -> int:
+        return math.ceil(units * self.token_factor)
+
+
+# Longest matching key wins; keys are matched as substrings of the model name.
+_PROFILES: dict[str, ModelProfile] = {
+    "gemini-2.0-flash": ModelProfile(1_048_576, 8_192, 0.95),
+    "gemini-1.5-flash": ModelProfile(1_048_576, 8_192, 0.95),
+    "gemini-1.5-pro": ModelProfile(2_097_152, 8_192, 0.95),
+    "gemini": ModelProfile(1_048_576, 8_192, 0.95),
+    "llama-3.3-70b-versatile": ModelProfile(131_072, 32_768, 1.0),
+    "llama-3.1-8b-instant": ModelProfile(131_072, 8_192, 1.0),
+    "llama-3-8b-instruct": ModelProfile(8_192, 8_192, 1.0),
+    "llama3": ModelProfile(8_192, 8_192, 1.0),
+    "mixtral-8x7b": ModelProfile(32_768, 32_768, 1.15),
+    "phi3": ModelProfile(4_096, 4_096, 1.15),
+}
+DEFAULT_PROFILE = ModelProfile(8_192, 4_096, 1.15)
+
+
+def profile_for(provider: str, model: str) -> ModelProfile:
+    """Context window and tokenizer factor for *model* served by *provider*."""
+    matches = [key for key in _PROFILES if key in (model or "")]
+    profile = _PROFILES[max(matches, key=len)] if matches else DEFAULT_PROFILE
+    if provider == "ollama":
+        # Ollama only allocates num_ctx tokens, whatever the model supports
+        window = min(profile.context_window, settings.ollama_num_ctx)
+        profile = ModelProfile(window, min(profile.max_output, window), profile.token_factor)
+    return profile
+
+
+# ── Estimation ────────────────────────────────────────────────────────────────
+
+def count_units(text: str) -> float:
+    """Model-independent token estimate; scale with ModelProfile.tokens()."""
+    if not text:
+        return 0.0
+    data = text.encode("utf-8", "ignore")
+    without_punct = data.translate(None, _PUNCT_BYTES)
+    punct = len(data) - len(without_punct)
+    whitespace = without_punct.count(b" ") + without_punct.count(b"\n") + without_punct.count(b"\t")
+    word_bytes = len(without_punct) - whitespace
+    multibyte = len(data) - len(text)  # extra bytes of non-ASCII characters
+    words = len(text.split())
+    return 0.8 * punct + word_bytes / 4.5 + 0.3 * words + 0.5 * multibyte
+
+
+def estimate_tokens(text: str, profile: Optional[ModelProfile] = None) -> int:
+    return (profile or DEFAULT_PROFILE).tokens(count_units(text))
+
+
+# ── Budgets ───────────────────────────────────────────────────────────────────
+
+def output_budget(profile: ModelProfile, input_tokens: int, max_tokens: int) -> Optional[int]:
+    """Output tokens to request, or None if the prompt doesn't fit the window.
+
+    The requested max_tokens is clamped to the model's output cap and, if
+    need be, shrunk to the room left in the context window (down to
+    MIN_OUTPUT_TOKENS).
+    """
+    wanted = min(max_tokens, profile.max_output)
+    room = int(profile.context_window * (1 - settings.llm_token_safety_margin)) - input_tokens
+    if room >= wanted:
+        return wanted
+    if room >= min(wanted, MIN_OUTPUT_TOKENS):
+        return room
+    return None
+
+
+def input_budget(profile: ModelProfile, system_prompt: str = "", max_tokens: int = 4096) -> int:
+    """Tokens left for the variable part of a prompt sent to *profile*.
+
+    Small windows never give more than half of themselves to the output.
+    """
+    window = int(profile.context_window * (1 - settings.llm_token_safety_margin))
+    reserved_output = min(max_tokens, profile.max_output, window // 2)
+    available = min(window - reserved_output, settings.llm_prompt_token_cap)
+    return max(0, available - estimate_tokens(system_prompt, profile))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, profile: Optional[ModelProfile] = None) -> str:
+    """Longest prefix of *text* within *max_tokens*, cut at a line or word boundary."""
+    if max_tokens <= 0:
+        return ""
+    estimate = estimate_tokens(text, profile)
+    if estimate <= max_tokens:
+        return text
+    cut = int(len(text) * max_tokens / estimate)
+    while cut > 0:
+        piece = text[:cut]
+        boundary = max(piece.rfind("\n"), piece.rfind(" "))
+        if boundary > cut * 0.8:
+            piece = piece[:boundary]
+        if estimate_tokens(piece, profile) <= max_tokens:
+            return piece
+        cut = int(cut * 0.9)
+    return ""
+
+
+def split_by_tokens(text: str, max_tokens: int, profile: Optional[ModelProfile] = None) -> list[str]:
+    """Split *text* into consecutive sections of at most *max_tokens*.
+
+    Sections are built from whole paragraphs; a paragraph larger than
+    *max_tokens* is itself cut at line / word boundaries.
+    """
+    sections: list[str] = []
+    current: list[str] = []
+    current_tokens = 0
+    for paragraph in text.split("\n\n"):
+        tokens = estimate_tokens(paragraph, profile)
+        while tokens > max_tokens:
+            head = truncate_to_tokens(paragraph, max_tokens, profile) or paragraph[: max(1, len(paragraph) // 2)]
+            if current:
+                sections.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            sections.append(head)
+            paragraph = paragraph[len(head):].lstrip()
+            tokens = estimate_tokens(paragraph, profile)
+        if current and current_tokens + tokens > max_tokens:
+            sections.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        if paragraph:
+            current.append(paragraph)
+            current_tokens += tokens
+    if current:
+        sections.append("\n\n".join(current))
+    return sections
+
+
+def fit_text(
+    text: str,
+    max_tokens: int,
+    profile: Optional[ModelProfile] = None,
+    marker: str = "\n\n[... text truncated ...]",
+) -> tuple[str, bool]:
+    """Return (text sized to *max_tokens*, was_truncated); *marker* is appended when cut."""
+    if estimate_tokens(text, profile) <= max_tokens:
+        return text, False
+    room = max_tokens - estimate_tokens(marker, profile)
+    return truncate_to_tokens(text, room, profile) + marker, True
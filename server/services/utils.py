@@ -1,4 +1,10 @@
-"""Shared utilities for LLM response parsing across service modules."""
+"""Shared utilities for LLM response parsing across service modules.
+
+Replies are parsed strictly first. If that fails, repair_json() recovers
+the common breakages locally — markdown fences, prose around the JSON,
+trailing commas, and replies cut off mid-value by max_tokens — so a
+malformed reply rarely costs another LLM round trip.
+"""
 
 from __future__ import annotations
 
@@ -6,6 +12,8 @@ import json
 import re
 from typing import Any
 
+_CLOSERS = {"{": "}", "[": "]"}
+
 
 def clean_json(raw: str) -> str:
     """Strip markdown code fences and surrounding whitespace from an LLM response."""
@@ -15,17 +23,107 @@ def clean_json(raw: str) -> str:
     return raw.strip()
 
 
+def _strip_trailing_commas(text: str) -> str:
+    """Drop commas directly before a closing bracket (outside strings)."""
+    out: list[str] = []
+    in_string = escaped = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "," and text[i + 1:].lstrip()[:1] in ("}", "]"):
+            continue
+        out.append(ch)
+    return "".join(out)
+
+
+def repair_json(raw: str) -> str:
+    """Best-effort repair of a malformed JSON reply; returns the repaired text.
+
+    Keeps the first JSON value in the reply (dropping fences and prose),
+    removes trailing commas, and closes a value truncated mid-way — at the
+    cut point if that parses, otherwise at the last complete element.
+    """
+    text = clean_json(raw)
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return text
+    text = text[min(starts):]
+
+    stack: list[str] = []
+    cuts: list[tuple[int, str]] = []  # (index, brackets open there) where the value may be closed
+    in_string = escaped = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in _CLOSERS:
+            stack.append(ch)
+            cuts.append((i + 1, "".join(stack)))
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                return _strip_trailing_commas(text[: i + 1])
+        elif ch == ",":
+            cuts.append((i, "".join(stack)))
+
+    # Truncated reply: close the open string and brackets
+    candidates = [(text + ('"' if in_string and not escaped else ""), "".join(stack))]
+    candidates += [(text[:i], opened) for i, opened in reversed(cuts)]
+    for body, opened in candidates:
+        body = body.rstrip().rstrip(",")
+        if body.endswith(":"):
+            body += " null"
+        candidate = _strip_trailing_commas(body + "".join(_CLOSERS[c] for c in reversed(opened)))
+        try:
+            json.loads(candidate)
+        except ValueError:
+            continue
+        return candidate
+    return text
+
+
+def load_json(raw: str, expect: type = dict) -> tuple[Any, bool]:
+    """Parse an LLM reply as a JSON *expect* (dict or list).
+
+    Returns (data, was_repaired). Raises ValueError if the reply can't be
+    recovered. A list requested from a JSON-object-only mode may arrive
+    wrapped as {"key": [...]}; a single list value is unwrapped.
+    """
+    repaired = False
+    try:
+        data = json.loads(clean_json(raw))
+    except ValueError:
+        data = json.loads(repair_json(raw))
+        repaired = True
+    if expect is list and isinstance(data, dict):
+        lists = [v for v in data.values() if isinstance(v, list)]
+        if len(lists) == 1:
+            data = lists[0]
+    if not isinstance(data, expect):
+        kind = "object" if expect is dict else "array"
+        raise ValueError(f"Expected a JSON {kind} from LLM")
+    return data, repaired
+
+
 def parse_json_object(raw: str) -> dict[str, Any]:
     """Parse a JSON object from an LLM response string."""
-    data = json.loads(clean_json(raw))
-    if not isinstance(data, dict):
-        raise ValueError("Expected a JSON object from LLM")
-    return data
+    return load_json(raw, dict)[0]
 
 
 def parse_json_array(raw: str) -> list[dict[str, Any]]:
     """Parse a JSON array from an LLM response string."""
-    data = json.loads(clean_json(raw))
-    if not isinstance(data, list):
-        raise ValueError("Expected a JSON array from LLM")
-    return data
+    return load_json(raw, list)[0]
@@ -8,36 +8,33 @@ from __future__ import annotations
 import logging
 from typing import Any
 
-from services.llm_service import get_llm_service
-from services.prompts.workflow_prompts import EXTRACT_TASKS, ANALYZE_TASKS, STRICT_JSON_SUFFIX
-from services.utils import parse_json_array, parse_json_object
+from services.llm_service import LLMService, get_llm_service
+from services.prompts.workflow_prompts import EXTRACT_TASKS, ANALYZE_TASKS
+from services.token_budget import fit_text
 
 logger = logging.getLogger(__name__)
 
-MAX_CHARS = 20_000  # ~5 000 tokens — large enough for a long transcript
+FRAMING_TOKENS = 64  # "Source type: …" and TEXT START / END lines around the input
 
 
 # ── Helpers ───────────────────────────────────────────────────────────────────
 
-def _truncate_text(text: str) -> tuple[str, bool]:
-    """Return (possibly-truncated text, was_truncated)."""
-    if len(text) <= MAX_CHARS:
-        return text, False
-    truncated = text[:MAX_CHARS] + "\n\n[... text truncated for analysis ...]"
-    logger.info("Input text truncated from %d → %d chars", len(text), MAX_CHARS)
-    return truncated, True
+def _truncate_text(text: str, llm: LLMService) -> tuple[str, bool]:
+    """Return (text sized to the chain's input budget, was_truncated)."""
+    budget = llm.prompt_budget(EXTRACT_TASKS) - FRAMING_TOKENS
+    fitted, truncated = fit_text(
+        text, budget, llm.profile(llm.sizing_provider), "\n\n[... text truncated for analysis ...]",
+    )
+    if truncated:
+        logger.info("Input text truncated from %d → %d chars (≈%d tokens)", len(text), len(fitted), budget)
+    return fitted, truncated
 
 
 async def _llm_json_array(prompt: str, system_prompt: str, mode: str = "cloud") -> list[dict[str, Any]]:
-    """Call LLM, parse JSON array. Retry once on malformed JSON."""
+    """Call LLM in JSON mode and parse a JSON array (see LLMService.generate_json)."""
     llm = get_llm_service(mode)
-    text, provider, _ = await llm.generate(prompt, system_prompt)
-    try:
-        return parse_json_array(text)
-    except (ValueError, Exception):
-        logger.warning("Malformed JSON from %s — retrying with strict suffix", provider)
-        text2, _, _ = await llm.generate(prompt, system_prompt + STRICT_JSON_SUFFIX)
-        return parse_json_array(text2)
+    data, _, _ = await llm.generate_json(prompt, system_prompt, call_type="extract", expect=list)
+    return data
 
 
 # ── Public API ────────────────────────────────────────────────────────────────
@@ -54,7 +51,7 @@ async def extract_tasks(text: str, source_type: str, mode: str = "cloud") -> dic
             truncated: bool,
         }
     """
-    text, truncated = _truncate_text(text)
+    text, truncated = _truncate_text(text, get_llm_service(mode).for_call_type("extract"))
     prompt = (
         f"Source type: {source_type}\n\n"
         f"--- TEXT START ---\n{text}\n--- TEXT END ---"
@@ -106,13 +103,7 @@ async def analyze_tasks(
     prompt = f"Here are the current pending tasks:\n\n{task_lines}"
 
     llm = get_llm_service(mode)
-    text, provider, _ = await llm.generate(prompt, ANALYZE_TASKS)
-    try:
-        result = parse_json_object(text)
-    except (ValueError, Exception):
-        logger.warning("Malformed JSON from %s — retrying with strict suffix", provider)
-        text2, _, _ = await llm.generate(prompt, ANALYZE_TASKS + STRICT_JSON_SUFFIX)
-        result = parse_json_object(text2)
+    result, _, _ = await llm.generate_json(prompt, ANALYZE_TASKS, call_type="analyze")
 
     logger.info(
         "AI analysis: %d reprioritisations, %d suggestions",
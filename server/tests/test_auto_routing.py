@@ -0,0 +1,116 @@
+"""Tests for the "auto" inference mode (local Ollama vs cloud by size and load)."""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+
+class FakeProvider:
+    def __init__(self, name: str, model: str):
+        self.name = name
+        self.model = model
+        self.calls = 0
+
+    async def generate(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+        self.calls += 1
+        return f"{self.name} ok"
+
+
+@pytest.fixture
+def auto(monkeypatch):
+    from config import settings
+    from services.llm_service import LLMService
+    from services.llm_stats import StatsRegistry
+
+    monkeypatch.setattr(settings, "llm_adaptive_explore_ratio", 0.0)
+    monkeypatch.setattr(settings, "llm_adaptive_min_samples", 2)
+    monkeypatch.setattr(settings, "llm_auto_local_max_prompt_tokens", 200)
+    monkeypatch.setattr(settings, "llm_auto_local_max_output_tokens", 1024)
+    monkeypatch.setattr(settings, "llm_auto_local_max_queue", 2)
+    local, cloud = FakeProvider("ollama", "phi3:mini"), FakeProvider("gemini", "gemini-2.0-flash")
+    return LLMService(primary=local, fallbacks=[cloud], stats=StatsRegistry(alpha=0.5), routing="auto")
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+@pytest.mark.asyncio
+async def test_small_requests_run_locally(auto):
+    _, provider, _ = await auto.generate("Does this break a constraint?", max_tokens=512, call_type="drift")
+
+    assert provider == "ollama"
+    assert auto.stats.route_snapshot()["drift"]["local"] == 1
+
+
+@pytest.mark.asyncio
+async def test_long_prompts_and_large_output_budgets_go_to_the_cloud(auto):
+    _, long_prompt, _ = await auto.generate("word " * 1000, max_tokens=512, call_type="summarise")
+    _, big_output, _ = await auto.generate("short", max_tokens=4096, call_type="chat")
+
+    assert (long_prompt, big_output) == ("gemini", "gemini")
+    routes = auto.stats.route_snapshot()
+    assert routes["summarise"]["prompt_size"] == 1 and routes["chat"]["output_budget"] == 1
+
+
+@pytest.mark.asyncio
+async def test_busy_local_queue_sends_requests_to_the_cloud(auto):
+    limiter = auto.limiter(auto.primary)
+    held = [limiter.slot(), limiter.slot()]
+    for slot in held:
+        await slot.__aenter__()
+    try:
+        _, provider, _ = await auto.generate("quick check", max_tokens=256, call_type="drift")
+    finally:
+        for slot in held:
+            await slot.__aexit__(None, None, None)
+
+    assert provider == "gemini"
+    assert auto.stats.route_snapshot()["drift"]["queue"] == 1
+
+
+@pytest.mark.asyncio
+async def test_local_model_that_falls_behind_the_cloud_loses_small_requests(auto):
+    for _ in range(2):
+        auto.stats.record("ollama", "phi3:mini", "drift", 9000.0, ok=True)
+        auto.stats.record("gemini", "gemini-2.0-flash", "drift", 400.0, ok=True)
+
+    _, provider, _ = await auto.generate("quick check", max_tokens=256, call_type="drift")
+
+    assert provider == "gemini"
+    assert auto.stats.route_snapshot()["drift"]["latency"] == 1
+
+
+@pytest.mark.asyncio
+async def test_local_provider_stays_the_last_fallback(auto):
+    async def down(*args, **kwargs):
+        raise RuntimeError("cloud down")
+
+    auto.providers[1].generate = down
+    _, provider, _ = await auto.generate("word " * 1000, max_tokens=512, call_type="summarise")
+
+    assert provider == "ollama"
+
+
+@pytest.mark.asyncio
+async def test_long_document_is_sized_for_the_cloud_and_sent_there_whole(auto, monkeypatch):
+    from services import learning_service, llm_cache
+
+    prompts: list[str] = []
+
+    async def concepts(prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+        prompts.append(prompt)
+        return '{"concepts": [{"name": "A"}]}'
+
+    monkeypatch.setattr(llm_cache, "_cache", llm_cache.LLMResultCache(max_entries=8))
+    monkeypatch.setattr(learning_service, "get_llm_service", lambda mode: auto)
+    auto.providers[1].generate = concepts
+    document = "The scheduler admits calls by weighted fair queuing. " * 1600  # ≈20k tokens
+
+    assert await learning_service.extract_concepts(document, mode="auto") == [{"name": "A"}]
+    assert prompts == [document]
+    assert auto.providers[0].calls == 0
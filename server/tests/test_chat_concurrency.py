@@ -0,0 +1,128 @@
+"""Concurrency test — simultaneous /chat requests must not serialise on LLM calls."""
+
+import asyncio
+import os
+import sys
+import time
+import uuid
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+LLM_DELAY = 0.3  # seconds per simulated provider call
+N_REQUESTS = 5
+
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+
+class FakeAsyncGeminiModels:
+    """Stands in for client.aio.models — awaits instead of blocking."""
+
+    async def generate_content(self, model, contents, config):
+        await asyncio.sleep(LLM_DELAY)
+        return SimpleNamespace(text=f"answer to: {contents[-40:]}")
+
+
+class FakeSyncGeminiModels:
+    """Stands in for client.models — blocks the thread like the sync SDK."""
+
+    def generate_content(self, model, contents, config):
+        time.sleep(LLM_DELAY)
+        return SimpleNamespace(text="blocking answer")
+
+
+class FakeAsyncGroqCompletions:
+    async def create(self, model, messages, temperature, max_tokens):
+        await asyncio.sleep(LLM_DELAY)
+        message = SimpleNamespace(content="groq answer")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def _fake_db() -> MagicMock:
+    db = MagicMock()
+    db.refresh.side_effect = lambda obj: setattr(obj, "id", uuid.uuid4())
+    return db
+
+
+@pytest.fixture
+def chat_app(monkeypatch):
+    import main
+    from database import get_db
+    from middleware.auth import get_current_user
+    from services import rag_service
+
+    async def fake_build_context_parts(project_id, user_query, db, **kwargs):
+        return "", f"=== USER QUERY ===\n{user_query}", []
+
+    async def fake_check_drift(project_id, llm_response, db, **kwargs):
+        return []
+
+    async def no_embedding(text):
+        raise RuntimeError("embeddings unavailable in tests")
+
+    monkeypatch.setattr(rag_service, "generate_embedding", no_embedding)
+    monkeypatch.setattr(rag_service, "build_context_parts", fake_build_context_parts)
+    monkeypatch.setattr(rag_service, "check_drift", fake_check_drift)
+
+    main.app.dependency_overrides[get_db] = _fake_db
+    main.app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id=uuid.uuid4())
+    yield main.app
+    main.app.dependency_overrides.clear()
+
+
+async def _fire_chats(app, n: int) -> float:
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(
+            client.post(
+                f"/api/projects/{uuid.uuid4()}/chat",
+                json={"message": f"question number {i}"},
+                headers={"Authorization": "Bearer test"},
+            )
+            for i in range(n)
+        ))
+        elapsed = time.perf_counter() - start
+    assert all(r.status_code == 201 for r in responses), [r.text for r in responses]
+    return elapsed
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+@pytest.mark.asyncio
+async def test_concurrent_chats_with_gemini_overlap(chat_app, monkeypatch):
+    from services import rag_service
+    from services.llm_service import GeminiProvider, LLMService
+
+    provider = GeminiProvider(api_key="test")
+    provider.client = SimpleNamespace(
+        aio=SimpleNamespace(models=FakeAsyncGeminiModels()),
+        models=FakeSyncGeminiModels(),
+    )
+    service = LLMService(primary=provider)
+    monkeypatch.setattr(rag_service, "get_llm_service", lambda mode="cloud": service)
+
+    elapsed = await _fire_chats(chat_app, N_REQUESTS)
+
+    # Serialised calls would take N × LLM_DELAY; overlapping ones ≈ one delay.
+    assert elapsed < LLM_DELAY * 2, f"{N_REQUESTS} chats took {elapsed:.2f}s"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_chats_with_groq_overlap(chat_app, monkeypatch):
+    from services import rag_service
+    from services.llm_service import GroqProvider, LLMService
+
+    provider = GroqProvider(api_key="test")
+    provider.client = SimpleNamespace(chat=SimpleNamespace(completions=FakeAsyncGroqCompletions()))
+    service = LLMService(primary=provider)
+    monkeypatch.setattr(rag_service, "get_llm_service", lambda mode="cloud": service)
+
+    elapsed = await _fire_chats(chat_app, N_REQUESTS)
+
+    assert elapsed < LLM_DELAY * 2, f"{N_REQUESTS} chats took {elapsed:.2f}s"
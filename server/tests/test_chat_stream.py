@@ -0,0 +1,105 @@
+"""Tests for the SSE chat endpoint — event order and persisted message id."""
+
+import json
+import os
+import sys
+import uuid
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+
+class FakeStreamingProvider:
+    name = "fake-stream"
+
+    async def generate(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+        return "Use FastAPI for the backend."
+
+    async def generate_stream(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+        for chunk in ("Use ", "FastAPI ", "for the backend."):
+            yield chunk
+
+
+def _fake_db() -> MagicMock:
+    db = MagicMock()
+    db.refresh.side_effect = lambda obj: setattr(obj, "id", uuid.uuid4())
+    return db
+
+
+def _parse_sse(raw: str) -> list[tuple[str, dict]]:
+    events = []
+    for frame in raw.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+@pytest.mark.asyncio
+async def test_stream_endpoint_sends_context_tokens_then_done(monkeypatch):
+    import httpx
+    import main
+    from database import get_db
+    from middleware.auth import get_current_user
+    from routers import chat as chat_router
+    from services import rag_service
+    from services.llm_service import LLMService
+
+    refs = [{"source_type": "document", "source_id": "d1", "chunk_preview": "FastAPI notes"}]
+    warning = {
+        "type": "technology_mismatch",
+        "severity": "high",
+        "description": "Response suggests 'flask'",
+        "constraint_violated": "Use FastAPI",
+    }
+
+    async def fake_build_context_parts(project_id, user_query, db, **kwargs):
+        return "", user_query, refs
+
+    async def fake_check_drift(project_id, llm_response, db, **kwargs):
+        assert llm_response == "Use FastAPI for the backend."
+        return [warning]
+
+    async def no_embedding(text):
+        raise RuntimeError("embeddings unavailable in tests")
+
+    monkeypatch.setattr(rag_service, "generate_embedding", no_embedding)
+    monkeypatch.setattr(rag_service, "build_context_parts", fake_build_context_parts)
+    monkeypatch.setattr(rag_service, "check_drift", fake_check_drift)
+    monkeypatch.setattr(rag_service, "get_llm_service", lambda mode="cloud": LLMService(primary=FakeStreamingProvider()))
+    stream_db = _fake_db()
+    monkeypatch.setattr(chat_router, "SessionLocal", lambda: stream_db)
+    main.app.dependency_overrides[get_db] = _fake_db
+    main.app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id=uuid.uuid4())
+
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            resp = await client.post(
+                f"/api/projects/{uuid.uuid4()}/chat/stream",
+                json={"message": "Which backend?"},
+                headers={"Authorization": "Bearer test"},
+            )
+    finally:
+        main.app.dependency_overrides.clear()
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = _parse_sse(resp.text)
+
+    assert [e for e, _ in events] == ["context", "token", "token", "token", "done"]
+    assert events[0][1]["context_used"] == refs
+    assert "".join(d["text"] for e, d in events if e == "token") == "Use FastAPI for the backend."
+    done = events[-1][1]
+    assert done["drift_warnings"] == [warning]
+    assert done["provider"] == "fake-stream"
+    assert done["cache_hit"] is False
+    uuid.UUID(done["message_id"])
+    stream_db.commit.assert_called_once()
+    stream_db.close.assert_called_once()
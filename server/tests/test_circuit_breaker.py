@@ -0,0 +1,108 @@
+"""Tests for per-provider circuit breakers in the LLM fallback chain."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+
+class FlakyProvider:
+    def __init__(self, name: str, fail: Exception | None = None):
+        self.name = name
+        self.fail = fail
+        self.calls = 0
+
+    async def generate(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+        self.calls += 1
+        if self.fail:
+            raise self.fail
+        return f"{self.name} ok"
+
+
+def _server_error():
+    import httpx
+    resp = httpx.Response(503, request=httpx.Request("POST", "https://example.com"))
+    return httpx.HTTPStatusError("unavailable", request=resp.request, response=resp)
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+def test_breaker_opens_half_opens_and_closes(monkeypatch):
+    from services import circuit_breaker as cb
+
+    now = [1000.0]
+    monkeypatch.setattr(cb.time, "monotonic", lambda: now[0])
+    breaker = cb.CircuitBreaker("gemini", failure_threshold=2, recovery_seconds=30)
+
+    breaker.record_failure("HTTP 429")
+    assert breaker.state == cb.CLOSED and breaker.allow()
+    breaker.record_failure("HTTP 429")
+    assert breaker.state == cb.OPEN and not breaker.allow()
+
+    now[0] += 31
+    assert breaker.allow()              # the single half-open probe
+    assert breaker.state == cb.HALF_OPEN
+    assert not breaker.allow()          # no second probe while one is in flight
+
+    breaker.record_failure("Timeout")   # failed probe re-opens immediately
+    assert breaker.state == cb.OPEN
+
+    now[0] += 31
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == cb.CLOSED and breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_open_provider_is_skipped_without_a_call():
+    from services.circuit_breaker import CircuitBreaker
+    from services.llm_service import LLMService
+
+    primary = FlakyProvider("gemini", fail=_server_error())  # a 429 would cool it down first
+    fallback = FlakyProvider("groq")
+    breakers = {"gemini": CircuitBreaker("gemini", failure_threshold=2, recovery_seconds=60)}
+    service = LLMService(primary=primary, fallback=fallback, breakers=breakers)
+
+    for _ in range(4):
+        _, provider, _ = await service.generate("q")
+        assert provider == "groq"
+
+    assert primary.calls == 2  # third and fourth requests skipped gemini
+    assert breakers["gemini"].snapshot()["state"] == "open"
+    assert breakers["gemini"].snapshot()["skipped"] == 2
+
+
+@pytest.mark.asyncio
+async def test_bad_request_does_not_trip_breaker():
+    import httpx
+    from services.llm_service import LLMService
+
+    resp = httpx.Response(400, request=httpx.Request("POST", "https://example.com"))
+    primary = FlakyProvider("gemini", fail=httpx.HTTPStatusError("bad", request=resp.request, response=resp))
+    service = LLMService(primary=primary, fallback=FlakyProvider("groq"))
+
+    for _ in range(5):
+        await service.generate("q")
+
+    assert primary.calls == 5
+    assert service.breaker(primary).state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_all_circuits_open_fails_fast():
+    import httpx
+    from services.circuit_breaker import CircuitBreaker
+    from services.llm_service import LLMService
+
+    only = FlakyProvider("ollama", fail=httpx.ConnectError("down"))
+    service = LLMService(primary=only, breakers={"ollama": CircuitBreaker("ollama", failure_threshold=1, recovery_seconds=60)})
+
+    with pytest.raises(RuntimeError):
+        await service.generate("q")
+    with pytest.raises(RuntimeError, match="circuit open"):
+        await service.generate("q")
+    assert only.calls == 1
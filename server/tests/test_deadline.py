@@ -0,0 +1,172 @@
+"""Tests for per-request deadlines across the LLM chain and optional stages."""
+
+import asyncio
+import os
+import sys
+from unittest.mock import MagicMock
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+
+class FakeProvider:
+    def __init__(self, name, delay=0.0, exc=None, result="ok"):
+        self.name = name
+        self.delay = delay
+        self.exc = exc
+        self.result = result
+        self.calls = 0
+
+    async def generate(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.exc is not None:
+            raise self.exc
+        return self.result
+
+    async def generate_stream(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        yield "first "
+        await asyncio.sleep(0.2)  # well past the deadline once started
+        yield "second"
+
+
+# ── LLM chain ─────────────────────────────────────────────────────────────────
+
+@pytest.mark.asyncio
+async def test_slow_provider_is_cut_off_and_no_further_hop_starts():
+    from services import deadline
+    from services.llm_service import LLMService
+
+    slow, backup = FakeProvider("gemini", delay=5), FakeProvider("groq")
+    llm = LLMService(primary=slow, fallback=backup)
+    deadline.start(0.1)
+
+    with pytest.raises(deadline.DeadlineExceeded):
+        await asyncio.wait_for(llm.generate("p", call_type="chat"), 1)
+
+    assert backup.calls == 0
+    assert llm.breaker(slow).snapshot()["consecutive_failures"] == 0  # not the provider's fault
+
+
+@pytest.mark.asyncio
+async def test_later_hops_only_get_the_time_left():
+    from services import deadline
+    from services.llm_service import LLMService
+
+    failing = FakeProvider("gemini", exc=httpx.ConnectError("down"))
+    slow_backup = FakeProvider("groq", delay=5)
+    llm = LLMService(primary=failing, fallback=slow_backup)
+    deadline.start(0.1)
+
+    with pytest.raises(deadline.DeadlineExceeded):
+        await asyncio.wait_for(llm.generate("p", call_type="chat"), 1)
+
+    assert (failing.calls, slow_backup.calls) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_coalesced_follower_keeps_its_own_deadline():
+    from services import deadline
+    from services.llm_service import LLMService
+
+    provider = FakeProvider("gemini", delay=0.3)
+    llm = LLMService(primary=provider)
+
+    async def call(seconds):
+        deadline.start(seconds)
+        return await llm.generate("p", call_type="chat")
+
+    leader = asyncio.create_task(call(0.1))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(call(30))
+
+    with pytest.raises(deadline.DeadlineExceeded):
+        await leader
+    text, _, _ = await asyncio.wait_for(follower, 1)
+
+    assert text == "ok" and provider.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_no_deadline_leaves_calls_unbounded():
+    from services.llm_service import LLMService
+
+    text, provider, _ = await LLMService(primary=FakeProvider("gemini", delay=0.05)).generate("p")
+    assert (text, provider) == ("ok", "gemini")
+
+
+@pytest.mark.asyncio
+async def test_deadline_bounds_the_first_chunk_but_not_a_started_stream():
+    from services import deadline
+    from services.llm_service import LLMService
+
+    deadline.start(0.1)
+    chunks = [c async for c, _ in LLMService(primary=FakeProvider("gemini")).generate_stream("p")]
+    assert "".join(chunks) == "first second"
+
+    deadline.start(0.1)
+    llm = LLMService(primary=FakeProvider("gemini", delay=5))
+    with pytest.raises(deadline.DeadlineExceeded):
+        async for _ in llm.generate_stream("p", call_type="chat"):
+            pass
+    assert llm.stats.get("gemini", "", "chat").samples == 0  # the caller's deadline, not a provider failure
+
+
+# ── Optional stages ───────────────────────────────────────────────────────────
+
+@pytest.mark.asyncio
+async def test_drift_check_skips_the_llm_layer_near_the_deadline(monkeypatch):
+    from services import deadline, drift_detector
+
+    async def llm_check(*args, **kwargs):
+        raise AssertionError("LLM drift check should have been skipped")
+
+    monkeypatch.setattr(drift_detector, "_llm_based_check", llm_check)
+    db = MagicMock()
+    db.query.return_value.filter.return_value.first.return_value = MagicMock(constraints=["Use FastAPI"])
+    deadline.start(1.0)  # below request_deadline_optional_min_seconds
+
+    warnings = await drift_detector.check_drift("p1", "Let's build it with Django.", db)
+
+    assert [w["constraint_violated"] for w in warnings] == ["Use FastAPI"]  # rule-based still runs
+
+
+# ── Router dependency ─────────────────────────────────────────────────────────
+
+@pytest.mark.asyncio
+async def test_header_overrides_the_default_and_is_capped(monkeypatch):
+    from fastapi import Depends, FastAPI
+    from config import settings
+    from middleware.deadline import request_deadline
+    from services import deadline
+
+    monkeypatch.setattr(settings, "request_deadline_max_seconds", 30.0)
+    app = FastAPI()
+
+    @app.get("/work", dependencies=[Depends(request_deadline(10.0))])
+    async def work():
+        return {"remaining": deadline.remaining()}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        default = (await client.get("/work")).json()["remaining"]
+        asked = (await client.get("/work", headers={"X-Request-Timeout": "20"})).json()["remaining"]
+        capped = (await client.get("/work", headers={"X-Request-Timeout": "999"})).json()["remaining"]
+
+    assert 9 < default <= 10
+    assert 19 < asked <= 20
+    assert 29 < capped <= 30
+
+
+def test_llm_errors_map_to_gateway_timeout_only_when_out_of_time():
+    from middleware.deadline import llm_error_status
+    from services import deadline
+
+    assert llm_error_status(deadline.DeadlineExceeded("late")) == 504
+    assert llm_error_status(RuntimeError("All LLM providers failed")) == 503
@@ -0,0 +1,187 @@
+"""Tests for cancelling request handlers when the client disconnects."""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+
+class HangingProvider:
+    """Never answers; records whether its call was cancelled."""
+
+    name = "gemini"
+
+    def __init__(self):
+        self.started = asyncio.Event()
+        self.cancelled = False
+
+    async def generate(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+        self.started.set()
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+class Client:
+    """Drives one ASGI request; disconnect() makes receive() report the client gone."""
+
+    def __init__(self, path: str):
+        self.scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+            "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+            "root_path": "", "headers": [(b"content-type", b"application/json")],
+            "client": ("test", 1), "server": ("test", 80),
+        }
+        self._gone = asyncio.Event()
+        self._body_sent = False
+        self.sent: list[dict] = []
+
+    async def receive(self):
+        if not self._body_sent:
+            self._body_sent = True
+            return {"type": "http.request", "body": b"{}", "more_body": False}
+        await self._gone.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message):
+        self.sent.append(message)
+
+    def disconnect(self):
+        self._gone.set()
+
+
+def _app(llm, finished: list):
+    from fastapi import FastAPI
+    from middleware.disconnect import CancelOnDisconnectMiddleware
+
+    app = FastAPI()
+    app.add_middleware(CancelOnDisconnectMiddleware, path_pattern=r"^/api/projects/[^/]+/chat")
+
+    @app.post("/api/projects/{project_id}/chat")
+    async def chat(project_id: str):
+        text, _, _ = await llm.generate("question", call_type="chat")
+        finished.append(text)
+        return {"text": text}
+
+    return app
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+@pytest.mark.asyncio
+async def test_disconnect_cancels_the_llm_call():
+    from services.llm_service import LLMService
+
+    provider, finished = HangingProvider(), []
+    llm = LLMService(primary=provider)
+    client = Client("/api/projects/p1/chat")
+
+    request = asyncio.create_task(_app(llm, finished)(client.scope, client.receive, client.send))
+    await asyncio.wait_for(provider.started.wait(), 1)
+    client.disconnect()
+    await asyncio.wait_for(request, 1)  # returns quietly — nobody to answer
+
+    assert provider.cancelled
+    assert finished == [] and client.sent == []
+    assert llm.inflight.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_completed_requests_are_unaffected():
+    from services.llm_service import LLMService
+
+    class QuickProvider:
+        name = "gemini"
+
+        async def generate(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+            return "answer"
+
+    finished = []
+    client = Client("/api/projects/p1/chat")
+    app = _app(LLMService(primary=QuickProvider()), finished)
+    await asyncio.wait_for(app(client.scope, client.receive, client.send), 1)
+
+    assert finished == ["answer"]
+    assert client.sent[0]["status"] == 200
+
+
+@pytest.mark.asyncio
+async def test_other_paths_are_not_watched():
+    from services.llm_service import LLMService
+
+    provider = HangingProvider()
+    client = Client("/api/projects/p1/other")
+    app = _app(LLMService(primary=provider), [])
+
+    request = asyncio.create_task(app(client.scope, client.receive, client.send))
+    client.disconnect()
+    await asyncio.wait_for(request, 1)
+
+    assert client.sent[0]["status"] == 404  # routed normally, nothing cancelled
+
+
+@pytest.mark.asyncio
+async def test_handler_finishes_its_follow_up_work_once_committed():
+    from fastapi import FastAPI, Request
+    from middleware.disconnect import CancelOnDisconnectMiddleware, finish_even_if_disconnected
+
+    committed, release, finished = asyncio.Event(), asyncio.Event(), []
+    app = FastAPI()
+    app.add_middleware(CancelOnDisconnectMiddleware, path_pattern=r"^/api/projects/[^/]+/code")
+
+    @app.post("/api/projects/{project_id}/code/explain")
+    async def explain(project_id: str, request: Request):
+        finish_even_if_disconnected(request)  # row committed
+        committed.set()
+        await release.wait()  # context update / embeddings
+        finished.append(project_id)
+        return {}
+
+    client = Client("/api/projects/p1/code/explain")
+    request = asyncio.create_task(app(client.scope, client.receive, client.send))
+    await asyncio.wait_for(committed.wait(), 1)
+    client.disconnect()
+    await asyncio.sleep(0.01)
+    release.set()
+    await asyncio.wait_for(request, 1)
+
+    assert finished == ["p1"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_summary_keeps_finished_sections(monkeypatch):
+    from config import settings
+    from services import learning_service
+    from services.llm_service import LLMService
+
+    release = asyncio.Event()
+
+    class SlowSecondSection:
+        name = "gemini"
+
+        async def generate(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+            if "SECOND" in prompt:
+                await asyncio.Event().wait()
+            release.set()
+            return '{"summary": "notes"}'
+
+    monkeypatch.setattr(settings, "summary_map_reduce_threshold_tokens", 10)
+    monkeypatch.setattr(settings, "summary_section_tokens", 60)
+    monkeypatch.setattr(learning_service, "get_llm_service", lambda mode="cloud": LLMService(primary=SlowSecondSection()))
+    text = ("FIRST " + "alpha " * 150) + "\n\n" + ("SECOND " + "beta " * 150)
+    section_cache: dict[str, str] = {}
+
+    task = asyncio.create_task(learning_service.summarise(text, "brief", section_cache=section_cache))
+    await asyncio.wait_for(release.wait(), 1)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert list(section_cache.values()) and set(section_cache.values()) == {"notes"}
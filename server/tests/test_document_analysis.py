@@ -0,0 +1,170 @@
+"""Tests for one-shot document analysis (summary + concepts + steps)."""
+
+import json
+import os
+import sys
+import uuid
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+CONCEPT = {"name": "Caching", "definition": "Reuse results", "importance": 4, "analogy": None}
+
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+
+class AnalysisProvider:
+    name = "gemini"
+
+    def __init__(self, model: str = "gemini-2.0-flash", drop: tuple = (), combined: dict | None = None):
+        self.model = model
+        self.drop = drop
+        self.combined = combined or {}  # overrides for the combined reply
+        self.calls: list[tuple[str, int]] = []
+
+    async def generate(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+        from services.prompts.learning_prompts import EXTRACT_CONCEPTS, IMPLEMENTATION_STEPS
+
+        self.calls.append((system_prompt, max_tokens))
+        if system_prompt == EXTRACT_CONCEPTS:
+            return json.dumps({"concepts": [CONCEPT]})
+        if system_prompt == IMPLEMENTATION_STEPS:
+            return json.dumps({"steps": ["Step 1: cache it"]})
+        if "three things" in system_prompt:
+            data = {"summary": "combined summary", "concepts": [CONCEPT], "steps": ["Step 1: cache it"]}
+            data.update(self.combined)
+            return json.dumps({k: v for k, v in data.items() if k not in self.drop})
+        return json.dumps({"summary": "separate summary"})
+
+
+@pytest.fixture
+def use_provider(monkeypatch):
+    from config import settings
+    from services import learning_service
+    from services.llm_service import LLMService
+
+    monkeypatch.setattr(settings, "llm_cache_enabled", False)
+
+    def install(provider):
+        service = LLMService(primary=provider)
+        monkeypatch.setattr(learning_service, "get_llm_service", lambda mode="cloud": service)
+        return provider
+
+    return install
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+@pytest.mark.asyncio
+async def test_analysis_is_one_structured_call(use_provider):
+    from services import learning_service
+
+    provider = use_provider(AnalysisProvider())
+    result = await learning_service.analyze("Caching makes repeated work free.", "detailed")
+
+    assert result == {"summary": "combined summary", "concepts": [CONCEPT], "steps": ["Step 1: cache it"]}
+    assert len(provider.calls) == 1
+    system_prompt, max_tokens = provider.calls[0]
+    assert "Markdown headers" in system_prompt  # level-specific summary style
+    assert max_tokens == learning_service.ANALYSIS_MAX_TOKENS
+
+
+@pytest.mark.asyncio
+async def test_missing_artefact_is_fetched_separately(use_provider):
+    from services import learning_service
+    from services.prompts.learning_prompts import IMPLEMENTATION_STEPS
+
+    provider = use_provider(AnalysisProvider(drop=("steps",)))
+    result = await learning_service.analyze("Caching makes repeated work free.")
+
+    assert result["steps"] == ["Step 1: cache it"]
+    assert [sp for sp, _ in provider.calls][1:] == [IMPLEMENTATION_STEPS]
+
+
+@pytest.mark.asyncio
+async def test_artefact_of_the_wrong_shape_is_fetched_separately(use_provider):
+    from services import learning_service
+    from services.prompts.learning_prompts import EXTRACT_CONCEPTS, IMPLEMENTATION_STEPS
+
+    provider = use_provider(AnalysisProvider(combined={"concepts": ["Caching"], "steps": "Step 1: cache it"}))
+    result = await learning_service.analyze("Caching makes repeated work free.")
+
+    assert result == {"summary": "combined summary", "concepts": [CONCEPT], "steps": ["Step 1: cache it"]}
+    assert sorted(sp for sp, _ in provider.calls[1:]) == sorted([EXTRACT_CONCEPTS, IMPLEMENTATION_STEPS])
+
+
+@pytest.mark.asyncio
+async def test_small_output_models_run_three_calls_concurrently(use_provider):
+    from services import learning_service
+
+    provider = use_provider(AnalysisProvider(model="phi3:mini"))
+    result = await learning_service.analyze("Caching makes repeated work free.")
+
+    assert result == {"summary": "separate summary", "concepts": [CONCEPT], "steps": ["Step 1: cache it"]}
+    assert len(provider.calls) == 3
+    assert not any("three things" in sp for sp, _ in provider.calls)
+
+
+async def _post_analyze(monkeypatch, doc, db):
+    import httpx
+    import main
+    from database import get_db
+    from middleware.auth import get_current_user
+    from routers import learning as learning_router
+
+    async def no_context_update(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(learning_router, "_get_project_or_404", lambda *a: SimpleNamespace())
+    monkeypatch.setattr(learning_router, "_get_document_or_404", lambda *a: doc)
+    monkeypatch.setattr(learning_router, "update_context", no_context_update)
+    monkeypatch.setattr(learning_router, "cache_invalidate", lambda project_id: None)
+    main.app.dependency_overrides[get_db] = lambda: db
+    main.app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id=uuid.uuid4())
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(f"/api/projects/{uuid.uuid4()}/documents/{doc.id}/analyze")
+    finally:
+        main.app.dependency_overrides.clear()
+
+
+def _document():
+    return SimpleNamespace(
+        id=uuid.uuid4(), filename="notes.md", raw_text="Caching makes repeated work free.",
+        summary=None, key_concepts=[], implementation_steps=[], section_summaries={},
+    )
+
+
+@pytest.mark.asyncio
+async def test_analyze_endpoint_persists_everything_in_one_commit(use_provider, monkeypatch):
+    use_provider(AnalysisProvider())
+    doc = _document()
+    db = MagicMock()
+
+    resp = await _post_analyze(monkeypatch, doc, db)
+
+    assert resp.status_code == 200, resp.text
+    body = resp.json()
+    assert body["summary"] == "combined summary" and body["level"] == "short"
+    assert body["concepts"][0]["name"] == "Caching"
+    assert (doc.summary, doc.key_concepts, doc.implementation_steps) == (
+        "combined summary", [CONCEPT], ["Step 1: cache it"],
+    )
+    assert db.commit.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_malformed_analysis_is_not_persisted(use_provider, monkeypatch):
+    use_provider(AnalysisProvider(combined={"concepts": [{"name": "Caching", "importance": 9}]}))
+    doc = _document()
+    db = MagicMock()
+
+    resp = await _post_analyze(monkeypatch, doc, db)
+
+    assert resp.status_code == 503
+    assert (doc.summary, doc.key_concepts, doc.implementation_steps) == (None, [], [])
+    assert db.commit.call_count == 0
@@ -26,16 +26,20 @@ class FakeEmbedResponse:
 
 
 class FakeModels:
-    def embed_content(self, model, contents):
+    async def embed_content(self, model, contents):
         if isinstance(contents, list):
             return FakeEmbedResponse([FakeEmbedding(_make_fake_embedding()) for _ in contents])
         return FakeEmbedResponse([FakeEmbedding(_make_fake_embedding())])
 
 
-class FakeClient:
+class FakeAio:
     models = FakeModels()
 
 
+class FakeClient:
+    aio = FakeAio()
+
+
 # ── Tests ─────────────────────────────────────────────────────────────────────
 
 @pytest.mark.asyncio
@@ -0,0 +1,92 @@
+"""Tests for the content-addressed LLM result cache."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+
+class CountingProvider:
+    def __init__(self, name: str = "counting", response: str = '{"summary": "cached"}'):
+        self.name = name
+        self.model = "m1"
+        self._response = response
+        self.calls = 0
+
+    async def generate(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+        self.calls += 1
+        return self._response
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+def test_key_depends_on_every_input():
+    from services.llm_cache import make_key
+
+    base = make_key([("gemini", "flash")], "sys", "prompt", 0.0, 1024)
+    assert base == make_key([("gemini", "flash")], "sys", "prompt", 0.0, 1024)
+    assert base != make_key([("groq", "flash")], "sys", "prompt", 0.0, 1024)
+    assert base != make_key([("gemini", "pro")], "sys", "prompt", 0.0, 1024)
+    assert base != make_key([("gemini", "flash")], "sys2", "prompt", 0.0, 1024)
+    assert base != make_key([("gemini", "flash")], "sys", "prompt2", 0.0, 1024)
+    assert base != make_key([("gemini", "flash")], "sys", "prompt", 0.3, 1024)
+    assert base != make_key([("gemini", "flash")], "sys", "prompt", 0.0, 2048)
+
+
+@pytest.mark.asyncio
+async def test_lru_evicts_oldest_and_ttl_expires(monkeypatch):
+    from services import llm_cache
+
+    cache = llm_cache.LLMResultCache(max_entries=2, ttl_seconds=10)
+    await cache.set("a", "A", "p")
+    await cache.set("b", "B", "p")
+    assert await cache.get("a") == ("A", "p")  # touch a → b is now oldest
+    await cache.set("c", "C", "p")
+
+    assert await cache.get("b") is None
+    assert await cache.get("a") == ("A", "p")
+
+    now = llm_cache.time.time()
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now + 11)
+    assert await cache.get("a") is None
+
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["memory_hits"] == 2
+    assert stats["misses"] == 2
+
+
+@pytest.mark.asyncio
+async def test_sqlite_tier_survives_new_instance(tmp_path):
+    from services.llm_cache import LLMResultCache
+
+    path = str(tmp_path / "cache.db")
+    first = LLMResultCache(max_entries=4, ttl_seconds=60, sqlite_path=path)
+    await first.set("k", "persisted", "gemini")
+
+    second = LLMResultCache(max_entries=4, ttl_seconds=60, sqlite_path=path)
+    assert await second.get("k") == ("persisted", "gemini")
+    assert second.stats()["sqlite_hits"] == 1
+    assert await second.get("k") == ("persisted", "gemini")
+    assert second.stats()["memory_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_llm_service_serves_repeat_calls_from_cache(monkeypatch):
+    from services import llm_cache, llm_service
+
+    monkeypatch.setattr(llm_cache, "_cache", llm_cache.LLMResultCache(max_entries=8))
+    provider = CountingProvider()
+    service = llm_service.LLMService(primary=provider)
+
+    first = await service.generate("200-page document", "summarise", temperature=0.0, cache=True)
+    second = await service.generate("200-page document", "summarise", temperature=0.0, cache=True)
+    await service.generate("200-page document", "summarise", temperature=0.0)  # opt-out
+
+    assert first[0] == second[0]
+    assert second[1] == "counting"
+    assert provider.calls == 2
@@ -0,0 +1,134 @@
+"""Tests for hedged LLM requests (tail-latency reduction)."""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+
+class SlowProvider:
+    def __init__(self, name: str, delay: float, fail: Exception | None = None):
+        self.name = name
+        self.model = f"{name}-model"
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.cancelled = 0
+
+    async def generate(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise self.fail
+        return f"{self.name} ok"
+
+
+@pytest.fixture(autouse=True)
+def _hedge_settings(monkeypatch):
+    from config import settings
+    monkeypatch.setattr(settings, "llm_hedge_percentiles", {"chat": 95.0})
+    monkeypatch.setattr(settings, "llm_hedge_min_samples", 5)
+    monkeypatch.setattr(settings, "llm_hedge_min_delay_ms", 0.0)
+
+
+def _service(primary, backup, history_ms: float = 20.0, samples: int = 5):
+    from services.llm_service import LLMService
+    from services.llm_stats import StatsRegistry
+
+    stats = StatsRegistry(alpha=0.2)
+    for _ in range(samples):
+        stats.record(primary.name, primary.model, "chat", history_ms, ok=True)
+    return LLMService(primary=primary, fallbacks=[backup], stats=stats)
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+def test_percentile_uses_recent_window():
+    from services.llm_stats import ProviderStats
+
+    stats = ProviderStats(alpha=0.2, window=4)
+    for ms in (1000.0, 10.0, 20.0, 30.0, 40.0):
+        stats.record(ms, ok=True)
+    assert list(stats.recent) == [10.0, 20.0, 30.0, 40.0]
+    assert stats.percentile(50) == 20.0
+    assert stats.percentile(95) == 40.0
+
+
+@pytest.mark.asyncio
+async def test_stalled_primary_is_hedged_and_cancelled():
+    primary = SlowProvider("gemini", delay=5.0)
+    backup = SlowProvider("groq", delay=0.01)
+    service = _service(primary, backup)
+
+    text, provider, latency = await service.generate("q", call_type="chat")
+    await asyncio.sleep(0)  # let the loser's cancellation run
+
+    assert (text, provider) == ("groq ok", "groq")
+    assert latency < 1000
+    assert primary.cancelled == 1
+    assert service.stats.hedge_snapshot()["chat"] == {"fired": 1, "won": 1, "win_rate": 1.0}
+
+
+@pytest.mark.asyncio
+async def test_fast_primary_is_not_hedged():
+    primary = SlowProvider("gemini", delay=0.0)
+    backup = SlowProvider("groq", delay=0.0)
+    service = _service(primary, backup, history_ms=500.0)
+
+    _, provider, _ = await service.generate("q", call_type="chat")
+
+    assert provider == "gemini"
+    assert backup.calls == 0
+    assert service.stats.hedge_snapshot() == {}
+
+
+@pytest.mark.asyncio
+async def test_no_hedge_without_enough_samples_or_for_other_call_types():
+    primary = SlowProvider("gemini", delay=0.05)
+    backup = SlowProvider("groq", delay=0.0)
+    service = _service(primary, backup, samples=2)
+
+    _, provider, _ = await service.generate("q", call_type="chat")
+    assert provider == "gemini"
+
+    service = _service(primary, backup)
+    _, provider, _ = await service.generate("q", call_type="drift")
+    assert provider == "gemini"
+    assert backup.calls == 0
+
+
+@pytest.mark.asyncio
+async def test_primary_wins_after_hedge_counts_as_lost_hedge():
+    primary = SlowProvider("gemini", delay=0.05)
+    backup = SlowProvider("groq", delay=5.0)
+    service = _service(primary, backup)
+
+    _, provider, _ = await service.generate("q", call_type="chat")
+    await asyncio.sleep(0)
+
+    assert provider == "gemini"
+    assert backup.cancelled == 1
+    assert service.stats.hedge_snapshot()["chat"] == {"fired": 1, "won": 0, "win_rate": 0.0}
+
+
+@pytest.mark.asyncio
+async def test_primary_failure_during_hedge_falls_back_to_backup():
+    import httpx
+
+    primary = SlowProvider("gemini", delay=0.05, fail=httpx.ConnectError("down"))
+    backup = SlowProvider("groq", delay=0.1)
+    service = _service(primary, backup)
+
+    _, provider, _ = await service.generate("q", call_type="chat")
+
+    assert provider == "groq"
+    assert service.breaker(primary).failures == 1
@@ -0,0 +1,117 @@
+"""Tests for the record/replay LLM provider and the "replay" inference mode."""
+
+import json
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+
+class LiveProvider:
+    name = "gemini"
+    model = "gemini-2.0-flash"
+    supports_json_mode = True
+
+    def __init__(self):
+        self.calls = 0
+
+    async def generate(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096, json_mode=False):
+        self.calls += 1
+        return json.dumps({"answer": prompt}) if json_mode else f"answer to {prompt}"
+
+    async def generate_stream(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+        for word in ("streamed ", "answer ", "to ", prompt):
+            yield word
+
+
+@pytest.fixture
+def cassette(tmp_path):
+    from services.llm_replay import Cassette
+
+    return Cassette(str(tmp_path / "cassettes" / "llm.jsonl"))
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+@pytest.mark.asyncio
+async def test_recorded_traffic_replays_without_the_live_provider(cassette):
+    from services.llm_replay import Cassette, RecordingProvider, ReplayProvider
+    from services.llm_service import LLMService
+
+    live = LiveProvider()
+    recorder = LLMService(primary=RecordingProvider(live, cassette))
+    text, name, _ = await recorder.generate("q1", "sys", call_type="chat")
+    data, _, _ = await recorder.generate_json("q2", "sys", call_type="extract")
+
+    assert name == "gemini"
+    lines = [json.loads(line) for line in cassette.path.read_text().splitlines()]
+    assert [entry["provider"] for entry in lines] == ["gemini", "gemini"]
+
+    replay = LLMService(primary=ReplayProvider(Cassette(str(cassette.path)), latency_scale=0))
+    replayed, name, _ = await replay.generate("q1", "sys", call_type="chat")
+    assert (replayed, name) == (text, "replay")
+    assert (await replay.generate_json("q2", "sys", call_type="extract"))[0] == data
+    assert live.calls == 2  # nothing new reached the live provider
+
+
+@pytest.mark.asyncio
+async def test_replay_applies_synthetic_latency(cassette):
+    from services.llm_replay import ReplayProvider, request_key
+
+    cassette.record(request_key("q", "", 0.3, 4096, False), LiveProvider(), "hi", latency_ms=100.0)
+    provider = ReplayProvider(cassette, latency_scale=0.5, latency_ms=20)
+
+    start = time.perf_counter()
+    assert await provider.generate("q") == "hi"
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    assert 65 <= elapsed_ms < 200  # 20 + 100 × 0.5
+
+
+@pytest.mark.asyncio
+async def test_streams_are_recorded_and_rechunked_on_replay(cassette):
+    from services.llm_replay import RecordingProvider, ReplayProvider
+    from services.llm_service import LLMService
+
+    recorder = LLMService(primary=RecordingProvider(LiveProvider(), cassette))
+    recorded = "".join([chunk async for chunk, _ in recorder.generate_stream("what?")])
+    entry = json.loads(cassette.path.read_text().splitlines()[0])
+    assert entry["response"] == recorded and "ttft_ms" in entry
+
+    replay = LLMService(primary=ReplayProvider(cassette, latency_scale=0))
+    replayed = "".join([chunk async for chunk, _ in replay.generate_stream("what?")])
+    assert replayed == recorded
+
+
+@pytest.mark.asyncio
+async def test_unrecorded_request_fails_the_call(cassette):
+    from services.llm_replay import ReplayProvider
+    from services.llm_service import LLMService
+
+    llm = LLMService(primary=ReplayProvider(cassette, latency_scale=0))
+    with pytest.raises(RuntimeError, match="not in cassette"):
+        await llm.generate("never recorded")
+    assert cassette.misses == 1
+
+
+def test_replay_mode_switches_between_replay_and_record(tmp_path, monkeypatch):
+    from config import settings
+    from services import llm_replay
+    from services.llm_service import get_llm_service, reset_llm_services
+
+    monkeypatch.setattr(settings, "llm_replay_cassette", str(tmp_path / "llm.jsonl"))
+    monkeypatch.setattr(llm_replay, "_cassettes", {})
+    try:
+        service = get_llm_service("replay")
+        assert isinstance(service.primary, llm_replay.ReplayProvider)
+
+        monkeypatch.setattr(settings, "llm_replay_record", True)
+        service = get_llm_service("replay")
+        assert isinstance(service.primary, llm_replay.RecordingProvider)
+        assert [p.name for p in service.providers] == ["gemini", "groq", "openrouter"]
+    finally:
+        reset_llm_services()
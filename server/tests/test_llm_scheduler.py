@@ -0,0 +1,191 @@
+"""Tests for priority / fair-queued admission of LLM calls."""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+
+class GatedProvider:
+    """Answers once released; records the order prompts reached it."""
+
+    name = "gemini"
+
+    def __init__(self):
+        self.order: list[str] = []
+        self.release = asyncio.Event()
+
+    async def generate(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+        self.order.append(prompt)
+        await self.release.wait()
+        return "ok"
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def _submit(llm, prompt: str, priority: str, user: str = "u1") -> asyncio.Task:
+    from services import llm_scheduler
+
+    async def call():
+        llm_scheduler.bind(priority, user)
+        return await llm.generate(prompt, call_type="chat")
+
+    return asyncio.create_task(call())
+
+
+async def _drain(provider: GatedProvider, tasks: list[asyncio.Task]) -> None:
+    provider.release.set()
+    await asyncio.wait_for(asyncio.gather(*tasks), 1)
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+@pytest.mark.asyncio
+async def test_chat_turn_overtakes_queued_background_work():
+    from services.llm_scheduler import PriorityScheduler
+    from services.llm_service import LLMService
+
+    provider = GatedProvider()
+    llm = LLMService(primary=provider, scheduler=PriorityScheduler(1))
+    tasks = [_submit(llm, "bulk-0", "background")]
+    await _settle()
+    tasks += [_submit(llm, f"bulk-{i}", "background") for i in range(1, 4)]
+    await _settle()
+    tasks.append(_submit(llm, "chat", "interactive", user="u2"))
+    await _settle()
+
+    await _drain(provider, tasks)
+
+    assert provider.order[:2] == ["bulk-0", "chat"]  # only the call already running goes first
+
+
+@pytest.mark.asyncio
+async def test_users_in_the_same_class_share_slots_fairly():
+    from services.llm_scheduler import PriorityScheduler
+    from services.llm_service import LLMService
+
+    provider = GatedProvider()
+    llm = LLMService(primary=provider, scheduler=PriorityScheduler(1))
+    tasks = [_submit(llm, "hold", "analysis", user="x")]
+    await _settle()
+    tasks += [_submit(llm, f"a{i}", "analysis", user="alice") for i in range(3)]
+    tasks += [_submit(llm, f"b{i}", "analysis", user="bob") for i in range(3)]
+    await _settle()
+
+    await _drain(provider, tasks)
+
+    assert provider.order[1:] == ["a0", "b0", "a1", "b1", "a2", "b2"]
+
+
+@pytest.mark.asyncio
+async def test_classes_share_slots_by_weight():
+    from services.llm_scheduler import PriorityScheduler
+    from services.llm_service import LLMService
+
+    provider = GatedProvider()
+    scheduler = PriorityScheduler(1, weights={"interactive": 4.0, "analysis": 2.0, "background": 1.0})
+    llm = LLMService(primary=provider, scheduler=scheduler)
+    tasks = [_submit(llm, "hold", "analysis", user="x")]
+    await _settle()
+    tasks += [_submit(llm, f"bg{i}", "background") for i in range(2)]
+    tasks += [_submit(llm, f"chat{i}", "interactive") for i in range(6)]
+    await _settle()
+
+    await _drain(provider, tasks)
+
+    assert provider.order[1:5] == ["chat0", "chat1", "chat2", "bg0"]  # background isn't shut out
+
+
+@pytest.mark.asyncio
+async def test_calls_that_waited_too_long_go_first():
+    from services.llm_scheduler import PriorityScheduler
+    from services.llm_service import LLMService
+
+    provider = GatedProvider()
+    scheduler = PriorityScheduler(1, aging_seconds=0.05)
+    llm = LLMService(primary=provider, scheduler=scheduler)
+    tasks = [_submit(llm, "hold", "interactive", user="x"), _submit(llm, "old-bulk", "background")]
+    await asyncio.sleep(0.1)
+    tasks.append(_submit(llm, "chat", "interactive"))
+    await _settle()
+
+    await _drain(provider, tasks)
+
+    assert provider.order == ["hold", "old-bulk", "chat"]
+    assert scheduler.snapshot()["classes"]["background"]["aged"] == 1
+
+
+@pytest.mark.asyncio
+async def test_abandoned_waiters_free_their_place():
+    from services import deadline
+    from services.llm_scheduler import PriorityScheduler
+    from services.llm_service import LLMService
+
+    provider = GatedProvider()
+    scheduler = PriorityScheduler(1)
+    llm = LLMService(primary=provider, scheduler=scheduler)
+    running = _submit(llm, "hold", "interactive")
+    await _settle()
+
+    deadline.start(0.05)
+    with pytest.raises(deadline.DeadlineExceeded):
+        await llm.generate("late", call_type="chat")
+    cancelled = _submit(llm, "cancelled", "interactive")
+    await _settle()
+    cancelled.cancel()
+    await _settle()
+
+    await _drain(provider, [running])
+    snapshot = scheduler.snapshot()
+    assert provider.order == ["hold"]
+    assert snapshot["in_flight"] == 0 and snapshot["classes"]["interactive"]["waiting"] == 0
+
+
+@pytest.mark.asyncio
+async def test_chat_does_not_join_a_queued_background_call():
+    from services.llm_scheduler import PriorityScheduler
+    from services.llm_service import LLMService
+
+    provider = GatedProvider()
+    scheduler = PriorityScheduler(1)
+    llm = LLMService(primary=provider, scheduler=scheduler)
+    tasks = [_submit(llm, "hold", "analysis", user="x")]
+    await _settle()
+    tasks += [_submit(llm, "same", "background"), _submit(llm, "same", "background")]
+    tasks.append(_submit(llm, "same", "interactive"))
+    await _settle()
+
+    await _drain(provider, tasks)
+
+    classes = scheduler.snapshot()["classes"]
+    assert provider.order == ["hold", "same", "same"]
+    assert (classes["interactive"]["admitted"], classes["background"]["admitted"]) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_stream_holds_its_slot_until_it_ends():
+    from services.llm_scheduler import PriorityScheduler
+    from services.llm_service import LLMService
+
+    class StreamingProvider:
+        name = "gemini"
+
+        async def generate_stream(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+            yield "a"
+            yield "b"
+
+    scheduler = PriorityScheduler(1)
+    llm = LLMService(primary=StreamingProvider(), scheduler=scheduler)
+    stream = llm.generate_stream("p")
+    assert await stream.__anext__() == ("a", "gemini")
+    assert scheduler.in_flight == 1
+    assert [chunk async for chunk, _ in stream] == ["b"]
+    assert scheduler.in_flight == 0
@@ -87,3 +87,169 @@ async def test_all_providers_fail_raises():
 
     with pytest.raises(RuntimeError, match="All LLM providers failed"):
         await service.generate("test")
+
+
+@pytest.mark.asyncio
+async def test_http_client_is_shared_and_reopened_after_close():
+    """Providers reuse one pooled client; shutdown closes it and the next call reopens."""
+    from services import llm_service
+
+    await llm_service.init_http_clients()
+    first = llm_service.get_http_client("openrouter")
+    assert llm_service.get_http_client("openrouter") is first
+
+    await llm_service.close_http_clients()
+    assert first.is_closed
+    second = llm_service.get_http_client("openrouter")
+    assert second is not first and not second.is_closed
+    await llm_service.close_http_clients()
+
+
+@pytest.mark.asyncio
+async def test_openrouter_uses_pooled_client():
+    """Consecutive OpenRouter calls go through the same shared client."""
+    import httpx
+    from services import llm_service
+
+    seen: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.headers["Authorization"])
+        return httpx.Response(200, json={"choices": [{"message": {"content": "pooled"}}]})
+
+    llm_service._http_clients["openrouter"] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    try:
+        provider = llm_service.OpenRouterProvider(api_key="k")
+        assert await provider.generate("a") == "pooled"
+        assert await provider.generate("b") == "pooled"
+        assert seen == ["Bearer k", "Bearer k"]
+    finally:
+        await llm_service.close_http_clients()
+
+
+def test_get_llm_service_is_cached_per_mode():
+    """Each mode is built once; providers are shared between modes."""
+    from services import llm_service
+
+    llm_service.reset_llm_services()
+    cloud = llm_service.get_llm_service("cloud")
+    assert llm_service.get_llm_service("cloud") is cloud
+    assert llm_service.get_llm_service("unknown-mode") is cloud
+
+    groq_first = llm_service.get_llm_service("groq")
+    assert groq_first is not cloud
+    assert groq_first.providers[0] is cloud.providers[1]  # same GroqProvider
+
+
+def test_get_llm_service_rebuilds_on_settings_change(monkeypatch):
+    from services import llm_service
+
+    llm_service.reset_llm_services()
+    local = llm_service.get_llm_service("local")
+    monkeypatch.setattr(llm_service.settings, "ollama_model", "llama3:8b")
+
+    rebuilt = llm_service.get_llm_service("local")
+    assert rebuilt is not local
+    assert rebuilt.primary.model == "llama3:8b"
+    llm_service.reset_llm_services()
+
+
+class FakeStreamingProvider(FakeProvider):
+    """FakeProvider that streams its response word by word."""
+    def __init__(self, name: str, response: str = "ok", fail: Exception | None = None, fail_after: int | None = None):
+        super().__init__(name, response, fail)
+        self._fail_after = fail_after
+
+    async def generate_stream(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+        self.called = True
+        if self._fail and self._fail_after is None:
+            raise self._fail
+        for i, word in enumerate(self._response.split(" ")):
+            if self._fail_after is not None and i == self._fail_after:
+                raise self._fail
+            yield word + " "
+
+
+@pytest.mark.asyncio
+async def test_stream_yields_chunks_in_order():
+    from services.llm_service import LLMService
+    service = LLMService(primary=FakeStreamingProvider("p", response="one two three"))
+
+    chunks = [c async for c in service.generate_stream("q")]
+
+    assert [c for c, _ in chunks] == ["one ", "two ", "three "]
+    assert {p for _, p in chunks} == {"p"}
+
+
+@pytest.mark.asyncio
+async def test_stream_falls_back_before_first_chunk():
+    import httpx
+    from services.llm_service import LLMService
+    primary = FakeStreamingProvider("a", fail=httpx.ConnectError("down"))
+    fallback = FakeStreamingProvider("b", response="from fallback")
+    service = LLMService(primary=primary, fallback=fallback)
+
+    chunks = [c async for c in service.generate_stream("q")]
+
+    assert "".join(c for c, _ in chunks) == "from fallback "
+    assert chunks[0][1] == "b"
+
+
+@pytest.mark.asyncio
+async def test_stream_does_not_fall_back_mid_response():
+    import httpx
+    from services.llm_service import LLMService
+    primary = FakeStreamingProvider("a", response="partial answer here", fail=httpx.ReadError("reset"), fail_after=1)
+    fallback = FakeStreamingProvider("b", response="should not be used")
+    service = LLMService(primary=primary, fallback=fallback)
+
+    received = []
+    with pytest.raises(httpx.ReadError):
+        async for chunk, _ in service.generate_stream("q"):
+            received.append(chunk)
+
+    assert received == ["partial "]
+    assert not fallback.called
+
+
+@pytest.mark.asyncio
+async def test_default_generate_stream_yields_full_response():
+    from services.llm_service import LLMProvider
+
+    class OneShot(LLMProvider):
+        name = "one-shot"
+
+        async def generate(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+            return "whole answer"
+
+    assert [c async for c in OneShot().generate_stream("q")] == ["whole answer"]
+
+
+@pytest.mark.asyncio
+async def test_openrouter_and_ollama_stream_parsing():
+    """OpenRouter SSE frames and Ollama NDJSON lines are decoded into text chunks."""
+    import json
+    import httpx
+    from services import llm_service
+
+    sse_body = (
+        ": OPENROUTER PROCESSING\n\n"
+        + "".join(f"data: {json.dumps({'choices': [{'delta': {'content': t}}]})}\n\n" for t in ("Hel", "lo"))
+        + "data: [DONE]\n\n"
+    )
+    ndjson_body = "\n".join(
+        json.dumps(d) for d in ({"response": "Hi", "done": False}, {"response": " there", "done": False}, {"response": "", "done": True})
+    )
+    llm_service._http_clients["openrouter"] = httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda r: httpx.Response(200, text=sse_body))
+    )
+    llm_service._http_clients["ollama"] = httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda r: httpx.Response(200, text=ndjson_body))
+    )
+    try:
+        openrouter = llm_service.OpenRouterProvider(api_key="k")
+        ollama = llm_service.OllamaProvider()
+        assert [c async for c in openrouter.generate_stream("q")] == ["Hel", "lo"]
+        assert [c async for c in ollama.generate_stream("q")] == ["Hi", " there"]
+    finally:
+        await llm_service.close_http_clients()
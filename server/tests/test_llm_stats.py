@@ -0,0 +1,141 @@
+"""Tests for EWMA provider stats and the adaptive routing mode."""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+
+class TimedProvider:
+    def __init__(self, name: str, delay: float, fail: bool = False):
+        self.name = name
+        self.model = f"{name}-model"
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    async def generate(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.name} down")
+        return f"{self.name} ok"
+
+
+@pytest.fixture(autouse=True)
+def _no_exploration(monkeypatch):
+    from config import settings
+    monkeypatch.setattr(settings, "llm_adaptive_explore_ratio", 0.0)
+    monkeypatch.setattr(settings, "llm_adaptive_min_samples", 2)
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+def test_ewma_latency_and_error_rate():
+    from services.llm_stats import ProviderStats
+
+    stats = ProviderStats(alpha=0.5)
+    stats.record(100.0, ok=True)
+    stats.record(200.0, ok=True)
+    assert stats.latency_ms == 150.0
+    assert stats.error_rate == 0.0
+
+    stats.record(5000.0, ok=False)  # failures don't move latency
+    assert stats.latency_ms == 150.0
+    assert stats.error_rate == 0.5
+    assert stats.samples == 3 and stats.errors == 1
+    assert stats.score(error_penalty=2.0) == 300.0
+
+
+def test_unmeasured_provider_has_no_score():
+    from services.llm_stats import ProviderStats
+
+    stats = ProviderStats(alpha=0.2)
+    stats.record(100.0, ok=False)
+    assert stats.score(error_penalty=5.0) is None
+
+
+@pytest.mark.asyncio
+async def test_adaptive_routing_prefers_faster_provider():
+    from services.llm_service import LLMService
+    from services.llm_stats import StatsRegistry
+
+    slow = TimedProvider("slow", delay=0.05)
+    fast = TimedProvider("fast", delay=0.0)
+    stats = StatsRegistry(alpha=0.5)
+    # Seed history: both providers measured for the "chat" call type
+    for _ in range(2):
+        stats.record("slow", "slow-model", "chat", 500.0, ok=True)
+        stats.record("fast", "fast-model", "chat", 50.0, ok=True)
+
+    service = LLMService(primary=slow, fallbacks=[fast], stats=stats, routing="adaptive")
+    _, provider, _ = await service.generate("hi", call_type="chat")
+
+    assert provider == "fast"
+    assert slow.calls == 0
+
+
+@pytest.mark.asyncio
+async def test_adaptive_routing_is_per_call_type():
+    from services.llm_service import LLMService
+    from services.llm_stats import StatsRegistry
+
+    a = TimedProvider("a", delay=0.0)
+    b = TimedProvider("b", delay=0.0)
+    stats = StatsRegistry(alpha=0.5)
+    for _ in range(2):
+        stats.record("a", "a-model", "drift", 900.0, ok=True)
+        stats.record("b", "b-model", "drift", 100.0, ok=True)
+
+    service = LLMService(primary=a, fallbacks=[b], stats=stats, routing="adaptive")
+
+    _, drift_provider, _ = await service.generate("x", call_type="drift")
+    _, chat_provider, _ = await service.generate("x", call_type="chat")  # no history → static order
+
+    assert drift_provider == "b"
+    assert chat_provider == "a"
+
+
+@pytest.mark.asyncio
+async def test_error_rate_demotes_provider():
+    from services.llm_service import LLMService
+    from services.llm_stats import StatsRegistry
+
+    flaky = TimedProvider("flaky", delay=0.0)
+    steady = TimedProvider("steady", delay=0.0)
+    stats = StatsRegistry(alpha=0.5)
+    stats.record("flaky", "flaky-model", "chat", 100.0, ok=True)
+    stats.record("flaky", "flaky-model", "chat", 100.0, ok=False)
+    stats.record("flaky", "flaky-model", "chat", 100.0, ok=False)
+    stats.record("steady", "steady-model", "chat", 300.0, ok=True)
+    stats.record("steady", "steady-model", "chat", 300.0, ok=True)
+
+    service = LLMService(primary=flaky, fallbacks=[steady], stats=stats, routing="adaptive")
+    _, provider, _ = await service.generate("x", call_type="chat")
+
+    assert provider == "steady"
+
+
+@pytest.mark.asyncio
+async def test_static_routing_records_stats_for_failures_and_successes():
+    from services.llm_service import LLMService
+    from services.llm_stats import StatsRegistry
+
+    down = TimedProvider("down", delay=0.0, fail=True)
+    up = TimedProvider("up", delay=0.0)
+    stats = StatsRegistry(alpha=0.2)
+    service = LLMService(primary=up, fallbacks=[down], stats=stats)
+    service.providers = [down, up]  # failing provider first, non-primary so it falls through
+
+    _, provider, _ = await service.generate("x", call_type="extract")
+
+    assert provider == "up"
+    snapshot = {row["provider"]: row for row in stats.snapshot()}
+    assert snapshot["down"]["errors"] == 1
+    assert snapshot["up"]["samples"] == 1
+    assert snapshot["up"]["call_type"] == "extract"
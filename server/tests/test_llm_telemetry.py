@@ -0,0 +1,122 @@
+"""Tests for structured LLM telemetry and its endpoint labelling."""
+
+import os
+import sys
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+
+class FakeProvider:
+    def __init__(self, name, result="hello world", exc=None):
+        self.name = name
+        self.model = f"{name}-model"
+        self.result = result
+        self.exc = exc
+
+    async def generate(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+        if self.exc is not None:
+            raise self.exc
+        return self.result
+
+    async def generate_stream(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+        yield await self.generate(prompt, system_prompt, temperature, max_tokens)
+
+
+def _row(rows, **match):
+    return next(r for r in rows if all(r[k] == v for k, v in match.items()))
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+@pytest.mark.asyncio
+async def test_fallback_records_error_class_tokens_and_hops():
+    from services.llm_service import LLMService
+
+    llm = LLMService(
+        primary=FakeProvider("gemini", exc=httpx.ConnectTimeout("slow")),
+        fallback=FakeProvider("groq", result="a b c d e f g h"),
+    )
+    text, provider, _ = await llm.generate("some prompt text", "sys", call_type="summarise")
+    assert provider == "groq"
+
+    snapshot = llm.telemetry.snapshot()
+    failed = _row(snapshot["attempts"], provider="gemini")
+    assert failed["errors"] == {"ConnectTimeout": 1}
+    assert failed["prompt_tokens"] == 0  # nothing billed for failed calls
+    served = _row(snapshot["attempts"], provider="groq")
+    assert served["endpoint"] == "-" and served["call_type"] == "summarise"
+    assert served["model"] == "groq-model"
+    assert served["prompt_tokens"] > 0 and served["completion_tokens"] > 0
+    assert served["latency_histogram"]["50"] == 1 and served["latency_histogram"]["+Inf"] == 1
+
+    request = _row(snapshot["requests"], call_type="summarise")
+    assert request["served_by"] == {"groq": 1}
+    assert request["fallback_hops"] == {"1": 1} and request["fallback_rate"] == 1.0
+
+
+@pytest.mark.asyncio
+async def test_all_providers_failing_is_counted_as_failed_request():
+    from services.llm_service import LLMService
+
+    llm = LLMService(primary=FakeProvider("ollama", exc=httpx.ConnectError("down")))
+    with pytest.raises(RuntimeError):
+        await llm.generate("p", call_type="chat")
+
+    request = _row(llm.telemetry.snapshot()["requests"], call_type="chat")
+    assert request["requests"] == 1 and request["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_streams_are_recorded():
+    from services.llm_service import LLMService
+
+    llm = LLMService(primary=FakeProvider("gemini", result="streamed answer text"))
+    chunks = [chunk async for chunk, _ in llm.generate_stream("p", call_type="chat")]
+    assert chunks
+
+    snapshot = llm.telemetry.snapshot()
+    assert _row(snapshot["attempts"], provider="gemini")["completion_tokens"] > 0
+    assert _row(snapshot["requests"], call_type="chat")["fallback_hops"] == {"0": 1}
+
+
+@pytest.mark.asyncio
+async def test_streamed_and_whole_replies_count_tokens_the_same_way():
+    from services.llm_service import LLMService
+
+    llm = LLMService(primary=FakeProvider("gemini", result="def f(x):\n    return {'k': [x, x * 2]}\n" * 5))
+    await llm.generate("p", call_type="code")
+    [chunk async for chunk, _ in llm.generate_stream("p", call_type="chat")]
+
+    attempts = llm.telemetry.snapshot()["attempts"]
+    whole = _row(attempts, call_type="code")["completion_tokens"]
+    assert whole > 0 and _row(attempts, call_type="chat")["completion_tokens"] == whole
+
+
+@pytest.mark.asyncio
+async def test_calls_are_labelled_with_the_route_template():
+    from fastapi import FastAPI
+    from middleware.telemetry import LLMTelemetryMiddleware
+    from services.llm_service import LLMService
+
+    llm = LLMService(primary=FakeProvider("gemini"))
+    app = FastAPI()
+    app.add_middleware(LLMTelemetryMiddleware)
+
+    @app.post("/api/projects/{project_id}/chat")
+    async def chat(project_id: str):
+        text, _, _ = await llm.generate(f"question for {project_id}", call_type="chat")
+        return {"text": text}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        for project_id in ("a", "b"):
+            assert (await client.post(f"/api/projects/{project_id}/chat")).status_code == 200
+
+    row = _row(llm.telemetry.snapshot()["attempts"], provider="gemini")
+    assert row["endpoint"] == "POST /api/projects/{project_id}/chat"
+    assert row["calls"] == 2
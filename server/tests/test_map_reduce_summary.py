@@ -0,0 +1,159 @@
+"""Tests for map-reduce summarisation of documents beyond one context window."""
+
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+
+class RecordingProvider:
+    name = "gemini"
+    model = "test-model"
+
+    def __init__(self):
+        self.calls: list[tuple[str, str]] = []
+        self.active = 0
+        self.peak = 0
+
+    async def generate(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+        from services.prompts.learning_prompts import MERGE_SECTION_SUMMARIES, SUMMARIZE_SECTION
+
+        self.calls.append((system_prompt, prompt))
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        if system_prompt == SUMMARIZE_SECTION:
+            summary = f"notes on: {prompt.split()[0]} " + "detail " * 30
+        elif system_prompt == MERGE_SECTION_SUMMARIES:
+            summary = f"merged {prompt.count('---') + 1} notes"
+        else:
+            summary = f"final summary of {len(prompt)} chars"
+        return json.dumps({"summary": summary})
+
+    def count(self, system_prompt: str) -> int:
+        return sum(1 for sp, _ in self.calls if sp == system_prompt)
+
+
+def _document(n_paragraphs: int) -> str:
+    return "\n\n".join(f"P{i} " + "lorem ipsum dolor sit amet " * 20 for i in range(n_paragraphs))
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    from config import settings
+    from services import learning_service
+    from services.llm_service import LLMService
+
+    monkeypatch.setattr(settings, "llm_cache_enabled", False)
+    monkeypatch.setattr(settings, "summary_map_reduce_threshold_tokens", 1_500)
+    monkeypatch.setattr(settings, "summary_section_tokens", 400)
+    monkeypatch.setattr(settings, "summary_map_concurrency", 3)
+
+    fake = RecordingProvider()
+    service = LLMService(primary=fake)
+    monkeypatch.setattr(learning_service, "get_llm_service", lambda mode="cloud": service)
+    return fake
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+def test_split_by_tokens_keeps_order_and_size():
+    from services.token_budget import estimate_tokens, split_by_tokens
+
+    text = _document(40)
+    sections = split_by_tokens(text, 400)
+
+    assert len(sections) > 1
+    assert all(estimate_tokens(s) <= 400 for s in sections)
+    assert "\n\n".join(sections) == text
+
+
+@pytest.mark.asyncio
+async def test_short_document_uses_a_single_call(provider):
+    from services import learning_service
+    from services.prompts.learning_prompts import SUMMARIZE_SHORT
+
+    cache: dict = {}
+    summary = await learning_service.summarise(_document(2), "short", section_cache=cache)
+
+    assert summary.startswith("final summary")
+    assert [sp for sp, _ in provider.calls] == [SUMMARIZE_SHORT]
+    assert cache == {}
+
+
+@pytest.mark.asyncio
+async def test_long_document_is_mapped_concurrently_and_covers_every_section(provider):
+    from services import learning_service
+    from services.prompts.learning_prompts import SUMMARIZE_DETAILED, SUMMARIZE_SECTION
+
+    doc = _document(40)
+    cache: dict = {}
+    summary = await learning_service.summarise(doc, "detailed", section_cache=cache)
+
+    n_sections = provider.count(SUMMARIZE_SECTION)
+    assert n_sections > 3
+    assert provider.peak == 3  # bounded fan-out
+    assert len(cache) == n_sections
+    final_prompt = [p for sp, p in provider.calls if sp == SUMMARIZE_DETAILED][0]
+    assert "notes on: P0" in final_prompt and "notes on: P" in final_prompt.split("---")[-1]
+    assert summary.startswith("final summary")
+
+
+@pytest.mark.asyncio
+async def test_level_change_reuses_persisted_section_notes(provider):
+    from services import learning_service
+    from services.prompts.learning_prompts import SUMMARIZE_SECTION
+
+    doc = _document(40)
+    cache: dict = {}
+    await learning_service.summarise(doc, "short", section_cache=cache)
+    first_map_calls = provider.count(SUMMARIZE_SECTION)
+
+    await learning_service.summarise(doc, "comprehensive", section_cache=cache)
+
+    assert provider.count(SUMMARIZE_SECTION) == first_map_calls  # nothing re-mapped
+    assert len(cache) == first_map_calls
+
+
+@pytest.mark.asyncio
+async def test_notes_are_reduced_hierarchically_when_too_long(provider, monkeypatch):
+    from config import settings
+    from services import learning_service
+    from services.prompts.learning_prompts import MERGE_SECTION_SUMMARIES, SUMMARIZE_SHORT
+
+    monkeypatch.setattr(settings, "summary_map_reduce_threshold_tokens", 200)
+    monkeypatch.setattr(settings, "summary_section_tokens", 150)
+
+    await learning_service.summarise(_document(40), "short", section_cache={})
+
+    assert provider.count(MERGE_SECTION_SUMMARIES) >= 1
+    final_prompt = [p for sp, p in provider.calls if sp == SUMMARIZE_SHORT][0]
+    assert "merged" in final_prompt
+
+
+@pytest.mark.asyncio
+async def test_failed_section_keeps_finished_notes(provider, monkeypatch):
+    from services import learning_service
+    from services.prompts.learning_prompts import SUMMARIZE_SECTION
+
+    original = provider.generate
+
+    async def flaky(prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+        if system_prompt == SUMMARIZE_SECTION and prompt.startswith("P0 "):
+            raise ValueError("provider exploded")
+        return await original(prompt, system_prompt, temperature, max_tokens)
+
+    monkeypatch.setattr(provider, "generate", flaky)
+    cache: dict = {}
+    with pytest.raises(RuntimeError):
+        await learning_service.summarise(_document(40), "short", section_cache=cache)
+
+    assert len(cache) == provider.count(SUMMARIZE_SECTION)
+    assert len(cache) > 0
@@ -0,0 +1,85 @@
+"""Tests for per-call-type model tiers resolved by the LLM layer."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+
+class FakeProvider:
+    """Stands in for a cloud provider; records the model each call ran on."""
+
+    calls: list[tuple[str, str]] = []
+
+    def __init__(self, name, model):
+        self.name = name
+        self.model = model
+
+    async def generate(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+        FakeProvider.calls.append((self.name, self.model))
+        return '{"ok": true}'
+
+
+@pytest.fixture
+def tiered(monkeypatch):
+    from config import settings
+    from services import llm_service
+
+    defaults = {
+        "gemini": "gemini-2.0-flash", "groq": "llama-3.3-70b-versatile",
+        "openrouter": "llama-3-8b-instruct", "ollama": "phi3:mini",
+    }
+    monkeypatch.setattr(llm_service, "_build_provider", lambda name, model=None: FakeProvider(name, model or defaults[name]))
+    monkeypatch.setattr(settings, "llm_model_tiers", {"fast": {"gemini": "gemini-2.0-flash-lite"}})
+    monkeypatch.setattr(settings, "llm_call_type_tiers", {"drift": "fast", "extract": "fast"})
+    FakeProvider.calls = []
+    llm_service.reset_llm_services()
+    yield llm_service
+    llm_service.reset_llm_services()
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+@pytest.mark.asyncio
+async def test_tiered_call_types_run_on_the_tier_model(tiered):
+    llm = tiered.get_llm_service("cloud")
+
+    await llm.generate("is this a violation?", call_type="drift")
+    await llm.generate_json("extract tasks", call_type="extract", cache=False)
+    await llm.generate("hello", call_type="chat")
+
+    assert FakeProvider.calls == [
+        ("gemini", "gemini-2.0-flash-lite"),
+        ("gemini", "gemini-2.0-flash-lite"),
+        ("gemini", "gemini-2.0-flash"),
+    ]
+    stats = {(row["provider"], row["model"], row["call_type"]) for row in tiered.provider_stats()}
+    assert ("gemini", "gemini-2.0-flash-lite", "drift") in stats
+    assert ("gemini", "gemini-2.0-flash", "chat") in stats
+
+
+def test_tier_chain_keeps_providers_the_tier_does_not_name(tiered):
+    llm = tiered.get_llm_service("cloud")
+
+    assert llm.for_call_type("chat") is llm
+    assert llm.for_call_type("drift").chain == [
+        ("gemini", "gemini-2.0-flash-lite"),
+        ("groq", "llama-3.3-70b-versatile"),
+        ("openrouter", "llama-3-8b-instruct"),
+    ]
+    assert tiered.get_llm_service("local").tiers == {}  # the tier names no Ollama model
+
+
+def test_changing_the_tiers_rebuilds_the_services(tiered, monkeypatch):
+    from config import settings
+
+    before = tiered.get_llm_service("cloud")
+    monkeypatch.setattr(settings, "llm_call_type_tiers", {})
+    after = tiered.get_llm_service("cloud")
+
+    assert after is not before
+    assert after.for_call_type("drift") is after
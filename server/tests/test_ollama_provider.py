@@ -0,0 +1,125 @@
+"""Tests for the Ollama provider: streamed generation, keep-alive, warm-up and session contexts."""
+
+import json
+import os
+import sys
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+
+class FakeOllama:
+    """Answers /api/generate with NDJSON batches and a growing context."""
+
+    def __init__(self):
+        self.payloads: list[dict] = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        self.payloads.append(payload)
+        if "prompt" not in payload:  # warm-up: load only
+            return httpx.Response(200, json={"model": payload["model"], "done": True})
+        context = payload.get("context", []) + list(range(len(payload["prompt"].split()) + 2))
+        lines = [
+            {"response": "Hello", "done": False},
+            {"response": " there", "done": False},
+            {"response": "", "done": True, "context": context},
+        ]
+        return httpx.Response(200, content="\n".join(json.dumps(line) for line in lines).encode())
+
+
+@pytest.fixture
+def ollama(monkeypatch):
+    from services import llm_service
+
+    fake = FakeOllama()
+    monkeypatch.setitem(
+        llm_service._http_clients, "ollama", httpx.AsyncClient(transport=httpx.MockTransport(fake.handler)),
+    )
+    return fake
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+@pytest.mark.asyncio
+async def test_generate_consumes_the_stream_and_keeps_the_model_alive(ollama, monkeypatch):
+    from config import settings
+    from services.llm_service import OllamaProvider
+
+    monkeypatch.setattr(settings, "ollama_keep_alive", "1h")
+    text = await OllamaProvider().generate("hi", "be brief", json_mode=True)
+
+    assert text == "Hello there"
+    payload = ollama.payloads[0]
+    assert payload["stream"] is True
+    assert payload["keep_alive"] == "1h"
+    assert payload["format"] == "json"
+    assert "context" not in payload
+
+
+@pytest.mark.asyncio
+async def test_session_context_is_reused_for_follow_up_turns(ollama):
+    from services.llm_service import LLMService, OllamaProvider
+
+    llm = LLMService(primary=OllamaProvider())
+    await llm.generate("first question", call_type="chat", session="p1:u1")
+    first_context = ollama.payloads[0].get("context")
+    chunks = [c async for c, _ in llm.generate_stream("follow up", session="p1:u1")]
+    await llm.generate("unrelated", call_type="chat", session="p2:u1")
+
+    assert first_context is None
+    assert "".join(chunks) == "Hello there"
+    assert ollama.payloads[1]["context"] == list(range(4))  # returned by the first turn
+    assert "context" not in ollama.payloads[2]  # other conversation
+
+
+@pytest.mark.asyncio
+async def test_context_is_dropped_when_the_next_turn_would_not_fit(ollama, monkeypatch):
+    from config import settings
+    from services.llm_service import OllamaProvider
+
+    provider = OllamaProvider()
+    await provider.generate("first", session="s")
+    monkeypatch.setattr(settings, "ollama_num_ctx", 100)
+    await provider.generate("second", max_tokens=99, session="s")
+
+    assert "context" not in ollama.payloads[1]
+
+
+@pytest.mark.asyncio
+async def test_session_contexts_are_bounded(ollama, monkeypatch):
+    from config import settings
+    from services.llm_service import OllamaProvider
+
+    monkeypatch.setattr(settings, "ollama_session_contexts", 2)
+    provider = OllamaProvider()
+    for session in ("a", "b", "c"):
+        await provider.generate("q", session=session)
+
+    assert list(provider._contexts) == ["b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_warm_up_loads_the_model_without_a_prompt(ollama, monkeypatch):
+    from services import llm_service
+
+    monkeypatch.setitem(llm_service._providers, "ollama", llm_service.OllamaProvider(model="phi3:mini"))
+    await llm_service.warm_up_local_model()
+
+    assert ollama.payloads == [{"model": "phi3:mini", "keep_alive": "30m"}]
+
+
+@pytest.mark.asyncio
+async def test_warm_up_failure_is_not_fatal(monkeypatch):
+    from services import llm_service
+
+    def refuse(request):
+        raise httpx.ConnectError("connection refused")
+
+    monkeypatch.setitem(llm_service._http_clients, "ollama", httpx.AsyncClient(transport=httpx.MockTransport(refuse)))
+    monkeypatch.setitem(llm_service._providers, "ollama", llm_service.OllamaProvider())
+    await llm_service.warm_up_local_model()  # logs and returns
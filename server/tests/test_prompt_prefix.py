@@ -0,0 +1,256 @@
+"""Tests for the stable chat prompt prefix and its provider-side caching."""
+
+import asyncio
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+
+class PlainProvider:
+    name = "groq"
+
+    def __init__(self):
+        self.prompts: list[str] = []
+
+    async def generate(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+        self.prompts.append(prompt)
+        return "ok"
+
+
+class PrefixProvider(PlainProvider):
+    name = "gemini"
+    supports_prompt_prefix = True
+
+    async def generate(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096, prefix=None):
+        self.prompts.append((prefix.text, prompt))
+        return "ok"
+
+
+class FakeGeminiClient:
+    """Stands in for genai.Client: client.aio.caches / client.aio.models."""
+
+    def __init__(self):
+        self.created: list[dict] = []
+        self.deleted: list[str] = []
+        self.calls: list[dict] = []
+        self.reject: set[str] = set()  # cached-content names to answer with 404
+        self.aio = SimpleNamespace(
+            caches=SimpleNamespace(create=self._create, delete=self._delete),
+            models=SimpleNamespace(generate_content=self._generate, generate_content_stream=self._stream),
+        )
+
+    async def _create(self, model, config):
+        self.created.append({"model": model, "system": config.system_instruction, "contents": config.contents})
+        return SimpleNamespace(name=f"cachedContents/{len(self.created)}")
+
+    async def _delete(self, name):
+        self.deleted.append(name)
+
+    async def _generate(self, model, contents, config):
+        from google.genai.errors import ClientError
+
+        self.calls.append({"contents": contents, "cached": config.cached_content, "system": config.system_instruction})
+        if config.cached_content in self.reject:
+            raise ClientError(404, SimpleNamespace(body_segments=[{"error": {"status": "NOT_FOUND"}}]))
+        return SimpleNamespace(text="answer")
+
+    async def _stream(self, model, contents, config):
+        async def chunks():  # lazy, like the SDK's: the request happens on the first step
+            response = await self._generate(model, contents, config)
+            yield response
+
+        return chunks()
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    from config import settings
+    from services.llm_service import GeminiProvider
+
+    monkeypatch.setattr(settings, "gemini_prefix_cache_min_tokens", 10)
+    provider = GeminiProvider(api_key="x")
+    provider.client = FakeGeminiClient()
+    return provider
+
+
+async def _settle():
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+# ── Prompt structure ──────────────────────────────────────────────────────────
+
+@pytest.mark.asyncio
+async def test_project_context_is_a_prefix_that_does_not_depend_on_the_query(monkeypatch):
+    from services import context_engine
+
+    async def fake_context(project_id, db):
+        return {
+            "project": {"name": "Demo", "goal": "Ship it", "constraints": ["Use FastAPI"],
+                        "decisions": [], "open_questions": []},
+            "documents": [{"filename": "spec.md", "summary": "The spec."}],
+            "code_insights": [],
+            "tasks": [{"priority": 2, "description": "Write tests"}],
+        }
+
+    async def fake_chunks(project_id, query, db, top_k=5, query_embedding=None):
+        return [{"source_type": "document", "source_id": "d1", "content_chunk": f"chunk about {query}"}]
+
+    monkeypatch.setattr(context_engine, "get_full_context", fake_context)
+    monkeypatch.setattr(context_engine, "retrieve_relevant_chunks", fake_chunks)
+
+    prefix_a, suffix_a, _ = await context_engine.build_context_parts("p1", "first question", db=None)
+    prefix_b, suffix_b, refs = await context_engine.build_context_parts("p1", "second question", db=None)
+    prompt, _ = await context_engine.build_context_prompt("p1", "second question", db=None)
+
+    assert prefix_a == prefix_b
+    assert prefix_a.startswith("=== PROJECT CONTEXT ===") and "Write tests" in prefix_a
+    assert "RELEVANT KNOWLEDGE" in suffix_b and suffix_b.endswith("=== USER QUERY ===\nsecond question")
+    assert prompt == f"{prefix_b}\n{suffix_b}"
+    assert refs[0]["source_id"] == "d1"
+
+
+@pytest.mark.asyncio
+async def test_prefix_is_passed_separately_only_to_providers_that_cache_it():
+    from services.llm_service import LLMService
+    from services.prompt_cache import PromptPrefix
+
+    prefix = PromptPrefix("=== PROJECT CONTEXT ===", scope="p1")
+    caching, plain = PrefixProvider(), PlainProvider()
+    await LLMService(primary=caching).generate("question", call_type="chat", prefix=prefix)
+    await LLMService(primary=plain).generate("question", call_type="chat", prefix=prefix)
+
+    assert caching.prompts == [("=== PROJECT CONTEXT ===", "question")]
+    assert plain.prompts == ["=== PROJECT CONTEXT ===\nquestion"]
+
+
+# ── Gemini cached content ─────────────────────────────────────────────────────
+
+@pytest.mark.asyncio
+async def test_gemini_caches_the_prefix_and_sends_only_the_suffix_afterwards(gemini):
+    from services.prompt_cache import PromptPrefix
+
+    prefix = PromptPrefix("project context " * 20, scope="p1")
+    await gemini.generate("first", "system", prefix=prefix)
+    await _settle()
+    await gemini.generate("second", "system", prefix=prefix)
+
+    first, second = gemini.client.calls
+    assert first == {"contents": prefix.join("first"), "cached": None, "system": "system"}
+    assert second == {"contents": "second", "cached": "cachedContents/1", "system": None}
+    assert gemini.client.created == [{"model": gemini.model, "system": "system", "contents": [prefix.text]}]
+    assert gemini.prefix_cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_gemini_replaces_the_handle_when_the_project_context_changes(gemini):
+    from services.prompt_cache import PromptPrefix
+
+    await gemini.generate("q", "system", prefix=PromptPrefix("old context " * 20, scope="p1"))
+    await _settle()
+    await gemini.generate("q", "system", prefix=PromptPrefix("new context " * 20, scope="p1"))
+    await _settle()
+
+    assert gemini.client.calls[-1]["cached"] is None
+    assert len(gemini.client.created) == 2
+    assert gemini.client.deleted == ["cachedContents/1"]
+    assert gemini.prefix_cache.stats()["scopes"] == 1
+
+
+@pytest.mark.asyncio
+async def test_gemini_falls_back_to_the_full_prompt_when_the_cache_is_gone(gemini):
+    from services.prompt_cache import PromptPrefix
+
+    prefix = PromptPrefix("project context " * 20, scope="p1")
+    await gemini.generate("q", "system", prefix=prefix)
+    await _settle()
+    gemini.client.reject.add("cachedContents/1")
+    text = await gemini.generate("q", "system", prefix=prefix)
+
+    assert text == "answer"
+    assert gemini.client.calls[-1] == {"contents": prefix.join("q"), "cached": None, "system": "system"}
+    assert gemini.prefix_cache.stats()["scopes"] == 0  # recreated on the next turn
+
+
+@pytest.mark.asyncio
+async def test_gemini_stream_falls_back_to_the_full_prompt_when_the_cache_is_gone(gemini):
+    from services.prompt_cache import PromptPrefix
+
+    prefix = PromptPrefix("project context " * 20, scope="p1")
+    await gemini.generate("q", "system", prefix=prefix)
+    await _settle()
+    gemini.client.reject.add("cachedContents/1")
+    chunks = [chunk async for chunk in gemini.generate_stream("q", "system", prefix=prefix)]
+
+    assert chunks == ["answer"]
+    assert gemini.client.calls[-1] == {"contents": prefix.join("q"), "cached": None, "system": "system"}
+    assert gemini.prefix_cache.stats()["scopes"] == 0
+
+
+@pytest.mark.asyncio
+async def test_short_prefixes_are_not_cached(gemini, monkeypatch):
+    from config import settings
+    from services.prompt_cache import PromptPrefix
+
+    monkeypatch.setattr(settings, "gemini_prefix_cache_min_tokens", 4096)
+    await gemini.generate("q", "system", prefix=PromptPrefix("tiny", scope="p1"))
+    await _settle()
+
+    assert gemini.client.created == []
+
+
+# ── Ollama session contexts ───────────────────────────────────────────────────
+
+@pytest.mark.asyncio
+async def test_ollama_follow_up_turns_send_only_the_suffix(monkeypatch):
+    from services import llm_service
+    from services.prompt_cache import PromptPrefix
+
+    payloads: list[dict] = []
+
+    def handler(request):
+        payloads.append(json.loads(request.content))
+        return httpx.Response(200, content=json.dumps({"response": "ok", "done": True, "context": [1, 2, 3]}).encode())
+
+    monkeypatch.setitem(llm_service._http_clients, "ollama", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    provider = llm_service.OllamaProvider()
+    context = PromptPrefix("=== PROJECT CONTEXT ===", scope="p1")
+    await provider.generate("first", "system", max_tokens=256, session="p1:u1", prefix=context)
+    await provider.generate("second", "system", max_tokens=256, session="p1:u1", prefix=context)
+    await provider.generate("third", "system", max_tokens=256, session="p1:u1", prefix=PromptPrefix("changed", scope="p1"))
+
+    assert payloads[0]["prompt"] == "system\n\n=== PROJECT CONTEXT ===\nfirst"
+    assert payloads[1]["prompt"] == "second" and payloads[1]["context"] == [1, 2, 3]
+    assert payloads[2]["prompt"] == "system\n\nchanged\nthird" and "context" not in payloads[2]
+
+
+@pytest.mark.asyncio
+async def test_ollama_session_restarts_after_a_turn_answered_elsewhere(monkeypatch):
+    from services import llm_service
+    from services.prompt_cache import PromptPrefix
+
+    payloads: list[dict] = []
+
+    def handler(request):
+        payloads.append(json.loads(request.content))
+        if len(payloads) == 2:
+            return httpx.Response(500)
+        return httpx.Response(200, content=json.dumps({"response": "ok", "done": True, "context": [1, 2, 3]}).encode())
+
+    monkeypatch.setitem(llm_service._http_clients, "ollama", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    cloud = PlainProvider()
+    llm = llm_service.LLMService(primary=llm_service.OllamaProvider(), fallback=cloud)
+    context = PromptPrefix("=== PROJECT CONTEXT ===", scope="p1")
+    for turn in ("first", "second", "third"):
+        await llm.generate(turn, "system", max_tokens=256, session="p1:u1", prefix=context)
+
+    assert len(cloud.prompts) == 1  # the second turn
+    assert payloads[2]["prompt"] == "system\n\n=== PROJECT CONTEXT ===\nthird" and "context" not in payloads[2]
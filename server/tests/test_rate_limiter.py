@@ -0,0 +1,127 @@
+"""Tests for per-provider concurrency limits and token-bucket rate limiting."""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+
+class CountingProvider:
+    def __init__(self, name: str, delay: float = 0.0):
+        self.name = name
+        self.model = f"{name}-model"
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.calls = 0
+
+    async def generate(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        return f"{self.name} ok"
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+def test_token_bucket_wait_time(monkeypatch):
+    from services import rate_limiter
+
+    now = [100.0]
+    monkeypatch.setattr(rate_limiter.time, "monotonic", lambda: now[0])
+    bucket = rate_limiter.TokenBucket(per_minute=60)  # one per second
+
+    assert bucket.wait_time(60) == 0.0
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    now[0] += 0.5
+    assert bucket.wait_time(1) == pytest.approx(0.5)
+    # Oversized requests are capped at capacity rather than waiting forever
+    now[0] += 1000
+    assert bucket.wait_time(10_000) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_queues_callers():
+    from services.llm_service import LLMService
+    from services.rate_limiter import ProviderLimiter
+
+    provider = CountingProvider("gemini", delay=0.02)
+    limiter = ProviderLimiter("gemini", max_concurrency=2, max_wait=5.0)
+    service = LLMService(primary=provider, limiters={"gemini": limiter})
+
+    await asyncio.gather(*(service.generate(f"q{i}") for i in range(6)))
+
+    assert provider.peak == 2
+    snapshot = limiter.snapshot()
+    assert snapshot["admitted"] == 6
+    assert snapshot["max_queue_ms"] > 0
+    assert snapshot["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_busy_provider_falls_back_without_tripping_breaker():
+    from services.llm_service import LLMService
+    from services.rate_limiter import ProviderLimiter
+
+    primary = CountingProvider("gemini", delay=0.2)
+    backup = CountingProvider("groq")
+    limiters = {"gemini": ProviderLimiter("gemini", max_concurrency=1, max_wait=0.01)}
+    service = LLMService(primary=primary, fallbacks=[backup], limiters=limiters)
+
+    results = await asyncio.gather(service.generate("a"), service.generate("b"))
+
+    assert sorted(provider for _, provider, _ in results) == ["gemini", "groq"]
+    assert limiters["gemini"].rejected == 1
+    assert service.breaker(primary).failures == 0
+
+
+@pytest.mark.asyncio
+async def test_rpm_limit_rejects_when_wait_exceeds_budget():
+    from services.llm_service import LLMService
+    from services.rate_limiter import ProviderLimiter
+
+    primary = CountingProvider("gemini")
+    limiters = {"gemini": ProviderLimiter("gemini", rpm=1, max_wait=0.5)}
+    service = LLMService(primary=primary, limiters=limiters)
+
+    await service.generate("first")
+    with pytest.raises(RuntimeError, match="busy"):
+        await service.generate("second")  # next token is ~60s away
+    assert primary.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_tpm_reservation_makes_later_callers_wait():
+    from services.rate_limiter import ProviderLimiter
+
+    limiter = ProviderLimiter("groq", tpm=6000, max_wait=1.0)  # 100 tokens/s
+    async with limiter.slot(tokens=6000) as first_wait:
+        pass
+    async with limiter.slot(tokens=20) as second_wait:
+        pass
+
+    assert first_wait < 50
+    assert second_wait >= 150  # ~0.2s to refill 20 tokens
+
+
+def test_limits_come_from_flat_settings(monkeypatch):
+    from config import settings
+    from services.rate_limiter import ProviderLimiter
+
+    monkeypatch.setattr(settings, "llm_groq_max_concurrency", 3)
+    monkeypatch.setattr(settings, "llm_groq_rpm", 30)
+    monkeypatch.setattr(settings, "llm_groq_tpm", 0)
+
+    snapshot = ProviderLimiter.from_settings("groq").snapshot()
+    assert (snapshot["max_concurrency"], snapshot["rpm"], snapshot["tpm"]) == (3, 30, None)
+    assert ProviderLimiter.from_settings("unknown").unlimited
@@ -0,0 +1,132 @@
+"""Tests for rate-limit cool-downs: reset headers, jitter and provider selection."""
+
+import os
+import sys
+import time
+from email.utils import formatdate
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+
+def _http_error(status: int, headers: dict | None = None) -> httpx.HTTPStatusError:
+    resp = httpx.Response(status, headers=headers or {}, request=httpx.Request("POST", "https://example.com"))
+    return httpx.HTTPStatusError(f"HTTP {status}", request=resp.request, response=resp)
+
+
+class ScriptedProvider:
+    """Raises the queued errors in turn, then answers."""
+
+    def __init__(self, name: str, *errors: Exception):
+        self.name = name
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def generate(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return f"{self.name} ok"
+
+
+# ── Reset headers ─────────────────────────────────────────────────────────────
+
+def test_reset_is_read_from_each_providers_headers():
+    from services.retry_policy import reset_after
+
+    assert reset_after(_http_error(429, {"Retry-After": "12"})) == 12.0
+    assert 25 < reset_after(_http_error(429, {"Retry-After": formatdate(time.time() + 30, usegmt=True)})) <= 30
+    groq = {"x-ratelimit-reset-requests": "2m59.56s", "x-ratelimit-reset-tokens": "350ms"}
+    assert reset_after(_http_error(429, groq)) == pytest.approx(179.56)
+    openrouter = {"X-RateLimit-Reset": str(int((time.time() + 20) * 1000))}
+    assert 18 < reset_after(_http_error(429, openrouter)) <= 20
+    gemini = SimpleNamespace(details={"error": {"details": [
+        {"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "37s"},
+    ]}})
+    assert reset_after(gemini) == 37.0
+    assert reset_after(_http_error(429)) is None
+
+
+def test_decorrelated_jitter_grows_within_the_cap_and_resets_on_success():
+    from services.retry_policy import RetryPolicy
+
+    policy = RetryPolicy("groq", base_seconds=1.0, cap_seconds=5.0)
+    delays = [policy.record_rate_limit(_http_error(429)) for _ in range(20)]
+
+    assert delays[0] <= 3.0
+    assert all(1.0 <= d <= 5.0 for d in delays)
+    assert policy.wait_time() > 0
+    policy.record_success()
+    assert policy.wait_time() == 0 and policy.record_rate_limit(_http_error(429)) <= 3.0
+
+
+# ── Provider selection ────────────────────────────────────────────────────────
+
+@pytest.mark.asyncio
+async def test_rate_limited_provider_is_not_called_again_before_its_reset():
+    from services.llm_service import LLMService
+
+    primary = ScriptedProvider("gemini", _http_error(429, {"Retry-After": "30"}))
+    backup = ScriptedProvider("groq")
+    llm = LLMService(primary=primary, fallback=backup)
+
+    served = [(await llm.generate("q"))[1] for _ in range(3)]
+
+    assert served == ["groq", "groq", "groq"]
+    assert primary.calls == 1
+    assert llm.retry(primary).snapshot()["from_headers"] == 1
+
+
+@pytest.mark.asyncio
+async def test_short_reset_is_waited_for_instead_of_failing(monkeypatch):
+    from config import settings
+    from services.llm_service import LLMService
+
+    monkeypatch.setattr(settings, "llm_retry_base_seconds", 0.01)
+    only = ScriptedProvider("gemini", _http_error(429, {"Retry-After": "0.05"}))
+    llm = LLMService(primary=only)
+
+    with pytest.raises(RuntimeError):
+        await llm.generate("q")
+    text, provider, _ = await llm.generate("q")
+
+    assert (text, provider) == ("gemini ok", "gemini")
+    assert llm.retry(only).snapshot()["waited"] == 1
+    assert llm.retry(only).wait_time() == 0
+
+
+@pytest.mark.asyncio
+async def test_primary_server_errors_fall_back_but_auth_errors_are_raised():
+    from services.llm_service import LLMService
+
+    llm = LLMService(primary=ScriptedProvider("gemini", _http_error(500)), fallback=ScriptedProvider("groq"))
+    assert (await llm.generate("q"))[1] == "groq"
+
+    llm = LLMService(primary=ScriptedProvider("gemini", _http_error(401)), fallback=ScriptedProvider("groq"))
+    with pytest.raises(httpx.HTTPStatusError):
+        await llm.generate("q")
+
+
+@pytest.mark.asyncio
+async def test_cooling_provider_does_not_use_up_the_half_open_probe():
+    from services.circuit_breaker import CLOSED, HALF_OPEN, OPEN
+    from services.llm_service import LLMService
+
+    only = ScriptedProvider("gemini")
+    llm = LLMService(primary=only)
+    breaker = llm.breaker(only)
+    breaker.state, breaker.opened_at = OPEN, time.monotonic() - breaker.recovery_seconds
+    llm.retry(only).record_rate_limit(_http_error(429, {"Retry-After": "30"}))
+
+    with pytest.raises(RuntimeError):
+        await llm.generate("q")
+    assert breaker.state == HALF_OPEN and breaker.probe_started_at is None
+
+    llm.retry(only).blocked_until = None  # the reset has passed
+    assert (await llm.generate("q"))[1] == "gemini"
+    assert only.calls == 1 and breaker.state == CLOSED
@@ -0,0 +1,146 @@
+"""Tests for the semantic chat answer cache and its use in the RAG pipeline."""
+
+import datetime
+import os
+import sys
+import uuid
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+
+class CountingProvider:
+    name = "counting"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def generate(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+        self.calls += 1
+        return f"answer #{self.calls}"
+
+
+def _fake_db() -> MagicMock:
+    db = MagicMock()
+    db.refresh.side_effect = lambda obj: setattr(obj, "id", uuid.uuid4())
+    return db
+
+
+@pytest.fixture
+def fresh_cache(monkeypatch):
+    from services import semantic_cache
+    monkeypatch.setattr(semantic_cache, "_entries", {})
+    monkeypatch.setattr(semantic_cache, "_versions", {})
+    return semantic_cache
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+def test_lookup_respects_distance_threshold(fresh_cache, monkeypatch):
+    monkeypatch.setattr(fresh_cache.settings, "chat_semantic_cache_distance", 0.05)
+    fresh_cache.store("p1", [1.0, 0.0, 0.0], {"answer": "stored"}, version=0)
+
+    assert fresh_cache.lookup("p1", [0.99, 0.05, 0.0])["answer"] == "stored"
+    assert fresh_cache.lookup("p1", [0.5, 0.5, 0.0]) is None
+    assert fresh_cache.lookup("p2", [1.0, 0.0, 0.0]) is None  # other project
+
+
+def test_invalidate_drops_entries_and_rejects_stale_stores(fresh_cache):
+    version = fresh_cache.context_version("p1")
+    fresh_cache.store("p1", [1.0, 0.0], {"answer": "old"}, version=version)
+
+    fresh_cache.invalidate("p1")
+    assert fresh_cache.lookup("p1", [1.0, 0.0]) is None
+
+    # An answer computed before the invalidation must not be cached afterwards
+    fresh_cache.store("p1", [1.0, 0.0], {"answer": "stale"}, version=version)
+    assert fresh_cache.lookup("p1", [1.0, 0.0]) is None
+
+
+@pytest.mark.asyncio
+async def test_repeat_question_is_served_from_cache(fresh_cache, monkeypatch):
+    from services import rag_service
+    from services.llm_service import LLMService
+
+    provider = CountingProvider()
+    build_calls = []
+
+    async def fake_embedding(text):
+        return [1.0, 0.0, 0.0] if "next steps" in text else [0.0, 1.0, 0.0]
+
+    async def fake_build_context_parts(project_id, user_query, db, query_embedding=None, **kwargs):
+        build_calls.append(query_embedding)
+        return "", user_query, []
+
+    async def fake_check_drift(project_id, llm_response, db, **kwargs):
+        return []
+
+    monkeypatch.setattr(rag_service, "generate_embedding", fake_embedding)
+    monkeypatch.setattr(rag_service, "build_context_parts", fake_build_context_parts)
+    monkeypatch.setattr(rag_service, "check_drift", fake_check_drift)
+    monkeypatch.setattr(rag_service, "get_llm_service", lambda mode="cloud": LLMService(primary=provider))
+
+    first = await rag_service.query_with_context("p1", "What are my next steps?", "u1", _fake_db())
+    second = await rag_service.query_with_context("p1", "what are my next steps", "u1", _fake_db())
+    other = await rag_service.query_with_context("p1", "Explain the schema", "u1", _fake_db())
+
+    assert first["cache_hit"] is False and second["cache_hit"] is True
+    assert second["answer"] == first["answer"]
+    assert second["message_id"] != first["message_id"]  # still persisted
+    assert other["cache_hit"] is False
+    assert provider.calls == 2
+    assert build_calls[0] == [1.0, 0.0, 0.0]  # embedding reused for retrieval
+
+    fresh_cache.invalidate("p1")  # e.g. a document was uploaded
+    after = await rag_service.query_with_context("p1", "What are my next steps?", "u1", _fake_db())
+    assert after["cache_hit"] is False
+    assert provider.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_upload_invalidates_once_the_embeddings_are_stored(fresh_cache, monkeypatch):
+    import httpx
+    import main
+    from database import get_db
+    from middleware.auth import get_current_user
+    from routers import learning as learning_router
+
+    async def chunks(text, chunk_size=500, overlap=50):
+        return [text]
+
+    async def embed(texts):
+        return [[1.0, 0.0] for _ in texts]
+
+    async def upload(data, filename, project_id):
+        return f"{project_id}/{filename}"
+
+    project = SimpleNamespace(id=uuid.uuid4())
+    monkeypatch.setattr(learning_router, "_get_project_or_404", lambda *a: project)
+    monkeypatch.setattr(learning_router.pdf_service, "chunk_text", chunks)
+    monkeypatch.setattr(learning_router.embedding_service, "generate_embeddings_batch", embed)
+    monkeypatch.setattr(learning_router.file_storage, "upload_file", upload)
+    db = _fake_db()
+    db.refresh.side_effect = lambda obj: (
+        setattr(obj, "id", uuid.uuid4()), setattr(obj, "created_at", datetime.datetime.now()),
+    )
+    versions_at_commit: list[int] = []
+    db.commit.side_effect = lambda: versions_at_commit.append(fresh_cache.context_version(project.id))
+    main.app.dependency_overrides[get_db] = lambda: db
+    main.app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id=uuid.uuid4())
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            resp = await client.post(
+                f"/api/projects/{project.id}/documents/upload", files={"file": ("notes.md", b"Use FastAPI.")},
+            )
+    finally:
+        main.app.dependency_overrides.clear()
+
+    assert resp.status_code == 201, resp.text
+    assert len(versions_at_commit) == 2  # document, then its embeddings
+    assert fresh_cache.context_version(project.id) > versions_at_commit[-1]
@@ -0,0 +1,130 @@
+"""Tests for single-flight coalescing of identical in-flight LLM and embedding calls."""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+
+class SlowProvider:
+    name = "gemini"
+    model = "gemini-test"
+
+    def __init__(self, delay: float = 0.05, fail: Exception | None = None):
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.cancelled = 0
+
+    async def generate(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise self.fail
+        return f"answer to {prompt}"
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_generates_share_one_call():
+    from services.llm_service import LLMService
+
+    provider = SlowProvider()
+    service = LLMService(primary=provider)
+
+    results = await asyncio.gather(
+        service.generate("same question", "sys"),
+        service.generate("same question", "sys"),
+        service.generate("same question", "sys"),
+        service.generate("other question", "sys"),
+    )
+
+    assert provider.calls == 2
+    assert results[0][0] == results[1][0] == results[2][0] == "answer to same question"
+    assert service.inflight.stats() == {"in_flight": 0, "leaders": 2, "coalesced": 2, "abandoned": 0}
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_abort_the_others():
+    from services.llm_service import LLMService
+
+    provider = SlowProvider(delay=0.1)
+    service = LLMService(primary=provider)
+
+    first = asyncio.create_task(service.generate("q"))
+    second = asyncio.create_task(service.generate("q"))
+    await asyncio.sleep(0.02)
+    first.cancel()
+
+    text, _, _ = await second
+    assert text == "answer to q"
+    assert first.cancelled()
+    assert provider.calls == 1 and provider.cancelled == 0
+
+
+@pytest.mark.asyncio
+async def test_call_is_cancelled_when_every_caller_leaves():
+    from services.llm_service import LLMService
+
+    provider = SlowProvider(delay=5.0)
+    service = LLMService(primary=provider)
+
+    callers = [asyncio.create_task(service.generate("q")) for _ in range(2)]
+    await asyncio.sleep(0.02)
+    for task in callers:
+        task.cancel()
+    await asyncio.gather(*callers, return_exceptions=True)
+    await asyncio.sleep(0)
+
+    assert provider.cancelled == 1
+    assert service.inflight.stats()["abandoned"] == 1
+    assert service.inflight.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_waiter():
+    from services.llm_service import LLMService
+
+    provider = SlowProvider(fail=ValueError("boom"))
+    service = LLMService(primary=provider)
+
+    results = await asyncio.gather(
+        service.generate("q"), service.generate("q"), return_exceptions=True,
+    )
+
+    assert provider.calls == 1
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_identical_embeddings_are_coalesced(monkeypatch):
+    from services import embedding_service
+
+    calls = []
+
+    async def fake_embed(text):
+        calls.append(text)
+        await asyncio.sleep(0.05)
+        return [0.1, 0.2, 0.3]
+
+    monkeypatch.setattr(embedding_service, "_embed", fake_embed)
+
+    a, b, c = await asyncio.gather(
+        embedding_service.generate_embedding("hello"),
+        embedding_service.generate_embedding("hello"),
+        embedding_service.generate_embedding("world"),
+    )
+
+    assert calls == ["hello", "world"]
+    assert a == b == [0.1, 0.2, 0.3]
+    assert a is not b  # each caller gets its own copy
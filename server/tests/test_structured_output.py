@@ -0,0 +1,176 @@
+"""Tests for JSON-mode generation, local JSON repair and the retry-rate metric."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+
+class JsonProvider:
+    """Supports json_mode; replies from a script, one entry per call."""
+
+    name = "gemini"
+    supports_json_mode = True
+
+    def __init__(self, *replies: str):
+        self.replies = list(replies)
+        self.calls: list[tuple[str, bool]] = []
+
+    async def generate(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096, json_mode=False):
+        self.calls.append((system_prompt, json_mode))
+        return self.replies.pop(0)
+
+
+class PlainProvider:
+    """No json_mode parameter at all, like the older duck-typed providers."""
+
+    name = "groq"
+
+    def __init__(self, reply: str):
+        self.reply = reply
+
+    async def generate(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+        return self.reply
+
+
+# ── Repair ────────────────────────────────────────────────────────────────────
+
+@pytest.mark.parametrize(
+    "raw, expected",
+    [
+        ('```json\n{"a": [1, 2,], "b": "x"}\n```', {"a": [1, 2], "b": "x"}),
+        ('Here you go: {"a": 1} — hope that helps!', {"a": 1}),
+        ('{"summary": "cut off mid sen', {"summary": "cut off mid sen"}),
+        ('{"steps": ["one", "two", "thr', {"steps": ["one", "two", "thr"]}),
+        ('{"concepts": [{"name": "A"}, {"name": "B", "defin', {"concepts": [{"name": "A"}, {"name": "B"}]}),
+        ('{"a": "quote \\" inside", "b":', {"a": 'quote " inside', "b": None}),
+    ],
+)
+def test_repair_recovers_common_breakage(raw, expected):
+    from services.utils import load_json
+
+    data, repaired = load_json(raw)
+    assert data == expected
+    assert repaired
+
+
+def test_valid_json_is_not_marked_repaired():
+    from services.utils import load_json
+
+    assert load_json('{"a": 1}') == ({"a": 1}, False)
+
+
+def test_array_is_unwrapped_from_json_object_mode():
+    from services.utils import parse_json_array
+
+    assert parse_json_array('{"tasks": [{"description": "x"}]}') == [{"description": "x"}]
+    with pytest.raises(ValueError):
+        parse_json_array('{"a": [1], "b": [2]}')
+
+
+def test_unrecoverable_reply_raises():
+    from services.utils import parse_json_object
+
+    with pytest.raises(ValueError):
+        parse_json_object("I cannot help with that.")
+
+
+# ── generate_json ─────────────────────────────────────────────────────────────
+
+@pytest.mark.asyncio
+async def test_generate_json_requests_json_mode_and_repairs_locally():
+    from services.llm_service import LLMService
+
+    provider = JsonProvider('{"summary": "truncated repl')
+    llm = LLMService(primary=provider)
+
+    data, name, _ = await llm.generate_json("doc", "sys", call_type="summarise")
+
+    assert data == {"summary": "truncated repl"}
+    assert name == "gemini"
+    assert provider.calls == [("sys", True)]  # one call, no retry
+    snapshot = llm.stats.json_snapshot()["summarise"]
+    assert snapshot["repaired"] == 1 and snapshot["retry_rate"] == 0.0
+
+
+@pytest.mark.asyncio
+async def test_generate_json_retries_once_when_repair_fails():
+    from services.llm_service import LLMService
+    from services.prompts import STRICT_JSON_SUFFIX
+
+    provider = JsonProvider("Sorry, no JSON today.", '{"ok": true}')
+    llm = LLMService(primary=provider)
+
+    data, _, _ = await llm.generate_json("doc", "sys", call_type="extract")
+
+    assert data == {"ok": True}
+    assert [sp for sp, _ in provider.calls] == ["sys", "sys" + STRICT_JSON_SUFFIX]
+    snapshot = llm.stats.json_snapshot()["extract"]
+    assert snapshot["retried"] == 1 and snapshot["retry_rate"] == 1.0
+
+
+@pytest.mark.asyncio
+async def test_generate_json_failure_is_counted_and_raised():
+    from services.llm_service import LLMService
+
+    llm = LLMService(primary=JsonProvider("nope", "still nope"))
+
+    with pytest.raises(ValueError):
+        await llm.generate_json("doc", "sys", call_type="extract")
+    assert llm.stats.json_snapshot()["extract"]["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_json_mode_is_not_passed_to_providers_without_support():
+    from services.llm_service import LLMService
+
+    llm = LLMService(primary=PlainProvider('[{"description": "x"}]'))
+
+    data, _, _ = await llm.generate_json("doc", call_type="extract", expect=list)
+    assert data == [{"description": "x"}]
+
+
+@pytest.mark.asyncio
+async def test_generate_json_caches_only_the_parsed_result(monkeypatch):
+    from services import llm_cache
+    from services.llm_service import LLMService
+
+    monkeypatch.setattr(llm_cache, "_cache", llm_cache.LLMResultCache(max_entries=8))
+    provider = JsonProvider("Sorry, no JSON today.", '```json\n{"ok": true,}\n```')
+    llm = LLMService(primary=provider)
+
+    first = await llm.generate_json("doc", "sys", call_type="extract", cache=True)
+    second = await llm.generate_json("doc", "sys", call_type="extract", cache=True)
+
+    assert first[0] == second[0] == {"ok": True}
+    assert len(provider.calls) == 2  # the repeat is a cache hit
+    key = llm.cache_key("doc", "sys", 0.3, 4096, json_mode=True)
+    assert (await llm_cache.get_llm_cache().get(key))[0] == '{"ok": true}'
+    assert llm.stats.json_snapshot()["extract"]["retried"] == 1
+
+
+@pytest.mark.asyncio
+async def test_malformed_drift_verdict_is_not_cached(monkeypatch):
+    from services import drift_detector, llm_cache
+    from services.llm_service import LLMService
+
+    monkeypatch.setattr(llm_cache, "_cache", llm_cache.LLMResultCache(max_entries=8))
+    provider = JsonProvider("no verdict", "still no verdict", '{"has_violations": false}')
+    monkeypatch.setattr(drift_detector, "get_llm_service", lambda mode: LLMService(primary=provider))
+
+    assert await drift_detector._llm_based_check(["Use FastAPI"], "Django it is") == []
+    assert llm_cache.get_llm_cache().stats()["entries"] == 0
+    assert await drift_detector._llm_based_check(["Use FastAPI"], "Django it is") == []
+    assert len(provider.calls) == 3 and llm_cache.get_llm_cache().stats()["entries"] == 1
+
+
+def test_json_mode_is_part_of_the_cache_key():
+    from services.llm_cache import make_key
+
+    base = make_key([("gemini", "flash")], "sys", "prompt", 0.0, 1024)
+    assert base == make_key([("gemini", "flash")], "sys", "prompt", 0.0, 1024, json_mode=False)
+    assert base != make_key([("gemini", "flash")], "sys", "prompt", 0.0, 1024, json_mode=True)
@@ -0,0 +1,116 @@
+"""Tests for token estimation and prompt budgeting."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+
+class SizedProvider:
+    def __init__(self, name: str, model: str):
+        self.name = name
+        self.model = model
+        self.max_tokens_seen = []
+
+    async def generate(self, prompt, system_prompt="", temperature=0.3, max_tokens=4096):
+        self.max_tokens_seen.append(max_tokens)
+        return f"{self.name} ok"
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+def test_profiles_match_longest_model_key(monkeypatch):
+    from config import settings
+    from services.token_budget import DEFAULT_PROFILE, profile_for
+
+    assert profile_for("gemini", "gemini-2.0-flash").context_window == 1_048_576
+    assert profile_for("openrouter", "meta-llama/llama-3-8b-instruct").context_window == 8_192
+    assert profile_for("groq", "llama-3.3-70b-versatile").context_window == 131_072
+    assert profile_for("x", "unknown-model") == DEFAULT_PROFILE
+
+    monkeypatch.setattr(settings, "ollama_num_ctx", 2048)
+    assert profile_for("ollama", "phi3:mini").context_window == 2048
+
+
+def test_estimates_track_prose_and_code():
+    from services.token_budget import estimate_tokens, profile_for
+
+    llama = profile_for("groq", "llama-3.3-70b-versatile")
+    prose = "The quick brown fox jumps over the lazy dog. " * 100  # ≈ 1 000 BPE tokens
+    code = "def f(x: int) -> dict[str, int]:\n    return {'x': x * 2}\n" * 50  # ≈ 1 000 BPE tokens
+
+    assert 900 <= estimate_tokens(prose, llama) <= 1_400
+    assert 900 <= estimate_tokens(code, llama) <= 1_500
+    assert estimate_tokens("", llama) == 0
+    # Smaller vocabularies need more tokens for the same text
+    assert estimate_tokens(prose, profile_for("ollama", "phi3:mini")) > estimate_tokens(prose, llama)
+
+
+def test_fit_text_cuts_at_boundary_and_marks():
+    from services.token_budget import estimate_tokens, fit_text
+
+    text = "\n".join(f"line {i} with a few words" for i in range(2_000))
+    fitted, truncated = fit_text(text, 500, marker="\n[cut]")
+
+    assert truncated
+    assert fitted.endswith("\n[cut]")
+    assert estimate_tokens(fitted) <= 500
+    assert fitted[: -len("\n[cut]")] in text
+    assert fit_text("short", 500) == ("short", False)
+
+
+def test_output_budget_clamps_and_rejects():
+    from services.token_budget import ModelProfile, output_budget
+
+    small = ModelProfile(context_window=8_192, max_output=8_192)
+    assert output_budget(small, 1_000, 4_096) == 4_096
+    assert 512 <= output_budget(small, 6_000, 4_096) < 4_096  # shrunk to the room left
+    assert output_budget(small, 8_000, 4_096) is None
+
+
+def test_input_budget_respects_cap_and_small_windows(monkeypatch):
+    from config import settings
+    from services.token_budget import input_budget, profile_for
+
+    monkeypatch.setattr(settings, "llm_prompt_token_cap", 100_000)
+    assert input_budget(profile_for("gemini", "gemini-2.0-flash")) == 100_000
+    phi = profile_for("ollama", "phi3:mini")
+    assert 0 < input_budget(phi) < phi.context_window
+
+
+@pytest.mark.asyncio
+async def test_too_small_fallbacks_are_skipped_and_output_is_clamped():
+    from services.llm_service import LLMService
+
+    small = SizedProvider("openrouter", "meta-llama/llama-3-8b-instruct")  # 8k window
+    large = SizedProvider("groq", "llama-3.3-70b-versatile")  # 128k window
+    service = LLMService(primary=small, fallbacks=[large])
+
+    long_prompt = "word " * 20_000
+    _, provider, _ = await service.generate(long_prompt, max_tokens=64_000)
+
+    assert provider == "groq"
+    assert small.max_tokens_seen == []
+    assert large.max_tokens_seen == [32_768]  # model output cap
+
+
+@pytest.mark.asyncio
+async def test_truncation_sites_use_primary_budget(monkeypatch):
+    from config import settings
+    from services import developer_service, workflow_service
+    from services.llm_service import LLMService
+
+    monkeypatch.setattr(settings, "llm_prompt_token_cap", 2_000)
+    service = LLMService(primary=SizedProvider("groq", "llama-3.3-70b-versatile"))
+
+    code = "\n".join(f"x_{i} = compute({i})" for i in range(3_000))
+    fitted, truncated = developer_service._truncate_code(code, service, "system")
+    assert truncated and "lines truncated for analysis" in fitted
+    assert all(line in code for line in fitted.splitlines()[:-2])
+
+    text, truncated = workflow_service._truncate_text("short transcript", service)
+    assert (text, truncated) == ("short transcript", False)